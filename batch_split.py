@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Non-interactive batch splitting of every session under a recordings tree
+Sessions are found by their <name>_video_<timestamp>_markers.txt file and
+split concurrently with the modes of split_script.py. Every finished output
+is recorded in a per-session manifest, so reruns only redo missing or stale
+outputs
+For usage, type python batch_split.py -h
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+from split_script import (
+    T_PRIOR,
+    T_POST,
+    IO_LIMIT_PER_DISK,
+    read_timelist,
+    compute_session_split_times,
+    build_mode_jobs,
+    get_job_outputs,
+    run_split_mode,
+    report_failures,
+)
+from split_backends import BACKENDS
+from frame_timestamps import join_timestamp_files
+from combine_utils.session_files import find_sessions, join_session_parts, file_signature, parts_signature
+
+# Manifest written in every session directory
+MANIFEST_NAME = 'split_manifest.json'
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Split every recorded session under a directory without prompts'
+    )
+    parser.add_argument(
+        'root',
+        help='Directory to search for sessions (e.g. ./recorded_videos)'
+    )
+    parser.add_argument(
+        '--trial-type',
+        choices=['taste', 'affective'],
+        required=True,
+        help='taste: clip around every trial, affective: one clip between the trial list times'
+    )
+    parser.add_argument(
+        '--triallist-name',
+        default='{session}_trials.txt',
+        help='Trial list file name in each session directory, {session} is replaced by '
+             '<name>_video_<timestamp> (default: {session}_trials.txt)'
+    )
+    parser.add_argument(
+        '--mode',
+        choices=['per_trial', 'single_pass', 'smart', 'npy'],
+        default='single_pass',
+        help='Split mode, see split_script.py -h (default: single_pass)'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=list(BACKENDS),
+        default='ffmpeg',
+        help='Library used to cut clips in per_trial mode (default: ffmpeg)'
+    )
+    parser.add_argument(
+        '--time-base',
+        choices=['index', 'nominal'],
+        default='index',
+        help='How trial times are mapped to frames, see split_script.py -h (default: index)'
+    )
+    parser.add_argument(
+        '--grayscale',
+        action='store_true',
+        help='Store single-channel frames in npy mode'
+    )
+    parser.add_argument(
+        '--sessions',
+        type=int,
+        default=2,
+        help='Number of sessions processed concurrently (default: 2)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Parallel cut jobs within each session (default: 1)'
+    )
+    parser.add_argument(
+        '--io-limit',
+        type=int,
+        default=IO_LIMIT_PER_DISK,
+        help=f'Maximum parallel jobs reading from the same disk, across all sessions '
+             f'(default: {IO_LIMIT_PER_DISK})'
+    )
+    parser.add_argument(
+        '--verify-hash',
+        action='store_true',
+        help='Re-hash existing outputs instead of trusting their recorded size'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Only list the work that would be done'
+    )
+    return parser.parse_args()
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(directory):
+    """Read the manifest of a session directory (empty if missing or corrupt)"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'outputs': {}}
+    manifest.setdefault('outputs', {})
+    return manifest
+
+def save_manifest(directory, manifest):
+    """Write the manifest atomically"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def get_session_params(session, args):
+    """Everything an output depends on besides its source video"""
+    return {
+        'mode': args.mode,
+        'time_base': args.time_base,
+        'trial_type': args.trial_type,
+        't_prior': T_PRIOR,
+        't_post': T_POST,
+        'grayscale': bool(args.grayscale) if args.mode == 'npy' else False,
+        'backend': args.backend if args.mode == 'per_trial' else None,
+        'marker_file': file_signature(session['marker_file']),
+        'triallist_file': file_signature(session['triallist_file']),
+    }
+
+def is_output_fresh(path, entry, source_signature, params, verify_hash=False):
+    """Check an output against its manifest entry"""
+    if entry is None or not os.path.exists(path):
+        return False
+    if entry.get('params') != params or entry.get('source') != source_signature:
+        return False
+    if os.path.getsize(path) != entry.get('size'):
+        return False
+    if verify_hash and hash_file(path) != entry.get('sha256'):
+        return False
+    return True
+
+def split_session(session, args, show_progress=False):
+    """
+    Split one session, skipping jobs whose outputs are all fresh
+
+    Returns:
+        tuple: (n_jobs_run, n_jobs_skipped, failures)
+    """
+    directory = session['directory']
+    video_files = session['video_files']
+    manifest = load_manifest(directory)
+    params = get_session_params(session, args)
+    source_signatures = [parts_signature(parts) for parts in session['video_parts']]
+
+    marker_vec = np.asarray(read_timelist(session['marker_file']))
+    trial_vec = np.asarray(read_timelist(session['triallist_file']))
+    trial_bool = 1 if args.trial_type == 'taste' else 0
+    n_clips = len(trial_vec) if trial_bool else 1
+
+    todo = []
+    jobs = build_mode_jobs(args.mode, video_files, n_clips)
+    for job in jobs:
+        outputs = get_job_outputs(job, directory, args.mode)
+        fresh = all(
+            is_output_fresh(
+                path,
+                manifest['outputs'].get(os.path.basename(path)),
+                source_signatures[job.video_num],
+                params,
+                args.verify_hash,
+            )
+            for path in outputs
+        )
+        if not fresh:
+            todo.append(job)
+
+    if args.dry_run or not todo:
+        return len(todo), len(jobs) - len(todo), []
+    join_session_parts(session, join_timestamp_files)
+
+    def record_job(job):
+        for path in get_job_outputs(job, directory, args.mode):
+            if not os.path.exists(path):
+                continue
+            manifest['outputs'][os.path.basename(path)] = {
+                'size': os.path.getsize(path),
+                'sha256': hash_file(path),
+                'video': os.path.basename(job.video_name),
+                'source': source_signatures[job.video_num],
+                'params': params,
+            }
+        save_manifest(directory, manifest)
+
+    split_times = compute_session_split_times(
+        video_files, marker_vec, trial_vec, trial_bool, args.time_base)
+    failures = run_split_mode(
+        args.mode, video_files, split_times, directory, args.jobs, args.io_limit,
+        args.grayscale, args.backend, jobs=todo, show_progress=show_progress, on_success=record_job)
+    return len(todo), len(jobs) - len(todo), failures
+
+def main():
+    """Split every session found under the root directory"""
+    args = parse_arguments()
+
+    sessions = find_sessions(args.root, args.triallist_name)
+    ready = []
+    for session in sessions:
+        if session['triallist_file'] is None:
+            print(f"Skipping {session['name']}: no trial list "
+                  f"({args.triallist_name.format(session=session['name'])})")
+        elif not session['video_files']:
+            print(f"Skipping {session['name']}: no camera videos found")
+        else:
+            ready.append(session)
+
+    print(f"Found {len(sessions)} sessions, {len(ready)} ready to split")
+    if not ready:
+        sys.exit(0 if sessions else 1)
+
+    n_failed = 0
+    with ThreadPoolExecutor(max_workers=max(args.sessions, 1)) as executor:
+        futures = {executor.submit(split_session, session, args): session for session in ready}
+        with tqdm(total=len(ready), unit='session') as pbar:
+            for future in as_completed(futures):
+                session = futures[future]
+                try:
+                    n_run, n_skipped, failures = future.result()
+                except Exception as e:
+                    tqdm.write(f"Error splitting session {session['name']}: {e}")
+                    n_failed += 1
+                else:
+                    verb = 'would run' if args.dry_run else 'ran'
+                    tqdm.write(f"{session['name']}: {verb} {n_run} jobs, "
+                               f"{n_skipped} already up to date")
+                    if failures:
+                        report_failures(failures)
+                        n_failed += 1
+                pbar.update(1)
+
+    if n_failed:
+        print(f"\n{n_failed} session(s) had errors")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
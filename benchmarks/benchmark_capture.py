@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the live capture encoder settings
+Reads the resolution, frame rate and number of cameras from config.json and
+records that many concurrent lavfi sources (a test pattern with sensor-like
+noise, read at the native rate like a camera) through every candidate
+configuration: full color or single channel (extractplanes=y), x264 preset
+and CRF. Every configuration is measured for sustained fps, CPU per stream
+(net of generating the sources), bytes per minute and dropped or duplicated
+frames. The fastest configuration that keeps real time on every stream is
+written back to config.json together with its estimated_space_per_minute_gb
+For usage, type python benchmarks/benchmark_capture.py -h
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'combine_utils'))
+
+from benchmark_pipeline import get_environment
+from disk_space_check import load_config, get_num_cameras
+from ffmpeg_progress import parse_progress_block
+
+# Test pattern with temporal noise, so the encoder sees camera-like content
+SOURCE = '{source}=size={size}:rate={rate},noise=alls=12:allf=t'
+
+# Candidate encoder settings, every combination is measured
+CANDIDATE_CHANNELS = ['color', 'y']
+CANDIDATE_PRESETS = ['ultrafast', 'superfast', 'veryfast']
+CANDIDATE_CRFS = [23]
+
+# Fraction of real time every stream must sustain
+REALTIME_SPEED = 0.98
+
+def parse_arguments(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Measure the capture encoder settings and write the fastest real-time one to config.json'
+    )
+    parser.add_argument(
+        '--config',
+        default=os.path.join(REPO_DIR, 'config.json'),
+        help='Configuration with the recording settings, updated with the result (default: config.json)'
+    )
+    parser.add_argument('--cameras', type=int, help='Concurrent streams (default: from the config)')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds recorded per configuration (default: 20)')
+    parser.add_argument('--source', default='testsrc2', help='lavfi source of every stream (default: testsrc2)')
+    parser.add_argument(
+        '--channels', nargs='+', choices=CANDIDATE_CHANNELS, default=CANDIDATE_CHANNELS,
+        help='Channel modes to measure (default: color y)'
+    )
+    parser.add_argument(
+        '--presets', nargs='+', default=CANDIDATE_PRESETS,
+        help=f"x264 presets to measure (default: {' '.join(CANDIDATE_PRESETS)})"
+    )
+    parser.add_argument(
+        '--crfs', nargs='+', type=int, default=CANDIDATE_CRFS,
+        help=f"x264 CRF values to measure (default: {' '.join(map(str, CANDIDATE_CRFS))})"
+    )
+    parser.add_argument(
+        '--prefer', choices=['cpu', 'size'], default='cpu',
+        help='Pick the real-time configuration with the least CPU (fastest) or the fewest bytes (default: cpu)'
+    )
+    parser.add_argument('--no-write', action='store_true', help='Only report, do not update the config')
+    parser.add_argument(
+        '--workdir',
+        help='Keep the recorded streams in this directory instead of a temporary one'
+    )
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file (default: stdout)')
+    return parser.parse_args(argv)
+
+def get_candidates(channels=CANDIDATE_CHANNELS, presets=CANDIDATE_PRESETS, crfs=CANDIDATE_CRFS):
+    """
+    Every combination of the candidate settings
+
+    Returns:
+        dict: name (e.g. 'color ultrafast crf23') -> single_channel, preset and crf
+    """
+    return {
+        f'{channel} {preset} crf{crf}': {'single_channel': channel == 'y', 'preset': preset, 'crf': crf}
+        for channel in channels for preset in presets for crf in crfs
+    }
+
+def build_stream_command(source, output, progress_file, duration, candidate=None):
+    """
+    ffmpeg command recording one synthetic camera like record_supervisor.py
+
+    Without a candidate the frames are only generated, to measure the cost
+    of the source itself.
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error', '-y', '-progress', progress_file,
+           '-re', '-f', 'lavfi', '-i', source, '-t', f'{duration:g}']
+    if candidate is None:
+        return cmd + ['-f', 'null', '-']
+    if candidate['single_channel']:
+        cmd.extend(['-vf', 'extractplanes=y'])
+    cmd.extend(['-c:v', 'libx264', '-preset', candidate['preset'], '-crf', str(candidate['crf']),
+                '-pix_fmt', 'gray' if candidate['single_channel'] else 'yuv420p', output])
+    return cmd
+
+def read_last_progress(progress_file):
+    """Metrics of the last block of an ffmpeg -progress file (see parse_progress_block)"""
+    fields = {}
+    metrics = None
+    with open(progress_file) as f:
+        for line in f:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            fields[key] = value
+            if key == 'progress':
+                metrics = parse_progress_block(fields)
+                fields = {}
+    return metrics
+
+def run_streams(directory, n_streams, source, duration, rate, candidate=None):
+    """
+    Record n_streams concurrent sources through one configuration
+
+    Returns:
+        dict: speed (slowest stream's recorded over wall time), fps (sustained
+        per stream), cpu_per_stream (cores), bytes_per_minute (per stream),
+        dropped and duplicated frames, or error
+    """
+    os.makedirs(directory, exist_ok=True)
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    streams = []
+    for i in range(n_streams):
+        output = os.path.join(directory, f'stream{i}.mp4')
+        progress_file = os.path.join(directory, f'stream{i}.progress')
+        cmd = build_stream_command(source, output, progress_file, duration, candidate)
+        streams.append((output, progress_file, time.perf_counter(),
+                        subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True)))
+
+    walls = []
+    errors = []
+    for output, progress_file, start, process in streams:
+        _, stderr = process.communicate()
+        walls.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            lines = stderr.strip().splitlines()
+            errors.append(lines[-1] if lines else f'ffmpeg exited with {process.returncode}')
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    if errors:
+        return {'error': errors[0]}
+
+    expected = int(round(duration * rate))
+    frames = []
+    dropped = 0
+    duplicated = 0
+    for output, progress_file, _, _ in streams:
+        metrics = read_last_progress(progress_file) or {}
+        n_frames = metrics.get('frame') or 0
+        frames.append(n_frames)
+        dropped += max(0, expected - n_frames) + (metrics.get('drop_frames') or 0)
+        duplicated += metrics.get('dup_frames') or 0
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    result = {
+        'speed': min(duration / wall for wall in walls),
+        'fps': min(n_frames / wall for n_frames, wall in zip(frames, walls)),
+        'cpu_per_stream': cpu / n_streams / duration,
+        'dropped_frames': dropped,
+        'duplicated_frames': duplicated,
+    }
+    if candidate is not None:
+        result['bytes_per_minute'] = sum(os.path.getsize(output) for output, _, _, _ in streams) / n_streams / duration * 60
+    return result
+
+def keeps_real_time(result):
+    """Check that every stream sustained the frame rate without losing frames"""
+    return ('error' not in result and result['speed'] >= REALTIME_SPEED
+            and result['dropped_frames'] == 0 and result['duplicated_frames'] == 0)
+
+def select_configuration(results, prefer='cpu'):
+    """
+    Name of the fastest configuration that keeps real time
+
+    With prefer 'size' the real-time configuration writing the fewest bytes
+    is picked instead.
+
+    Returns:
+        str or None: None if no configuration keeps real time
+    """
+    realtime = [name for name, result in results.items() if keeps_real_time(result)]
+    if not realtime:
+        return None
+    key = 'cpu_per_stream' if prefer == 'cpu' else 'bytes_per_minute'
+    return min(realtime, key=lambda name: results[name][key])
+
+def apply_recommendation(config, candidate, result, n_cameras):
+    """Write a configuration and its storage per minute (all cameras) into a config dict"""
+    recording = config.setdefault('recording', {})
+    recording['preset'] = candidate['preset']
+    recording['crf'] = candidate['crf']
+    recording['single_channel'] = candidate['single_channel']
+    disk_space = config.setdefault('disk_space', {})
+    disk_space['estimated_space_per_minute_gb'] = round(result['bytes_per_minute'] * n_cameras / 1024**3, 3)
+    return config
+
+def save_config(path, config):
+    """Write the config atomically"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+def run_benchmark(args, config):
+    """Measure the source and every candidate and return the report"""
+    recording = config.get('recording', {})
+    size = recording.get('video_resolution', '1280x720')
+    rate = recording.get('frame_rate', 30)
+    n_cameras = args.cameras or get_num_cameras(config)
+    source = SOURCE.format(source=args.source, size=size, rate=rate)
+    candidates = get_candidates(args.channels, args.presets, args.crfs)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='benchmark_capture_')
+    try:
+        print(f"Measuring {n_cameras} x {size}@{rate} sources...", file=sys.stderr)
+        baseline = run_streams(os.path.join(workdir, 'source'), n_cameras, source, args.duration, rate)
+        results = {}
+        for name, candidate in candidates.items():
+            print(f"Recording {n_cameras} streams with {name}...", file=sys.stderr)
+            result = run_streams(os.path.join(workdir, name.replace(' ', '_')), n_cameras, source,
+                                 args.duration, rate, candidate)
+            if 'error' not in result and 'error' not in baseline:
+                # The cameras generate their frames for free
+                result['cpu_per_stream'] = max(0.0, result['cpu_per_stream'] - baseline['cpu_per_stream'])
+            result['real_time'] = keeps_real_time(result)
+            results[name] = result
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': get_environment(),
+        'capture': {'cameras': n_cameras, 'size': size, 'rate': rate, 'duration': args.duration,
+                    'source': source},
+        'source': baseline,
+        'candidates': results,
+        'recommended': select_configuration(results, args.prefer),
+    }
+
+def print_results(report):
+    """Print one line per candidate"""
+    print(f"{'configuration':26s} {'fps':>6s} {'speed':>6s} {'cpu':>6s} {'MB/min':>8s} {'drop':>5s} {'dup':>5s}",
+          file=sys.stderr)
+    for name, result in report['candidates'].items():
+        if 'error' in result:
+            print(f"{name:26s} error: {result['error']}", file=sys.stderr)
+            continue
+        mark = ' *' if name == report['recommended'] else ''
+        print(f"{name:26s} {result['fps']:6.1f} {result['speed']:5.2f}x {result['cpu_per_stream']:6.2f} "
+              f"{result['bytes_per_minute'] / 1024**2:8.1f} {result['dropped_frames']:5d} "
+              f"{result['duplicated_frames']:5d}{mark}", file=sys.stderr)
+
+def main():
+    """Run the capture benchmark and update the config"""
+    args = parse_arguments()
+    config = load_config(args.config)
+    report = run_benchmark(args, config)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    print_results(report)
+
+    name = report['recommended']
+    if name is None:
+        print("❌ No configuration keeps real time; use fewer cameras, a lower resolution or frame rate",
+              file=sys.stderr)
+        sys.exit(1)
+    candidate = get_candidates(args.channels, args.presets, args.crfs)[name]
+    result = report['candidates'][name]
+    if args.no_write:
+        print(f"Recommended: {name}", file=sys.stderr)
+        return
+    save_config(args.config, apply_recommendation(config, candidate, result, report['capture']['cameras']))
+    print(f"✅ Wrote {name} and estimated_space_per_minute_gb "
+          f"{config['disk_space']['estimated_space_per_minute_gb']} to {args.config}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
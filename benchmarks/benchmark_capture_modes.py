@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark of one ffmpeg per camera against one shared-clock ffmpeg
+Reads the resolution, frame rate, encoder settings and number of cameras
+from config.json and records that many lavfi stand-ins with
+record_supervisor.py twice: once with an ffmpeg per camera and once with
+every camera as an input of one ffmpeg (--shared-clock). Both modes are
+measured for CPU per camera (ffmpeg and the supervisor itself), frames per
+camera and start skew, the spread of the cameras' first frame times in the
+timestamp sidecars that trials are aligned with
+For usage, type python benchmarks/benchmark_capture_modes.py -h
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'combine_utils'))
+
+from benchmark_capture import SOURCE
+from benchmark_pipeline import get_environment
+from disk_space_check import load_config, get_num_cameras
+from frame_timestamps import load_frame_timestamps
+from record_supervisor import LAVFI_PREFIX, RecordingSupervisor, get_capture_settings
+
+# Capture modes compared, name -> shared_clock
+MODES = {'per-process': False, 'shared-clock': True}
+
+def parse_arguments(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Compare CPU usage and start skew of one ffmpeg per camera and one shared-clock ffmpeg'
+    )
+    parser.add_argument(
+        '--config',
+        default=os.path.join(REPO_DIR, 'config.json'),
+        help='Configuration with the recording settings (default: config.json)'
+    )
+    parser.add_argument('--cameras', type=int, help='Cameras recorded (default: from the config)')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds recorded per mode (default: 20)')
+    parser.add_argument('--source', default='testsrc2', help='lavfi source of every camera (default: testsrc2)')
+    parser.add_argument('--single-channel', action='store_true', help='Record only the Y plane')
+    parser.add_argument(
+        '--workdir',
+        help='Keep the recordings in this directory instead of a temporary one'
+    )
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file (default: stdout)')
+    return parser.parse_args(argv)
+
+def get_start_skew(timestamps):
+    """Spread (s) of the first frame times of every camera, None if a camera has no frames"""
+    if any(times is None or not len(times) for times in timestamps):
+        return None
+    starts = [times[0] for times in timestamps]
+    return float(max(starts) - min(starts))
+
+def run_mode(directory, devices, settings, duration, shared_clock, single_channel=False):
+    """
+    Record the devices in one capture mode
+
+    Returns:
+        dict: processes, cpu_per_camera (cores of ffmpeg), supervisor_cpu
+        (cores), frames (per camera), start_skew (s), restarts and ok
+    """
+    os.makedirs(directory, exist_ok=True)
+    supervisor = RecordingSupervisor(devices, directory, 'benchmark_video_000000-000000', settings, single_channel,
+                                     shared_clock=shared_clock)
+    before_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    before_self = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    ok = asyncio.run(supervisor.run(duration))
+    wall = time.perf_counter() - start
+    after_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    after_self = resource.getrusage(resource.RUSAGE_SELF)
+
+    children = ((after_children.ru_utime - before_children.ru_utime)
+                + (after_children.ru_stime - before_children.ru_stime))
+    own = (after_self.ru_utime - before_self.ru_utime) + (after_self.ru_stime - before_self.ru_stime)
+    timestamps = [load_frame_timestamps(capture.files[0]) for capture in supervisor.captures]
+    return {
+        'processes': 1 if shared_clock else len(devices),
+        'cpu_per_camera': children / len(devices) / wall,
+        'supervisor_cpu': own / wall,
+        'frames': [0 if times is None else len(times) for times in timestamps],
+        'start_skew': get_start_skew(timestamps),
+        'restarts': sum(capture.restarts for capture in supervisor.captures),
+        'ok': ok,
+    }
+
+def run_benchmark(args, config):
+    """Record in every mode and return the report"""
+    settings = get_capture_settings(config)
+    size = settings['video_resolution']
+    rate = settings['frame_rate']
+    n_cameras = args.cameras or get_num_cameras(config)
+    source = SOURCE.format(source=args.source, size=size, rate=rate)
+    devices = [LAVFI_PREFIX + source] * n_cameras
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='benchmark_capture_modes_')
+    try:
+        results = {}
+        for name, shared_clock in MODES.items():
+            print(f"Recording {n_cameras} x {size}@{rate} stand-ins {name}...", file=sys.stderr)
+            results[name] = run_mode(os.path.join(workdir, name), devices, settings, args.duration, shared_clock,
+                                     args.single_channel)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': get_environment(),
+        'capture': {'cameras': n_cameras, 'size': size, 'rate': rate, 'duration': args.duration,
+                    'preset': settings['preset'], 'crf': settings['crf'], 'single_channel': args.single_channel,
+                    'source': source},
+        'modes': results,
+    }
+
+def print_results(report):
+    """Print one line per mode"""
+    print(f"{'mode':14s} {'procs':>5s} {'cpu/cam':>8s} {'supervisor':>10s} {'frames':>13s} {'skew ms':>8s}",
+          file=sys.stderr)
+    for name, result in report['modes'].items():
+        frames = f"{min(result['frames'])}-{max(result['frames'])}"
+        skew = '-' if result['start_skew'] is None else f"{result['start_skew'] * 1000:.1f}"
+        print(f"{name:14s} {result['processes']:5d} {result['cpu_per_camera']:8.3f} {result['supervisor_cpu']:10.3f} "
+              f"{frames:>13s} {skew:>8s}{'' if result['ok'] else ' (failed)'}", file=sys.stderr)
+
+def main():
+    """Run the capture mode benchmark"""
+    args = parse_arguments()
+    report = run_benchmark(args, load_config(args.config))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    print_results(report)
+
+if __name__ == '__main__':
+    main()
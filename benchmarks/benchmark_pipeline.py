@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the post-processing pipeline
+Generates a deterministic synthetic multi-camera session with ffmpeg's lavfi
+test sources (videos, markers file and trial list named like a real
+recording), then times every pipeline stage on it. Each stage runs in its
+own process so its peak RSS can be measured, and the results are written
+as JSON to compare across commits
+For usage, type python benchmarks/benchmark_pipeline.py -h
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from queue import Empty
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'combine_utils'))
+
+from split_script import read_timelist, compute_session_split_times, get_video_split_times, run_split_mode
+from video_index import get_index_path, load_video_index
+
+# Session name in the format written by recording_utils.sh
+SESSION_NAME = 'bench_video_240101-120000'
+
+# Wall-clock time of the recording start marker
+SESSION_START = 1700000000.0
+
+# lavfi sources cycled over cameras, so every camera has distinct content
+CAMERA_SOURCES = ['testsrc', 'testsrc2', 'smptebars', 'rgbtestsrc']
+
+# Seconds between checks that a stage process is still alive
+STAGE_POLL_INTERVAL = 1.0
+
+def parse_arguments(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Time the split and combine pipelines on a synthetic session'
+    )
+    parser.add_argument('--cameras', type=int, default=2, help='Number of cameras (default: 2)')
+    parser.add_argument('--duration', type=int, default=120, help='Video duration in seconds (default: 120)')
+    parser.add_argument('--size', default='640x480', help='Video size (default: 640x480)')
+    parser.add_argument('--rate', type=int, default=30, help='Frame rate (default: 30)')
+    parser.add_argument('--trials', type=int, default=10, help='Number of trials (default: 10)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the trial time jitter (default: 0)')
+    parser.add_argument(
+        '--stages',
+        nargs='+',
+        choices=list(STAGES),
+        default=list(STAGES),
+        help='Stages to run, in order (default: all)'
+    )
+    parser.add_argument('--jobs', type=int, default=1, help='Parallel cut jobs in split stages (default: 1)')
+    parser.add_argument(
+        '--quality',
+        choices=['low', 'medium', 'high'],
+        default='high',
+        help='Quality of the combine stages (default: high)'
+    )
+    parser.add_argument(
+        '--chunks',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Chunks of the combine_chunked stage (default: number of CPU cores)'
+    )
+    parser.add_argument(
+        '--workdir',
+        help='Keep the session and outputs in this directory instead of a temporary one'
+    )
+    parser.add_argument(
+        '--stage-timeout',
+        type=float,
+        help='Kill a stage after this many seconds and record it as failed (default: no limit)'
+    )
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file (default: stdout)')
+    parser.add_argument('--compare', help='Previous JSON report to compare the stage timings against')
+    return parser.parse_args(argv)
+
+#  ____                _
+# / ___|  ___  ___ ___(_) ___  _ __
+# \___ \ / _ \/ __/ __| |/ _ \| '_ \
+#  ___) |  __/\__ \__ \ | (_) | | | |
+# |____/ \___||___/___/_|\___/|_| |_|
+#
+
+def make_camera_video(path, source, duration, size, rate):
+    """Encode one lavfi test source like the output of parallel2video_ffmpeg.sh"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'{source}=size={size}:rate={rate}:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23', '-pix_fmt', 'yuv420p',
+        '-g', str(rate), '-threads', '1',
+        '-fflags', '+bitexact', '-flags:v', '+bitexact',
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+
+def make_trial_times(duration, n_trials, seed=0):
+    """Trial onsets spread evenly over the session with seeded jitter, away from the edges"""
+    rng = np.random.default_rng(seed)
+    margin = min(10.0, duration / 4)
+    trial_times = np.linspace(margin, duration - margin, n_trials)
+    spacing = (duration - 2 * margin) / max(n_trials, 1)
+    trial_times = trial_times + rng.uniform(-0.25, 0.25, n_trials) * spacing
+    return np.sort(np.clip(trial_times, 0, duration))
+
+def make_synthetic_session(directory, cameras=2, duration=120, size='640x480', rate=30,
+                           n_trials=10, seed=0):
+    """
+    Write a synthetic session that split_script.py and batch_split.py accept
+
+    Returns:
+        dict: name, directory, video_files, marker_file, triallist_file,
+        duration and rate
+    """
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.join(directory, SESSION_NAME)
+
+    video_files = []
+    for cam in range(cameras):
+        path = f'{prefix}_cam{cam}.mp4'
+        make_camera_video(path, CAMERA_SOURCES[cam % len(CAMERA_SOURCES)], duration, size, rate)
+        video_files.append(path)
+
+    marker_file = f'{prefix}_markers.txt'
+    with open(marker_file, 'w') as f:
+        f.write(f'{SESSION_START:.2f}\n{SESSION_START + duration:.2f}\n')
+
+    triallist_file = f'{prefix}_trials.txt'
+    with open(triallist_file, 'w') as f:
+        for trial_time in make_trial_times(duration, n_trials, seed):
+            f.write(f'{SESSION_START + trial_time:.2f}\n')
+
+    return {
+        'name': SESSION_NAME,
+        'directory': directory,
+        'video_files': video_files,
+        'marker_file': marker_file,
+        'triallist_file': triallist_file,
+        'duration': duration,
+        'rate': rate,
+    }
+
+#  ____  _
+# / ___|| |_ __ _  __ _  ___  ___
+# \___ \| __/ _` |/ _` |/ _ \/ __|
+#  ___) | || (_| | (_| |  __/\__ \
+# |____/ \__\__,_|\__, |\___||___/
+#                 |___/
+
+def get_split_times(session):
+    """Clip boundaries of every trial, mapped to real frames"""
+    marker_vec = np.asarray(read_timelist(session['marker_file']))
+    trial_vec = np.asarray(read_timelist(session['triallist_file']))
+    return compute_session_split_times(session['video_files'], marker_vec, trial_vec, 1)
+
+def count_clip_frames(session, split_times):
+    """Number of source frames covered by all clips of all cameras"""
+    n_frames = 0
+    for video_num in range(len(session['video_files'])):
+        times = np.clip(get_video_split_times(split_times, video_num), 0, session['duration'])
+        n_frames += int(np.round((times[1] - times[0]).sum() * session['rate']))
+    return n_frames
+
+def stage_index(session, directory, args):
+    """Build the packet index sidecar of every camera"""
+    for video in session['video_files']:
+        index_path = get_index_path(video)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        load_video_index(video)
+    return len(session['video_files']) * session['duration'] * session['rate']
+
+def make_split_stage(mode):
+    """Stage that splits the session with one split_script.py mode"""
+    def stage_split(session, directory, args):
+        split_times = get_split_times(session)
+        failures = run_split_mode(mode, session['video_files'], split_times, directory,
+                                  args.jobs, show_progress=False)
+        if failures:
+            raise RuntimeError(f"{len(failures)} {mode} jobs failed: {failures[0][1]}")
+        return count_clip_frames(session, split_times)
+    stage_split.__doc__ = f"Split every trial with --mode {mode}"
+    return stage_split
+
+def stage_combine(session, directory, args):
+    """Combine all cameras into one grid video with combine_videos.py"""
+    from combine_videos import determine_grid_layout, build_ffmpeg_command, probe_video_info
+
+    rows, cols = determine_grid_layout(len(session['video_files']), 'auto')
+    output = os.path.join(directory, 'combined.mp4')
+    video_info = [probe_video_info(video) for video in session['video_files']]
+    cmd = build_ffmpeg_command(session['video_files'], output, rows, cols, 640, args.quality,
+                               video_info=video_info)
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return session['duration'] * session['rate']
+
+def stage_combine_chunked(session, directory, args):
+    """Combine all cameras with --chunks parallel chunk encodes"""
+    from combine_videos import determine_grid_layout, combine_chunked, probe_video_info
+
+    rows, cols = determine_grid_layout(len(session['video_files']), 'auto')
+    output = os.path.join(directory, 'combined.mp4')
+    video_info = [probe_video_info(video) for video in session['video_files']]
+    combine_chunked(session['video_files'], output, rows, cols, 640, args.quality, args.chunks,
+                    video_info=video_info)
+    return session['duration'] * session['rate']
+
+def stage_combine_numpy(session, directory, args):
+    """Combine all cameras by tiling decoded frames in NumPy before one encoder"""
+    from combine_videos import determine_grid_layout, probe_video_info
+    from numpy_compositor import composite_videos
+
+    rows, cols = determine_grid_layout(len(session['video_files']), 'auto')
+    output = os.path.join(directory, 'combined.mp4')
+    video_info = [probe_video_info(video) for video in session['video_files']]
+    return composite_videos(session['video_files'], output, rows, cols, 640, args.quality,
+                            video_info=video_info)
+
+# Stages by name, each returns the number of frames it processed
+STAGES = {
+    'index': stage_index,
+    'split_per_trial': make_split_stage('per_trial'),
+    'split_single_pass': make_split_stage('single_pass'),
+    'split_smart': make_split_stage('smart'),
+    'split_npy': make_split_stage('npy'),
+    'combine': stage_combine,
+    'combine_chunked': stage_combine_chunked,
+    'combine_numpy': stage_combine_numpy,
+}
+
+#  ____                  _
+# |  _ \ _   _ _ __  _ __ (_)_ __   __ _
+# | |_) | | | | '_ \| '_ \| | '_ \ / _` |
+# |  _ <| |_| | | | | | | | | | | | (_| |
+# |_| \_\\__,_|_| |_|_| |_|_|_| |_|\__, |
+#                                  |___/
+
+def get_directory_bytes(directory):
+    """Total size of all files under a directory"""
+    total = 0
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+def _run_stage_child(name, session, directory, args, queue):
+    """Run one stage in a child process and report its measurements"""
+    # Keep progress messages of the stage out of the JSON on stdout
+    sys.stdout = sys.stderr
+    try:
+        start = time.perf_counter()
+        n_frames = STAGES[name](session, directory, args)
+        wall = time.perf_counter() - start
+    except Exception as e:
+        queue.put({'error': f'{type(e).__name__}: {e}'})
+        return
+    # ru_maxrss is in KiB on Linux; children covers every ffmpeg the stage waited on
+    peak_kib = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    queue.put({'frames': n_frames, 'wall_seconds': wall, 'peak_rss_mb': peak_kib / 1024})
+
+def run_stage(name, session, directory, args):
+    """
+    Time one stage in a fresh process
+
+    A stage whose process dies without reporting (crash, OOM kill) or runs
+    longer than --stage-timeout is recorded as failed instead of hanging.
+
+    Returns:
+        dict: frames, wall_seconds, fps, peak_rss_mb (largest single process,
+        Python or ffmpeg) and output_bytes, or error
+    """
+    os.makedirs(directory, exist_ok=True)
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_stage_child, args=(name, session, directory, args, queue))
+    process.start()
+    deadline = None if args.stage_timeout is None else time.monotonic() + args.stage_timeout
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=STAGE_POLL_INTERVAL)
+        except Empty:
+            if not process.is_alive():
+                # The result may have been sent just before the process exited
+                try:
+                    result = queue.get(timeout=STAGE_POLL_INTERVAL)
+                except Empty:
+                    result = {'error': f'Stage process exited with code {process.exitcode} without a result'}
+            elif deadline is not None and time.monotonic() > deadline:
+                process.kill()
+                result = {'error': f'Stage timed out after {args.stage_timeout:g} s'}
+    process.join()
+    if 'error' in result:
+        return result
+    result['fps'] = result['frames'] / max(result['wall_seconds'], 1e-9)
+    # The index stage writes next to the videos, everything else into its own directory
+    if name == 'index':
+        result['output_bytes'] = sum(
+            os.path.getsize(get_index_path(video)) for video in session['video_files'])
+    else:
+        result['output_bytes'] = get_directory_bytes(directory)
+    return result
+
+def get_environment():
+    """Commit, host and ffmpeg version the benchmark ran on"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        ffmpeg_version = subprocess.run(
+            ['ffmpeg', '-version'], capture_output=True, text=True, check=True
+        ).stdout.splitlines()[0]
+    except (OSError, subprocess.CalledProcessError, IndexError):
+        ffmpeg_version = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg_version,
+    }
+
+def run_benchmark(args):
+    """Generate the session, run the requested stages and return the report"""
+    workdir = args.workdir or tempfile.mkdtemp(prefix='benchmark_pipeline_')
+    try:
+        print(f"Generating {args.cameras} x {args.duration}s {args.size} synthetic session...",
+              file=sys.stderr)
+        session = make_synthetic_session(
+            os.path.join(workdir, 'session'), args.cameras, args.duration, args.size,
+            args.rate, args.trials, args.seed)
+
+        stages = {}
+        for name in args.stages:
+            print(f"Running {name}...", file=sys.stderr)
+            stages[name] = run_stage(name, session, os.path.join(workdir, name), args)
+
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': get_environment(),
+            'session': {
+                'cameras': args.cameras,
+                'duration': args.duration,
+                'size': args.size,
+                'rate': args.rate,
+                'trials': args.trials,
+                'seed': args.seed,
+                'jobs': args.jobs,
+                'quality': args.quality,
+                'chunks': args.chunks,
+            },
+            'stages': stages,
+        }
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def print_comparison(report, baseline):
+    """Print the wall time of every stage relative to a baseline report"""
+    if report['session'] != baseline.get('session'):
+        print("Warning: baseline was run on a different session", file=sys.stderr)
+    print(f"{'stage':20s} {'baseline':>10s} {'current':>10s} {'speedup':>8s}", file=sys.stderr)
+    for name, result in report['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if 'error' in result or not base or 'error' in base:
+            continue
+        print(f"{name:20s} {base['wall_seconds']:9.2f}s {result['wall_seconds']:9.2f}s "
+              f"{base['wall_seconds'] / result['wall_seconds']:7.2f}x", file=sys.stderr)
+
+def main():
+    """Run the benchmark suite"""
+    args = parse_arguments()
+    report = run_benchmark(args)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print_comparison(report, json.load(f))
+
+    if any('error' in result for result in report['stages'].values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass split mode against the per-trial loop
+Generates a synthetic H.264 session with ffmpeg's lavfi testsrc, then
+times both modes of split_script.py on it
+For usage, type python benchmarks/benchmark_split_modes.py -h
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from split_script import compute_split_times, split_per_trial, split_single_pass
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Compare per-trial and single-pass splitting on a synthetic session'
+    )
+    parser.add_argument('--cameras', type=int, default=2, help='Number of cameras (default: 2)')
+    parser.add_argument('--trials', type=int, default=40, help='Number of trials (default: 40)')
+    parser.add_argument('--duration', type=int, default=600, help='Video duration in seconds (default: 600)')
+    parser.add_argument('--size', default='640x480', help='Video size (default: 640x480)')
+    parser.add_argument('--jobs', type=int, default=1, help='Parallel cut jobs per mode (default: 1)')
+    return parser.parse_args()
+
+def make_synthetic_video(path, duration, size, rate=30):
+    """Encode a testsrc video similar to the output of parallel2video_ffmpeg.sh"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size={size}:rate={rate}:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23', '-pix_fmt', 'yuv420p',
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+
+def time_mode(split_func, video_files, split_times, directory, n_jobs=1):
+    """Run one split mode into a fresh directory and return wall time in seconds"""
+    os.makedirs(directory)
+    start = time.perf_counter()
+    split_func(video_files, split_times, directory, n_jobs)
+    return time.perf_counter() - start
+
+def main():
+    """Run the benchmark"""
+    args = parse_arguments()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"Generating {args.cameras} x {args.duration}s synthetic videos...")
+        video_files = []
+        for cam in range(args.cameras):
+            path = os.path.join(temp_dir, f'session_cam{cam}.mp4')
+            make_synthetic_video(path, args.duration, args.size)
+            video_files.append(path)
+
+        # Trials evenly spread over the session, away from the edges
+        marker_vec = np.array([0.0, float(args.duration)])
+        trial_vec = np.linspace(10, args.duration - 10, args.trials)
+        split_times = compute_split_times(marker_vec, trial_vec, 1)
+
+        results = {}
+        for name, func in [('per_trial', split_per_trial), ('single_pass', split_single_pass)]:
+            results[name] = time_mode(
+                func, video_files, split_times, os.path.join(temp_dir, name), args.jobs)
+
+        n_clips = args.cameras * args.trials
+        print(f"\nClips written per mode: {n_clips}")
+        for name, seconds in results.items():
+            print(f"{name:12s}: {seconds:8.2f} s ({n_clips / seconds:7.1f} clips/s)")
+        print(f"Speedup: {results['per_trial'] / results['single_pass']:.2f}x")
+
+if __name__ == '__main__':
+    main()
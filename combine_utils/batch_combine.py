@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Script to combine the per-trial clips of split_script.py into one grid video per trial
+Clips named trial<n>_cam<m> are grouped by trial and composited on a shared
+worker pool; every input is probed once and the results are written to a
+summary report
+For usage, type python batch_combine.py -h
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from combine_videos import determine_grid_layout, build_ffmpeg_command, probe_video_info, plan_input_scale, plan_tile_offsets
+
+# Clips written by split_script.py
+TRIAL_PATTERN = re.compile(r'^trial(?P<trial>\d+)_cam(?P<cam>\d+)\.(avi|mp4|mkv|mov)$')
+
+# Report written next to the combined videos
+REPORT_NAME = 'combine_report.json'
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Combine the trial<n>_cam<m> clips of a split session into one grid video per trial'
+    )
+    parser.add_argument(
+        'directory',
+        help='Directory containing the split trial clips'
+    )
+    parser.add_argument(
+        '-o', '--output-dir',
+        help='Directory for the combined videos (default: <directory>/combined)'
+    )
+    parser.add_argument(
+        '--grid',
+        choices=['2x1', '1x2', '2x2', '3x1', '1x3', 'auto'],
+        default='auto',
+        help='Grid layout for combining videos (default: auto)'
+    )
+    parser.add_argument(
+        '--scale',
+        type=int,
+        default=640,
+        help='Scale width for each video in the grid (default: 640)'
+    )
+    parser.add_argument(
+        '--quality',
+        default='high',
+        choices=['low', 'medium', 'high'],
+        help='Output video quality (default: high)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Trials combined at once (default: number of CPU cores)'
+    )
+    return parser.parse_args()
+
+def find_trial_groups(directory):
+    """
+    Group split clips by trial
+
+    Returns:
+        dict: trial number -> clip paths in camera order
+    """
+    groups = {}
+    for filename in os.listdir(directory):
+        match = TRIAL_PATTERN.match(filename)
+        if match:
+            groups.setdefault(int(match.group('trial')), []).append(
+                (int(match.group('cam')), os.path.join(directory, filename)))
+    return {trial: [path for _, path in sorted(clips)] for trial, clips in sorted(groups.items())}
+
+def get_grid_size(dimensions, rows, cols, scale_width):
+    """
+    Size of the composite, planned the way combine_videos lays out its tiles
+
+    Every input is scaled with plan_input_scale and the tiles are placed by
+    plan_tile_offsets, so each row is as tall as its own tallest tile.
+    (0, 0) if an input has no size.
+    """
+    if not dimensions or not all(dims['width'] and dims['height'] for dims in dimensions):
+        return 0, 0
+    sizes = [plan_input_scale(dims, scale_width)[1:] for dims in dimensions]
+    return plan_tile_offsets(sizes, cols)[1]
+
+def combine_trial(videos, output_file, rows, cols, scale_width, quality, threads, video_info=None):
+    """Composite the clips of one trial and return the elapsed seconds"""
+    cmd = build_ffmpeg_command(videos, output_file, rows, cols, scale_width, quality,
+                               threads=threads, video_info=video_info)
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return time.perf_counter() - start
+
+def combine_trials(groups, output_dir, grid='auto', scale_width=640, quality='high', n_workers=None):
+    """
+    Combine every trial on a shared pool of workers
+
+    Each input is probed exactly once, and each of the n_workers ffmpeg
+    processes gets an equal share of the cores for its encoder threads.
+
+    Returns:
+        dict: Summary report with inputs, outputs, timings and errors per trial
+    """
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(groups) or 1))
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+
+    dimensions = {}
+    for videos in groups.values():
+        for video in videos:
+            if video not in dimensions:
+                dimensions[video] = probe_video_info(video)
+
+    report = {
+        'output_dir': output_dir,
+        'grid': grid,
+        'scale': scale_width,
+        'quality': quality,
+        'workers': n_workers,
+        'threads_per_worker': threads,
+        'trials': {},
+    }
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = {}
+        for trial, videos in groups.items():
+            rows, cols = determine_grid_layout(len(videos), grid)
+            output_file = os.path.join(output_dir, f'trial{trial}_combined.mp4')
+            width, height = get_grid_size([dimensions[video] for video in videos], rows, cols, scale_width)
+            report['trials'][str(trial)] = {
+                'inputs': [
+                    {
+                        'path': video,
+                        'width': dimensions[video]['width'],
+                        'height': dimensions[video]['height'],
+                        'pix_fmt': dimensions[video]['pix_fmt'],
+                        'codec_name': dimensions[video]['codec_name'],
+                        'fps': str(dimensions[video]['fps']),
+                    }
+                    for video in videos
+                ],
+                'layout': f'{rows}x{cols}',
+                'output': output_file,
+                'output_size': f'{width}x{height}',
+            }
+            future = executor.submit(
+                combine_trial, videos, output_file, rows, cols, scale_width, quality, threads,
+                [dimensions[video] for video in videos])
+            futures[future] = trial
+
+        for future in as_completed(futures):
+            trial = futures[future]
+            entry = report['trials'][str(trial)]
+            try:
+                entry['seconds'] = future.result()
+                entry['bytes'] = os.path.getsize(entry['output'])
+                print(f"Trial {trial}: combined {len(entry['inputs'])} clips in {entry['seconds']:.1f} s")
+            except subprocess.CalledProcessError as e:
+                entry['error'] = e.stderr.strip().splitlines()[-1] if e.stderr.strip() else str(e)
+                print(f"Trial {trial}: error combining clips: {entry['error']}")
+
+    report['seconds'] = time.perf_counter() - start
+    report['n_failed'] = sum('error' in entry for entry in report['trials'].values())
+    return report
+
+def main():
+    """Combine every trial found in the directory"""
+    args = parse_arguments()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: '{args.directory}' is not a directory")
+        sys.exit(1)
+
+    groups = find_trial_groups(args.directory)
+    if not groups:
+        print(f"No trial<n>_cam<m> clips found in '{args.directory}'")
+        sys.exit(1)
+
+    n_cams = {len(videos) for videos in groups.values()}
+    if len(n_cams) > 1:
+        print(f"Warning: trials have different numbers of cameras ({sorted(n_cams)})")
+
+    output_dir = args.output_dir or os.path.join(args.directory, 'combined')
+    print(f"Combining {len(groups)} trials into {output_dir}")
+
+    try:
+        report = combine_trials(groups, output_dir, args.grid, args.scale, args.quality, args.workers)
+    except (subprocess.CalledProcessError, ValueError) as e:
+        print(f"Error probing input videos: {e}")
+        sys.exit(1)
+    except FileNotFoundError:
+        print("Error: ffmpeg not found. Please install ffmpeg.")
+        sys.exit(1)
+
+    report_file = os.path.join(output_dir, REPORT_NAME)
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Combined {len(groups) - report['n_failed']}/{len(groups)} trials in {report['seconds']:.1f} s")
+    print(f"Report written to {report_file}")
+    if report['n_failed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -12,11 +12,23 @@ For usage, type python combine_videos.py -h
 #                                     
 
 import argparse
+import json
 import os
 import subprocess
 import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fractions import Fraction
 from pathlib import Path
 
+from ffmpeg_progress import ProgressMonitor, run_ffmpeg
+from output_cache import add_cache_args, make_cache_key, open_cache
+
+# Probed stream parameters per video path, see probe_video_info
+_probe_cache = {}
+_probe_lock = threading.Lock()
+
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(
@@ -50,6 +62,47 @@ def parse_arguments():
         choices=['low', 'medium', 'high'],
         help='Output video quality (default: high)'
     )
+    parser.add_argument(
+        '--chunks',
+        type=int,
+        default=1,
+        help='Split the timeline into this many chunks that are encoded in parallel '
+             'and joined without re-encoding (default: 1, a single encode)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Maximum chunks encoded at once (default: number of CPU cores)'
+    )
+    parser.add_argument(
+        '--engine',
+        choices=['ffmpeg', 'numpy'],
+        default='ffmpeg',
+        help='ffmpeg: one filter_complex graph, numpy: decode every input to a pipe and '
+             'tile the frames in NumPy before a single encoder (default: ffmpeg)'
+    )
+    parser.add_argument(
+        '--overlay',
+        action='store_true',
+        help='Draw camera number, frame index and timestamp on every tile (numpy engine)'
+    )
+    parser.add_argument(
+        '--sync-offsets',
+        type=lambda value: [float(offset) for offset in value.split(',')],
+        help='Comma separated seconds to shift each input by, e.g. 0,0.066 (numpy engine)'
+    )
+    parser.add_argument(
+        '--progress-log',
+        help='Append ffmpeg progress metrics (frame, fps, bitrate, speed, out_time) '
+             'to this JSON-lines file'
+    )
+    parser.add_argument(
+        '--no-progress',
+        action='store_true',
+        help='Do not show the live progress bar'
+    )
+    add_cache_args(parser)
     return parser.parse_args()
 
 def determine_grid_layout(num_videos, grid_option):
@@ -84,8 +137,154 @@ def get_quality_settings(quality):
     }
     return settings.get(quality, settings['high'])
 
-def build_ffmpeg_command(input_videos, output_file, rows, cols, scale_width, quality):
-    """Build the ffmpeg command for combining videos"""
+#  ____  _
+# |  _ \| | __ _ _ __
+# | |_) | |/ _` | '_ \
+# |  __/| | (_| | | | |
+# |_|   |_|\__,_|_| |_|
+#
+
+def probe_video_info(video):
+    """
+    Get stream parameters of a video with ffprobe, probing each file only once
+
+    Results are memoized per process and re-probed only if the file's
+    size or modification time changes.
+
+    Returns:
+        dict: width, height, pix_fmt, codec_name, fps (Fraction) and
+        duration (seconds, None if unknown)
+    """
+    stat = os.stat(video)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _probe_lock:
+        cached = _probe_cache.get(video)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,pix_fmt,codec_name,r_frame_rate,duration:format=duration',
+        '-of', 'json',
+        video,
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    probe = json.loads(result.stdout)
+    streams = probe.get('streams', [])
+    if not streams:
+        raise ValueError(f"No video stream found in '{video}'")
+    stream = streams[0]
+    duration = stream.get('duration') or probe.get('format', {}).get('duration')
+    info = {
+        'width': int(stream.get('width', 0)),
+        'height': int(stream.get('height', 0)),
+        'pix_fmt': stream.get('pix_fmt', ''),
+        'codec_name': stream.get('codec_name', ''),
+        'fps': Fraction(stream.get('r_frame_rate', '0/1')),
+        'duration': float(duration) if duration not in (None, 'N/A') else None,
+    }
+    with _probe_lock:
+        _probe_cache[video] = (signature, info)
+    return info
+
+def plan_input_scale(info, scale_width):
+    """
+    Choose the scale filter for one input
+
+    Inputs already at the target size are not scaled at all, exact integer
+    downscales use the cheap area (box) filter, everything else lanczos.
+
+    Returns:
+        tuple: (filter string or None, output width, output height)
+    """
+    width, height = info['width'], info['height']
+    # Keep the aspect ratio with an even height, as yuv420p requires
+    out_height = max(2, int(round(height * scale_width / width / 2)) * 2)
+    if (width, height) == (scale_width, out_height):
+        return None, width, height
+    if width > scale_width and width % scale_width == 0 and height == out_height * (width // scale_width):
+        flags = 'area'
+    else:
+        flags = 'lanczos'
+    return f'scale={scale_width}:{out_height}:flags={flags}', scale_width, out_height
+
+def plan_tile_offsets(sizes, cols):
+    """
+    Place tiles of the given (width, height) sizes on a grid
+
+    Every tile sits at the sum of the widest tile of the columns to its
+    left and the tallest tile of the rows above it.
+
+    Returns:
+        tuple: ([(x, y) of every tile], (canvas width, canvas height))
+    """
+    n = len(sizes)
+    n_rows = (n + cols - 1) // cols
+    col_widths = [max(sizes[i][0] for i in range(col, n, cols)) for col in range(min(cols, n))]
+    row_heights = [max(sizes[i][1] for i in range(row * cols, min(n, (row + 1) * cols)))
+                   for row in range(n_rows)]
+    offsets = [(sum(col_widths[:i % cols]), sum(row_heights[:i // cols])) for i in range(n)]
+    return offsets, (sum(col_widths), sum(row_heights))
+
+def plan_filter_graph(video_info, rows, cols, scale_width, pix_fmt='yuv420p', input_labels=None):
+    """
+    Plan the filter graph of a composite from probed input parameters
+
+    Skips no-op scales, picks the scaler per input, uses hstack/vstack only
+    when the tiles line up and otherwise xstack with exact pixel offsets,
+    and converts the pixel format once on the stacked frame.
+
+    Args:
+        input_labels: Pads to read the inputs from instead of [<i>:v], for
+            graphs that filter the inputs before compositing
+
+    Returns:
+        list: filter_complex parts, the last one ending in [outv]
+    """
+    if input_labels is None:
+        input_labels = [f'[{i}:v]' for i in range(len(video_info))]
+    filter_parts = []
+    labels = []
+    sizes = []
+    for i, info in enumerate(video_info):
+        scale_filter, width, height = plan_input_scale(info, scale_width)
+        if scale_filter is None:
+            labels.append(input_labels[i])
+        else:
+            filter_parts.append(f'{input_labels[i]}{scale_filter}[v{i}]')
+            labels.append(f'[v{i}]')
+        sizes.append((width, height))
+
+    n = len(video_info)
+    inputs_str = ''.join(labels)
+    if n == 1:
+        stack = f'{inputs_str}null'
+    elif rows == 1 and len({h for _, h in sizes}) == 1:
+        stack = f'{inputs_str}hstack=inputs={n}'
+    elif cols == 1 and len({w for w, _ in sizes}) == 1:
+        stack = f'{inputs_str}vstack=inputs={n}'
+    else:
+        offsets, _ = plan_tile_offsets(sizes, cols)
+        layout = '|'.join(f'{x}_{y}' for x, y in offsets)
+        stack = f'{inputs_str}xstack=inputs={n}:layout={layout}:fill=black'
+
+    if any(info['pix_fmt'] != pix_fmt for info in video_info):
+        stack += f',format={pix_fmt}'
+    filter_parts.append(f'{stack}[outv]')
+    return filter_parts
+
+def build_ffmpeg_command(input_videos, output_file, rows, cols, scale_width, quality,
+                         start_time=None, n_frames=None, frame_rate=None, threads=None,
+                         video_info=None):
+    """
+    Build the ffmpeg command for combining videos
+
+    With video_info (probe_video_info of every input) the filter graph is
+    planned by plan_filter_graph, otherwise every input is lanczos scaled.
+    start_time, n_frames, frame_rate and threads restrict the command to one
+    chunk of the timeline, see combine_chunked
+    """
     quality_settings = get_quality_settings(quality)
     
     # Start building the command
@@ -93,35 +292,46 @@ def build_ffmpeg_command(input_videos, output_file, rows, cols, scale_width, qua
     
     # Add input files
     for video in input_videos:
+        if start_time is not None:
+            # Input seeking decodes from the previous keyframe and drops
+            # everything before start_time, so the chunk starts on the exact frame
+            cmd.extend(['-ss', f'{start_time:.6f}'])
         cmd.extend(['-i', video])
     
     # Build filter complex
-    filter_parts = []
-    
-    # Scale all inputs to the same size
-    for i, video in enumerate(input_videos):
-        filter_parts.append(f'[{i}:v]scale={scale_width}:-1:flags=lanczos[v{i}]')
-    
-    # Create grid layout
-    inputs = []
-    for i in range(len(input_videos)):
-        inputs.append(f'[v{i}]')
-    
-    inputs_str = ''.join(inputs)
-    
-    if rows == 1 and cols == 1:
-        # Single video case
-        filter_parts.append(f'{inputs_str}concat=n=1:v=1:a=0[outv]')
-    elif rows == 1:
-        # Horizontal layout
-        filter_parts.append(f'{inputs_str}hstack=inputs={len(input_videos)}[outv]')
-    elif cols == 1:
-        # Vertical layout
-        filter_parts.append(f'{inputs_str}vstack=inputs={len(input_videos)}[outv]')
+    if video_info is not None:
+        filter_parts = plan_filter_graph(video_info, rows, cols, scale_width)
     else:
-        # Grid layout - need to handle this more carefully
-        # For simplicity, we'll use xstack for grid layouts
-        filter_parts.append(f'{inputs_str}xstack=inputs={len(input_videos)}:layout={generate_layout_string(len(input_videos), rows, cols, scale_width)}[outv]')
+        filter_parts = []
+    
+        # Scale all inputs to the same size
+        for i, video in enumerate(input_videos):
+            filter_parts.append(f'[{i}:v]scale={scale_width}:-1:flags=lanczos[v{i}]')
+    
+        # Create grid layout
+        inputs = []
+        for i in range(len(input_videos)):
+            inputs.append(f'[v{i}]')
+    
+        inputs_str = ''.join(inputs)
+    
+        if rows == 1 and cols == 1:
+            # Single video case
+            filter_parts.append(f'{inputs_str}concat=n=1:v=1:a=0[outv]')
+        elif rows == 1:
+            # Horizontal layout
+            filter_parts.append(f'{inputs_str}hstack=inputs={len(input_videos)}[outv]')
+        elif cols == 1:
+            # Vertical layout
+            filter_parts.append(f'{inputs_str}vstack=inputs={len(input_videos)}[outv]')
+        else:
+            # Grid layout - need to handle this more carefully
+            # For simplicity, we'll use xstack for grid layouts
+            filter_parts.append(f'{inputs_str}xstack=inputs={len(input_videos)}:layout={generate_layout_string(len(input_videos), rows, cols, scale_width)}[outv]')
+    
+    if start_time is not None:
+        # Every chunk starts at timestamp 0 so the chunks concatenate seamlessly
+        filter_parts[-1] = filter_parts[-1].replace('[outv]', ',setpts=PTS-STARTPTS[outv]')
     
     filter_complex = ';'.join(filter_parts)
     
@@ -135,6 +345,13 @@ def build_ffmpeg_command(input_videos, output_file, rows, cols, scale_width, qua
     cmd.extend(['-c:v', 'libx264'])
     cmd.extend(['-crf', quality_settings['crf']])
     cmd.extend(['-preset', quality_settings['preset']])
+    if frame_rate is not None:
+        # setpts drops the frame rate of the stream, restate it so no frames are duplicated
+        cmd.extend(['-r', str(frame_rate)])
+    if threads is not None:
+        cmd.extend(['-threads', str(threads)])
+    if n_frames is not None:
+        cmd.extend(['-frames:v', str(n_frames)])
     
     # Add output file
     cmd.extend(['-y', output_file])  # -y to overwrite output file
@@ -156,6 +373,114 @@ def generate_layout_string(num_videos, rows, cols, scale_width):
     
     return '|'.join(layout)
 
+#  ____ _                 _            _
+# / ___| |__  _   _ _ __ | | _____  __| |
+#| |   | '_ \| | | | '_ \| |/ / _ \/ _` |
+#| |___| | | | |_| | | | |   <  __/ (_| |
+# \____|_| |_|\__,_|_| |_|_|\_\___|\__,_|
+#
+
+def probe_timeline(video):
+    """
+    Get duration and frame rate of a video
+
+    Returns:
+        tuple: (duration in seconds, frames per second as a Fraction)
+    """
+    info = probe_video_info(video)
+    if info['duration'] is None:
+        raise ValueError(f"Duration of '{video}' is unknown")
+    return info['duration'], info['fps']
+
+def probe_output_timeline(input_videos):
+    """
+    Duration and frame rate of the combined video
+
+    The composite lasts as long as the longest input and runs at the
+    frame rate of the first input.
+    """
+    duration, fps = probe_timeline(input_videos[0])
+    for video in input_videos[1:]:
+        duration = max(duration, probe_timeline(video)[0])
+    return duration, fps
+
+def plan_chunks(n_frames, n_chunks):
+    """
+    Split frames [0, n_frames) into contiguous chunks of near-equal length
+
+    Returns:
+        list: (first_frame, n_frames) of every non-empty chunk
+    """
+    n_chunks = max(1, min(n_chunks, n_frames))
+    bounds = [i * n_frames // n_chunks for i in range(n_chunks + 1)]
+    return [(bounds[i], bounds[i + 1] - bounds[i]) for i in range(n_chunks)
+            if bounds[i + 1] > bounds[i]]
+
+def build_concat_command(list_file, output_file):
+    """Build the ffmpeg command that joins encoded chunks without re-encoding"""
+    return [
+        'ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_file,
+        '-c', 'copy', '-y', output_file,
+    ]
+
+def combine_chunked(input_videos, output_file, rows, cols, scale_width, quality,
+                    n_chunks, n_workers=None, callback=None, video_info=None):
+    """
+    Combine videos by encoding time chunks in parallel and concatenating them
+
+    Chunk boundaries fall on frames of the first input, every chunk is
+    seeked frame-accurately and limited to its frame count, so the joined
+    output has the same frames as a single encode. Each chunk gets an equal
+    share of the cores for its encoder threads.
+    Progress of every chunk is passed to callback (see ffmpeg_progress.run_ffmpeg)
+    labelled with its chunk number. video_info is passed on to
+    build_ffmpeg_command.
+    """
+    duration, fps = probe_output_timeline(input_videos)
+    chunks = plan_chunks(int(round(duration * fps)), n_chunks)
+
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(chunks)))
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    extension = os.path.splitext(output_file)[1] or '.mp4'
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix='.combine_chunks_') as chunk_dir:
+        chunk_files = []
+        commands = []
+        for chunk_num, (first_frame, chunk_frames) in enumerate(chunks):
+            chunk_file = os.path.join(chunk_dir, f'chunk{chunk_num:04d}{extension}')
+            chunk_files.append(chunk_file)
+            # Seek half a frame early so rounding never drops the first frame
+            start_time = float(max(first_frame - 0.5, 0) / fps)
+            # The last chunk runs to the end, like a single encode
+            limit = chunk_frames if chunk_num < len(chunks) - 1 else None
+            commands.append(build_ffmpeg_command(
+                input_videos, chunk_file, rows, cols, scale_width, quality,
+                start_time=start_time, n_frames=limit, frame_rate=fps, threads=threads,
+                video_info=video_info))
+
+        print(f"Encoding {len(chunks)} chunks with {n_workers} workers ({threads} threads each)")
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(run_ffmpeg, cmd, callback, float(chunk_frames / fps), chunk_num)
+                for chunk_num, (cmd, (_, chunk_frames)) in enumerate(zip(commands, chunks))
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # Relative paths in a concat list are resolved against the list file
+        list_file = os.path.join(chunk_dir, 'chunks.txt')
+        with open(list_file, 'w') as f:
+            for chunk_file in chunk_files:
+                f.write(f"file '{os.path.basename(chunk_file)}'\n")
+        subprocess.run(build_concat_command(list_file, output_file),
+                       check=True, capture_output=True, text=True)
+
 def validate_input_files(input_videos):
     """Validate that all input files exist and are readable"""
     for video in input_videos:
@@ -175,6 +500,16 @@ def main():
     if not validate_input_files(args.input_videos):
         sys.exit(1)
     
+    if args.engine != 'numpy' and (args.overlay or args.sync_offsets):
+        print("Error: --overlay and --sync-offsets need --engine numpy")
+        sys.exit(1)
+    if args.engine == 'numpy' and args.chunks > 1:
+        print("Error: --chunks is not supported by --engine numpy")
+        sys.exit(1)
+    if args.sync_offsets and len(args.sync_offsets) != len(args.input_videos):
+        print(f"Error: --sync-offsets needs one offset per input video ({len(args.input_videos)})")
+        sys.exit(1)
+    
     # Determine grid layout
     rows, cols = determine_grid_layout(len(args.input_videos), args.grid)
     
@@ -183,29 +518,103 @@ def main():
     print(f"Scale width: {args.scale}")
     print(f"Quality: {args.quality}")
     
-    # Build ffmpeg command
-    cmd = build_ffmpeg_command(
-        args.input_videos, 
-        args.output, 
-        rows, 
-        cols, 
-        args.scale, 
-        args.quality
-    )
+    # Same inputs and settings give the same output, reuse it if it is cached
+    cache = open_cache(args)
+    if cache is not None:
+        cache_params = {
+            'tool': 'combine_videos',
+            'grid': [rows, cols],
+            'scale': args.scale,
+            'quality': args.quality,
+            'engine': args.engine,
+            'chunks': args.chunks,
+            'overlay': args.overlay,
+            'sync_offsets': args.sync_offsets,
+            'format': os.path.splitext(args.output)[1],
+        }
+        cache_key = make_cache_key(args.input_videos, cache_params)
+        if cache.fetch(cache_key, args.output):
+            print(f"Using cached output, combined videos are in {args.output}")
+            return
     
-    print(f"Running command: {' '.join(cmd)}")
+    # Probe every input once; the results plan the filter graph and size the progress bar
+    try:
+        video_info = [probe_video_info(video) for video in args.input_videos]
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+        print(f"Warning: could not probe inputs ({e}), scaling every input")
+        video_info = None
+    total_seconds = None
+    if video_info is not None and all(info['duration'] is not None for info in video_info):
+        total_seconds = max(info['duration'] for info in video_info)
+    
+    if args.engine == 'numpy' and video_info is None:
+        print("Error: --engine numpy needs probed inputs")
+        sys.exit(1)
+    
+    if args.engine == 'ffmpeg' and args.chunks <= 1:
+        # Build ffmpeg command
+        cmd = build_ffmpeg_command(
+            args.input_videos, 
+            args.output, 
+            rows, 
+            cols, 
+            args.scale, 
+            args.quality,
+            video_info=video_info
+        )
+        
+        print(f"Running command: {' '.join(cmd)}")
+    
+    monitor = ProgressMonitor(total_seconds, args.progress_log, show_bar=not args.no_progress)
     
     try:
-        # Run ffmpeg command
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        if args.engine == 'numpy':
+            from numpy_compositor import composite_videos
+            composite_videos(
+                args.input_videos,
+                args.output,
+                rows,
+                cols,
+                args.scale,
+                args.quality,
+                video_info=video_info,
+                sync_offsets=args.sync_offsets,
+                overlay=args.overlay,
+                callback=monitor
+            )
+        elif args.chunks > 1:
+            combine_chunked(
+                args.input_videos,
+                args.output,
+                rows,
+                cols,
+                args.scale,
+                args.quality,
+                args.chunks,
+                args.workers,
+                callback=monitor,
+                video_info=video_info
+            )
+        else:
+            # Run ffmpeg command, streaming its progress
+            run_ffmpeg(cmd, monitor, total_seconds)
+        monitor.close()
+        if cache is not None:
+            cache.store(cache_key, args.output, cache_params)
         print(f"Successfully combined videos into {args.output}")
     except subprocess.CalledProcessError as e:
+        monitor.close()
         print(f"Error combining videos: {e}")
         print(f"FFmpeg stderr: {e.stderr}")
         sys.exit(1)
     except FileNotFoundError:
+        monitor.close()
         print("Error: ffmpeg not found. Please install ffmpeg.")
         sys.exit(1)
+    except ValueError as e:
+        monitor.close()
+        print(f"Error: {e}")
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
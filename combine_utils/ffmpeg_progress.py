@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Live progress and performance telemetry for ffmpeg runs
+ffmpeg is started with -progress pipe:1 and every key=value block it writes
+is turned into a metrics dict (frame, fps, bitrate, speed, out_time, ETA)
+that is handed to a callback, e.g. ProgressMonitor, which drives a progress
+bar and an optional JSON-lines log
+"""
+
+import json
+import subprocess
+import threading
+import time
+
+from tqdm import tqdm
+
+# Integer fields of an ffmpeg progress block
+INT_FIELDS = ('frame', 'total_size', 'dup_frames', 'drop_frames')
+
+def add_progress_args(cmd):
+    """Copy of an ffmpeg command that writes progress blocks to stdout instead of stats to stderr"""
+    return [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+
+def _parse_number(value, suffix=''):
+    """Parse an ffmpeg progress value, None for N/A"""
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def parse_progress_block(fields):
+    """
+    Convert one ffmpeg -progress block into metrics
+
+    Args:
+        fields: dict of the raw key=value pairs of the block
+
+    Returns:
+        dict: frame, fps, bitrate_kbps, speed, out_time (s), total_size,
+        dup_frames, drop_frames and progress ('continue' or 'end');
+        values ffmpeg reports as N/A are None
+    """
+    metrics = {}
+    for key in INT_FIELDS:
+        value = _parse_number(fields.get(key, 'N/A'))
+        metrics[key] = int(value) if value is not None else None
+    metrics['fps'] = _parse_number(fields.get('fps', 'N/A'))
+    metrics['bitrate_kbps'] = _parse_number(fields.get('bitrate', 'N/A'), 'kbits/s')
+    metrics['speed'] = _parse_number(fields.get('speed', 'N/A'), 'x')
+    out_time_us = _parse_number(fields.get('out_time_us', 'N/A'))
+    metrics['out_time'] = out_time_us / 1e6 if out_time_us is not None and out_time_us >= 0 else None
+    metrics['progress'] = fields.get('progress', 'continue')
+    return metrics
+
+def run_ffmpeg(cmd, callback=None, total_seconds=None, label=None):
+    """
+    Run an ffmpeg command and report its progress while it runs
+
+    Every progress block (about two per second) is passed to callback as a
+    metrics dict from parse_progress_block, extended with elapsed (s),
+    eta (s, if total_seconds is known), stalled (s since out_time last
+    advanced) and label.
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg fails, with its stderr
+    """
+    process = subprocess.Popen(
+        add_progress_args(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # Drain stderr on its own thread so a chatty ffmpeg never blocks on a full pipe
+    stderr_lines = []
+    stderr_thread = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    start = time.perf_counter()
+    last_out_time = None
+    last_advance = start
+    fields = {}
+    for line in process.stdout:
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            continue
+        fields[key] = value
+        if key != 'progress':
+            continue
+
+        now = time.perf_counter()
+        metrics = parse_progress_block(fields)
+        fields = {}
+        out_time = metrics['out_time']
+        if out_time is not None and (last_out_time is None or out_time > last_out_time):
+            last_out_time = out_time
+            last_advance = now
+        metrics['elapsed'] = now - start
+        metrics['stalled'] = now - last_advance
+        metrics['eta'] = None
+        if total_seconds and out_time:
+            metrics['eta'] = max(total_seconds - out_time, 0.0) * metrics['elapsed'] / out_time
+        metrics['label'] = label
+        if callback is not None:
+            callback(metrics)
+
+    returncode = process.wait()
+    stderr_thread.join()
+    stderr = ''.join(stderr_lines)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+    return stderr
+
+class ProgressMonitor:
+    """
+    Progress callback that drives a progress bar and a JSON-lines log
+
+    Several ffmpeg runs (e.g. parallel chunks) can report to one monitor;
+    their out_time is summed per label so the bar shows overall progress.
+    """
+
+    def __init__(self, total_seconds=None, log_file=None, show_bar=True, callback=None, desc='Encoding'):
+        """
+        Args:
+            total_seconds: Output duration, used for the bar total
+            log_file: Path of a JSON-lines log that every metrics dict is appended to
+            show_bar: Show a live progress bar
+            callback: Further function called with every metrics dict
+            desc: Label of the progress bar
+        """
+        self.total_seconds = total_seconds
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._out_times = {}
+        self._log = open(log_file, 'a') if log_file else None
+        self._bar = None
+        if show_bar:
+            self._bar = tqdm(
+                total=round(total_seconds, 2) if total_seconds else None,
+                unit='s', desc=desc,
+                bar_format='{l_bar}{bar}| {n:.1f}/{total_fmt} s [{elapsed}<{remaining}{postfix}]')
+
+    def __call__(self, metrics):
+        with self._lock:
+            if metrics['out_time'] is not None:
+                self._out_times[metrics['label']] = metrics['out_time']
+            if self._bar is not None:
+                done = sum(self._out_times.values())
+                if self.total_seconds:
+                    done = min(done, self.total_seconds)
+                self._bar.n = round(done, 2)
+                postfix = {}
+                if metrics['fps'] is not None:
+                    postfix['fps'] = f"{metrics['fps']:.1f}"
+                if metrics['speed'] is not None:
+                    postfix['speed'] = f"{metrics['speed']:.2f}x"
+                if metrics['stalled'] >= 10:
+                    postfix['stalled'] = f"{metrics['stalled']:.0f}s"
+                self._bar.set_postfix(postfix, refresh=False)
+                self._bar.refresh()
+            if self._log is not None:
+                self._log.write(json.dumps(dict(metrics, time=time.time())) + '\n')
+                self._log.flush()
+        if self.callback is not None:
+            self.callback(metrics)
+
+    def close(self):
+        """Close the progress bar and the log"""
+        if self._bar is not None:
+            self._bar.close()
+        if self._log is not None:
+            self._log.close()
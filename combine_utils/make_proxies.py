@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Script to make review proxies of every recorded session under a directory
+One ffmpeg pass per session decodes every camera once and writes a small,
+reduced frame rate grid preview with a fast preset together with a
+thumbnail sprite sheet per camera (one tile every few seconds) and a JSON
+index of where every thumbnail sits. Sessions whose proxies are up to date
+are skipped
+For usage, type python make_proxies.py -h
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fractions import Fraction
+
+from tqdm import tqdm
+
+from combine_videos import determine_grid_layout, plan_filter_graph, plan_input_scale, probe_video_info
+from ffmpeg_progress import run_ffmpeg
+from session_files import find_sessions, join_session_parts, parts_signature
+
+# Encoder settings of the preview, tuned for speed rather than size
+PROXY_PRESET = 'veryfast'
+PROXY_CRF = '30'
+
+# mjpeg qscale of the sprite sheets (2 best - 31 worst)
+SPRITE_QUALITY = '5'
+
+# Bump when the proxy layout changes so existing proxies are remade
+PROXY_VERSION = 1
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Make a low-resolution preview and thumbnail sprites of every session under a directory'
+    )
+    parser.add_argument(
+        'root',
+        help='Directory to search for sessions (e.g. ./recorded_videos)'
+    )
+    parser.add_argument(
+        '-o', '--output-dir',
+        help='Directory for the proxies of all sessions (default: <session directory>/proxy)'
+    )
+    parser.add_argument(
+        '--grid',
+        choices=['2x1', '1x2', '2x2', '3x1', '1x3', 'auto'],
+        default='auto',
+        help='Grid layout of the preview (default: auto)'
+    )
+    parser.add_argument(
+        '--scale',
+        type=int,
+        default=320,
+        help='Width of every camera in the preview (default: 320)'
+    )
+    parser.add_argument(
+        '--fps',
+        type=float,
+        default=5,
+        help='Frame rate of the preview (default: 5)'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=10,
+        help='Seconds between thumbnails in the sprite sheets (default: 10)'
+    )
+    parser.add_argument(
+        '--tile-width',
+        type=int,
+        default=160,
+        help='Width of every thumbnail (default: 160)'
+    )
+    parser.add_argument(
+        '--columns',
+        type=int,
+        default=10,
+        help='Thumbnails per sprite sheet row (default: 10)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Sessions processed at once (default: number of CPU cores)'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Remake proxies that are already up to date'
+    )
+    return parser.parse_args()
+
+def get_proxy_params(args):
+    """Everything the proxies depend on besides the camera videos"""
+    return {
+        'version': PROXY_VERSION,
+        'grid': args.grid,
+        'scale': args.scale,
+        'fps': args.fps,
+        'interval': args.interval,
+        'tile_width': args.tile_width,
+        'columns': args.columns,
+    }
+
+def get_proxy_paths(session, output_dir=None):
+    """
+    Paths of the proxy files of a session
+
+    Returns:
+        dict: proxy (preview video), index (JSON) and sprites (one per camera)
+    """
+    directory = output_dir or os.path.join(session['directory'], 'proxy')
+    name = session['name']
+    return {
+        'proxy': os.path.join(directory, f'{name}_proxy.mp4'),
+        'index': os.path.join(directory, f'{name}_sprite.json'),
+        'sprites': [os.path.join(directory, f'{name}_sprite_cam{i}.jpg')
+                    for i in range(len(session['video_files']))],
+    }
+
+def plan_sprite(info, interval, tile_width, columns):
+    """
+    Lay out the thumbnails of one camera
+
+    Thumbnails are taken at 0, interval, 2 * interval, ... up to the end of
+    the video and fill the sheet row by row.
+
+    Returns:
+        dict: tile_width, tile_height, columns, rows, the scale filter
+        (None if the video is already tile sized) and tiles, a list of
+        time, x and y of every thumbnail
+    """
+    scale_filter, width, height = plan_input_scale(info, tile_width)
+    n_tiles = max(1, math.ceil((info['duration'] or 0) / interval))
+    columns = min(columns, n_tiles)
+    rows = math.ceil(n_tiles / columns)
+    return {
+        'tile_width': width,
+        'tile_height': height,
+        'columns': columns,
+        'rows': rows,
+        'scale_filter': scale_filter,
+        'tiles': [
+            {'time': round(i * interval, 3), 'x': (i % columns) * width, 'y': (i // columns) * height}
+            for i in range(n_tiles)
+        ],
+    }
+
+def build_proxy_command(videos, video_info, paths, sprites, rows, cols, scale_width, fps, interval, threads=None):
+    """
+    Build the single ffmpeg command that writes the preview and every sprite sheet
+
+    Each input is decoded once, reduced to the preview frame rate and split
+    between the preview grid and its thumbnail sheet.
+    """
+    filter_parts = []
+    for i, (info, sprite) in enumerate(zip(video_info, sprites)):
+        # Never raise the frame rate, fps would only duplicate frames
+        rate = f'fps={fps},' if info['fps'] > Fraction(fps) else ''
+        filter_parts.append(f'[{i}:v]{rate}split=2[c{i}][t{i}]')
+        # The first frame of every interval, so thumbnail k shows exactly k * interval
+        frame_duration = 1 / min(float(info['fps']), fps)
+        thumbnail = f'[t{i}]select=lt(mod(t\\,{interval})\\,{frame_duration:.6f})'
+        if sprite['scale_filter'] is not None:
+            thumbnail += f",{sprite['scale_filter']}"
+        filter_parts.append(f"{thumbnail},tile={sprite['columns']}x{sprite['rows']}[s{i}]")
+    filter_parts.extend(plan_filter_graph(
+        video_info, rows, cols, scale_width, input_labels=[f'[c{i}]' for i in range(len(videos))]))
+
+    cmd = ['ffmpeg', '-nostdin', '-y']
+    for video in videos:
+        cmd.extend(['-i', video])
+    cmd.extend(['-filter_complex', ';'.join(filter_parts)])
+    cmd.extend([
+        '-map', '[outv]',
+        '-c:v', 'libx264',
+        '-preset', PROXY_PRESET,
+        '-crf', PROXY_CRF,
+        '-movflags', '+faststart',
+    ])
+    if threads is not None:
+        cmd.extend(['-threads', str(threads)])
+    cmd.append(paths['proxy'])
+    for i, sprite_file in enumerate(paths['sprites']):
+        # The sheet is padded at the end of the video, so exactly one image is written
+        cmd.extend(['-map', f'[s{i}]', '-frames:v', '1', '-q:v', SPRITE_QUALITY, '-update', '1', sprite_file])
+    return cmd
+
+def is_proxy_fresh(paths, inputs, params):
+    """Check whether the proxies were made from the same videos with the same settings"""
+    try:
+        with open(paths['index']) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if index.get('inputs') != inputs or index.get('params') != params:
+        return False
+    return all(os.path.exists(path) for path in [paths['proxy']] + paths['sprites'])
+
+def make_session_proxy(session, params, output_dir=None, threads=None, force=False):
+    """
+    Make the preview, sprite sheets and index of one session
+
+    Returns:
+        dict or None: The index, or None if the proxies were up to date
+    """
+    paths = get_proxy_paths(session, output_dir)
+    inputs = [dict(parts_signature(parts), path=video) for parts, video in zip(session['video_parts'], session['video_files'])]
+    if not force and is_proxy_fresh(paths, inputs, params):
+        return None
+    join_session_parts(session)
+
+    video_info = [probe_video_info(video) for video in session['video_files']]
+    rows, cols = determine_grid_layout(len(video_info), params['grid'])
+    sprites = [plan_sprite(info, params['interval'], params['tile_width'], params['columns'])
+               for info in video_info]
+
+    os.makedirs(os.path.dirname(paths['proxy']), exist_ok=True)
+    cmd = build_proxy_command(session['video_files'], video_info, paths, sprites, rows, cols,
+                              params['scale'], params['fps'], params['interval'], threads)
+    run_ffmpeg(cmd)
+
+    index = {
+        'session': session['name'],
+        'proxy': os.path.basename(paths['proxy']),
+        'proxy_fps': params['fps'],
+        'interval': params['interval'],
+        'cameras': [
+            {
+                'video': video,
+                'sprite': os.path.basename(sprite_file),
+                **{key: value for key, value in sprite.items() if key != 'scale_filter'},
+            }
+            for video, sprite_file, sprite in zip(session['video_files'], paths['sprites'], sprites)
+        ],
+        'inputs': inputs,
+        'params': params,
+    }
+    tmp_path = paths['index'] + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, paths['index'])
+    return index
+
+def main():
+    """Make proxies of every session found under the root directory"""
+    args = parse_arguments()
+
+    sessions = [session for session in find_sessions(args.root) if session['video_files']]
+    print(f"Found {len(sessions)} sessions with camera videos")
+    if not sessions:
+        sys.exit(1)
+
+    params = get_proxy_params(args)
+    n_workers = max(1, min(args.workers, len(sessions)))
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+    n_failed = 0
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = {
+            executor.submit(make_session_proxy, session, params, args.output_dir, threads, args.force): session
+            for session in sessions
+        }
+        with tqdm(total=len(sessions), unit='session') as pbar:
+            for future in as_completed(futures):
+                session = futures[future]
+                try:
+                    index = future.result()
+                except subprocess.CalledProcessError as e:
+                    error = e.stderr.strip().splitlines()[-1] if e.stderr and e.stderr.strip() else str(e)
+                    tqdm.write(f"Error making proxy of {session['name']}: {error}")
+                    n_failed += 1
+                except (OSError, ValueError) as e:
+                    tqdm.write(f"Error making proxy of {session['name']}: {e}")
+                    n_failed += 1
+                else:
+                    if index is None:
+                        tqdm.write(f"{session['name']}: proxies up to date")
+                    else:
+                        n_tiles = sum(len(camera['tiles']) for camera in index['cameras'])
+                        tqdm.write(f"{session['name']}: wrote {index['proxy']} and {n_tiles} thumbnails")
+                pbar.update(1)
+
+    if n_failed:
+        print(f"\n{n_failed} session(s) had errors")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
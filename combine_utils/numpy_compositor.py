@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+NumPy tiling compositor for combine_videos.py
+Every input is decoded by its own ffmpeg rawvideo pipe, already scaled to
+its tile, and the frames are tiled into one preallocated canvas that is
+reused for every output frame and piped to a single ffmpeg encoder. The hot
+loop allocates nothing, so per-camera sync offsets and frame index and
+timestamp overlays cost only the pixels they touch
+"""
+
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from combine_videos import (
+    get_quality_settings,
+    plan_input_scale,
+    plan_tile_offsets,
+    probe_video_info,
+)
+
+# 5x7 bitmap glyphs of the overlay text
+GLYPHS = {
+    '0': ['01110', '10001', '10011', '10101', '11001', '10001', '01110'],
+    '1': ['00100', '01100', '00100', '00100', '00100', '00100', '01110'],
+    '2': ['01110', '10001', '00001', '00010', '00100', '01000', '11111'],
+    '3': ['11111', '00010', '00100', '00010', '00001', '10001', '01110'],
+    '4': ['00010', '00110', '01010', '10010', '11111', '00010', '00010'],
+    '5': ['11111', '10000', '11110', '00001', '00001', '10001', '01110'],
+    '6': ['00110', '01000', '10000', '11110', '10001', '10001', '01110'],
+    '7': ['11111', '00001', '00010', '00100', '01000', '01000', '01000'],
+    '8': ['01110', '10001', '10001', '01110', '10001', '10001', '01110'],
+    '9': ['01110', '10001', '10001', '01111', '00001', '00010', '01100'],
+    '.': ['00000', '00000', '00000', '00000', '00000', '01100', '01100'],
+    ':': ['00000', '01100', '01100', '00000', '01100', '01100', '00000'],
+    '-': ['00000', '00000', '00000', '11111', '00000', '00000', '00000'],
+    'c': ['00000', '00000', '01110', '10000', '10000', '10001', '01110'],
+    'a': ['00000', '00000', '01110', '00001', '01111', '10001', '01111'],
+    'm': ['00000', '00000', '11010', '10101', '10101', '10001', '10001'],
+    'f': ['00110', '01001', '01000', '11100', '01000', '01000', '01000'],
+    's': ['00000', '00000', '01110', '10000', '01110', '00001', '11110'],
+    ' ': ['00000', '00000', '00000', '00000', '00000', '00000', '00000'],
+}
+
+class TextOverlay:
+    """
+    Draws short labels into a frame without allocating
+
+    Glyph masks are scaled once up front; drawing copies a background box
+    and the glyph pixels into the frame in place.
+    """
+
+    def __init__(self, scale=2, color=(255, 255, 255), background=(0, 0, 0)):
+        self.scale = scale
+        self.color = np.array(color, dtype=np.uint8)
+        self.background = np.array(background, dtype=np.uint8)
+        block = np.ones((scale, scale), dtype=bool)
+        self.masks = {
+            char: np.kron(np.array([[c == '1' for c in row] for row in rows]), block)[:, :, None]
+            for char, rows in GLYPHS.items()
+        }
+        self.char_width = 6 * scale
+        self.height = 9 * scale
+
+    def draw(self, frame, text, x=0, y=0):
+        """Draw text with its top left corner at (x, y), clipped to the frame"""
+        height, width = frame.shape[:2]
+        box = frame[y:min(y + self.height, height), x:min(x + len(text) * self.char_width, width)]
+        box[...] = self.background
+        gx = x + self.scale
+        gy = y + self.scale
+        for char in text:
+            mask = self.masks.get(char, self.masks[' '])
+            if gx + mask.shape[1] > width or gy + mask.shape[0] > height:
+                break
+            np.copyto(frame[gy:gy + mask.shape[0], gx:gx + mask.shape[1]], self.color, where=mask)
+            gx += self.char_width
+
+def build_decode_command(video, width, height, scale_filter=None, fps=None, source_fps=None, start_time=0.0):
+    """Build the ffmpeg command that decodes one input to rgb24 tiles on stdout"""
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+    if start_time > 0:
+        cmd.extend(['-ss', f'{start_time:.6f}'])
+    cmd.extend(['-i', video, '-map', '0:v:0'])
+    filters = []
+    if fps is not None and source_fps != fps:
+        # Resample to the composite frame rate, like the framesync of the stack filters
+        filters.append(f'fps={fps}')
+    if scale_filter is not None:
+        filters.append(scale_filter)
+    if filters:
+        cmd.extend(['-vf', ','.join(filters)])
+    cmd.extend(['-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-'])
+    return cmd
+
+def build_encode_command(output_file, width, height, fps, quality, threads=None):
+    """Build the ffmpeg command that encodes rgb24 canvases from stdin"""
+    quality_settings = get_quality_settings(quality)
+    cmd = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps),
+        '-i', '-',
+        '-c:v', 'libx264',
+        '-crf', quality_settings['crf'],
+        '-preset', quality_settings['preset'],
+        '-pix_fmt', 'yuv420p',
+    ]
+    if threads is not None:
+        cmd.extend(['-threads', str(threads)])
+    cmd.extend(['-y', output_file])
+    return cmd
+
+def _drain_stderr(process):
+    """
+    Read the stderr of a process on its own thread
+
+    A chatty ffmpeg (e.g. warnings about a damaged input) never blocks on a
+    full pipe that is only read after it exits.
+
+    Returns:
+        tuple: (thread, list that receives the stderr bytes)
+    """
+    chunks = []
+    thread = threading.Thread(target=lambda: chunks.append(process.stderr.read()), daemon=True)
+    thread.start()
+    return thread, chunks
+
+def _read_frame(stream, buffer):
+    """Fill buffer with the next frame, False at end of stream"""
+    view = memoryview(buffer.reshape(-1))
+    n_read = 0
+    while n_read < len(view):
+        n = stream.readinto(view[n_read:])
+        if not n:
+            return False
+        n_read += n
+    return True
+
+def composite_videos(input_videos, output_file, rows, cols, scale_width, quality,
+                     video_info=None, sync_offsets=None, overlay=False, callback=None, threads=None):
+    """
+    Combine videos by tiling decoded frames in NumPy and piping them to one encoder
+
+    Args:
+        sync_offsets: Seconds to shift every input by; a positive offset
+            skips the start of that input, a negative one shows black
+            until the input starts
+        overlay: Draw camera number, source frame index and source time on
+            every tile
+        callback: Called about twice a second with progress metrics in the
+            format of ffmpeg_progress.run_ffmpeg
+
+    Returns:
+        int: Number of frames written
+    """
+    if video_info is None:
+        video_info = [probe_video_info(video) for video in input_videos]
+    sync_offsets = list(sync_offsets or [0.0] * len(input_videos))
+    if len(sync_offsets) != len(input_videos):
+        raise ValueError(f"Expected {len(input_videos)} sync offsets, got {len(sync_offsets)}")
+
+    fps = video_info[0]['fps']
+    scales = [plan_input_scale(info, scale_width) for info in video_info]
+    sizes = [(width, height) for _, width, height in scales]
+    offsets, (canvas_width, canvas_height) = plan_tile_offsets(sizes, cols)
+    total_seconds = None
+    if all(info['duration'] is not None for info in video_info):
+        total_seconds = max(info['duration'] - offset for info, offset in zip(video_info, sync_offsets))
+
+    # Everything the loop touches is allocated once here
+    canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
+    tiles = [canvas[y:y + h, x:x + w] for (x, y), (w, h) in zip(offsets, sizes)]
+    buffers = [np.zeros((h, w, 3), dtype=np.uint8) for w, h in sizes]
+    lead_in = [max(0, int(round(-offset * fps))) for offset in sync_offsets]
+    text = TextOverlay(scale=2) if overlay else None
+
+    encoder = subprocess.Popen(
+        build_encode_command(output_file, canvas_width, canvas_height, fps, quality, threads),
+        stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    encoder_thread, encoder_stderr = _drain_stderr(encoder)
+
+    decoders = []
+    decoder_stderr = []
+    try:
+        for video, info, (scale_filter, width, height), offset in zip(
+                input_videos, video_info, scales, sync_offsets):
+            cmd = build_decode_command(video, width, height, scale_filter, fps, info['fps'], max(offset, 0.0))
+            decoders.append(subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE))
+            decoder_stderr.append(_drain_stderr(decoders[-1]))
+
+        active = [True] * len(decoders)
+        encoder_failed = False
+        n_frames = 0
+        start = time.perf_counter()
+        last_report = start
+        while True:
+            for i, decoder in enumerate(decoders):
+                if n_frames < lead_in[i] or not active[i]:
+                    # Not started yet (black) or ended (last frame repeats)
+                    continue
+                if _read_frame(decoder.stdout, buffers[i]):
+                    tiles[i][...] = buffers[i]
+                else:
+                    active[i] = False
+            if not any(active):
+                break
+
+            if text is not None:
+                for i, (x, y) in enumerate(offsets):
+                    source_frame = n_frames - lead_in[i]
+                    source_time = n_frames / fps + sync_offsets[i]
+                    text.draw(canvas, f'cam{i} f{max(source_frame, 0):06d} {source_time:9.3f}s',
+                              x + 4, y + 4)
+
+            try:
+                encoder.stdin.write(canvas)
+            except BrokenPipeError:
+                # The encoder died, its error is raised below
+                encoder_failed = True
+                break
+            n_frames += 1
+
+            now = time.perf_counter()
+            if callback is not None and now - last_report >= 0.5:
+                last_report = now
+                callback(_make_metrics(n_frames, fps, now - start, total_seconds, 'continue'))
+
+        if encoder_failed:
+            # Nothing reads the decoders any more, they would block on their full pipes
+            for decoder in decoders:
+                decoder.kill()
+                decoder.wait()
+        else:
+            for decoder, (thread, stderr) in zip(decoders, decoder_stderr):
+                if decoder.wait() != 0:
+                    thread.join()
+                    raise subprocess.CalledProcessError(
+                        decoder.returncode, decoder.args, stderr=b''.join(stderr).decode(errors='replace'))
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = encoder.wait()
+        encoder_thread.join()
+        if returncode != 0 or encoder_failed:
+            raise subprocess.CalledProcessError(
+                returncode, encoder.args, stderr=b''.join(encoder_stderr).decode(errors='replace'))
+        if callback is not None:
+            callback(_make_metrics(n_frames, fps, time.perf_counter() - start, total_seconds, 'end'))
+        return n_frames
+    finally:
+        for decoder in decoders:
+            decoder.kill()
+            decoder.wait()
+        if encoder.poll() is None:
+            encoder.kill()
+            encoder.wait()
+
+def _make_metrics(n_frames, fps, elapsed, total_seconds, progress):
+    """Progress metrics in the format of ffmpeg_progress.parse_progress_block"""
+    out_time = float(n_frames / fps)
+    return {
+        'frame': n_frames,
+        'fps': n_frames / elapsed if elapsed > 0 else None,
+        'bitrate_kbps': None,
+        'speed': out_time / elapsed if elapsed > 0 else None,
+        'out_time': out_time,
+        'total_size': None,
+        'dup_frames': None,
+        'drop_frames': None,
+        'progress': progress,
+        'elapsed': elapsed,
+        'stalled': 0.0,
+        'eta': (max(total_seconds - out_time, 0.0) * elapsed / out_time
+                if total_seconds and out_time else None),
+        'label': None,
+    }
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for combined and converted videos
+Outputs are stored under a key made from a cheap fingerprint of every input
+(size, mtime and a hash of a few sampled chunks) and the full encode
+parameters, so rerunning the same encode on the same inputs reuses the
+cached result instead of encoding again. Entries are reflinked where the
+filesystem supports it, so storing and fetching shares blocks instead of
+copying them. The cache is capped in size and evicts the least recently
+used entries first
+For usage, type python output_cache.py -h
+"""
+
+import argparse
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+# Bump when a change to the pipelines makes old outputs invalid
+CACHE_VERSION = 1
+
+# Environment variables that override the default location and size cap
+CACHE_DIR_ENV = 'MULTICAM_OUTPUT_CACHE'
+CACHE_MAX_GB_ENV = 'MULTICAM_OUTPUT_CACHE_GB'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'multicam_recording', 'outputs')
+DEFAULT_MAX_GB = 20.0
+
+# ioctl cloning the blocks of one file into another on copy-on-write
+# filesystems (Btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+# Errors of FICLONE on filesystems or file pairs that cannot share blocks
+CLONE_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EPERM}
+
+# Chunks hashed per input: the first and last and evenly spaced ones in between
+SAMPLE_COUNT = 8
+SAMPLE_SIZE = 1 << 16
+
+# Fingerprints already computed in this process, keyed by path
+_fingerprint_cache = {}
+_fingerprint_lock = threading.Lock()
+
+def add_cache_args(parser, opt_in=True):
+    """
+    Add the cache options shared by the scripts that use the cache
+
+    Args:
+        opt_in: Add --cache, without which open_cache gives no cache
+    """
+    if opt_in:
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='Reuse outputs of earlier runs with the same inputs and settings, and keep this one'
+        )
+    parser.add_argument(
+        '--cache-dir',
+        default=os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR),
+        help=f'Directory of the output cache (default: ${CACHE_DIR_ENV} or {DEFAULT_CACHE_DIR})'
+    )
+    parser.add_argument(
+        '--cache-max-gb',
+        type=float,
+        default=float(os.environ.get(CACHE_MAX_GB_ENV, DEFAULT_MAX_GB)),
+        help=f'Size cap of the output cache in GB (default: ${CACHE_MAX_GB_ENV} or {DEFAULT_MAX_GB:g})'
+    )
+
+def clone_file(source, destination):
+    """
+    Copy source to destination, sharing its blocks where the filesystem can
+
+    A reflink is used rather than a hard link, so an encode that later
+    overwrites either file in place never changes the other. Falls back to
+    a full copy where reflinks are not supported.
+    """
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError as e:
+            if e.errno not in CLONE_UNSUPPORTED:
+                raise
+        shutil.copyfileobj(src, dst, 1 << 20)
+
+def sample_hash(path, size=None):
+    """SHA-256 of SAMPLE_COUNT chunks of SAMPLE_SIZE bytes spread over the file"""
+    size = os.path.getsize(path) if size is None else size
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if size <= SAMPLE_COUNT * SAMPLE_SIZE:
+            digest.update(f.read())
+        else:
+            step = (size - SAMPLE_SIZE) // (SAMPLE_COUNT - 1)
+            for i in range(SAMPLE_COUNT):
+                f.seek(i * step)
+                digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+def fingerprint_file(path):
+    """
+    Cheap fingerprint of a file
+
+    Returns:
+        dict: size, mtime_ns and sample_sha256; never reads more than
+        SAMPLE_COUNT * SAMPLE_SIZE bytes
+    """
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _fingerprint_lock:
+        cached = _fingerprint_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    fingerprint = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sample_sha256': sample_hash(path, stat.st_size),
+    }
+    with _fingerprint_lock:
+        _fingerprint_cache[path] = (signature, fingerprint)
+    return fingerprint
+
+def make_cache_key(input_files, params):
+    """
+    Key of an output made from the given inputs with the given parameters
+
+    Input order matters (it sets the grid position); input paths do not,
+    so a moved but unchanged file still hits.
+    """
+    payload = {
+        'version': CACHE_VERSION,
+        'inputs': [fingerprint_file(path) for path in input_files],
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class OutputCache:
+    """
+    Directory of cached outputs with LRU eviction
+
+    Every entry is a <key><ext> file and a <key>.json record of its size,
+    sample hash and parameters. The mtime of the data file is its last use.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=int(DEFAULT_MAX_GB * 1e9)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _record_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _read_record(self, key):
+        try:
+            with open(self._record_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, key):
+        """Path of the cached output for key, or None on a miss"""
+        record = self._read_record(key)
+        if record is None:
+            return None
+        path = os.path.join(self.directory, key + record['ext'])
+        try:
+            if os.path.getsize(path) != record['size']:
+                return None
+        except OSError:
+            return None
+        return path
+
+    def fetch(self, key, output_file):
+        """
+        Write the cached output for key to output_file
+
+        Nothing is copied if output_file already holds the cached content.
+
+        Returns:
+            bool: True on a hit
+        """
+        path = self.lookup(key)
+        if path is None:
+            return False
+        record = self._read_record(key)
+        # Mark as recently used
+        os.utime(path)
+        if os.path.exists(output_file) and os.path.getsize(output_file) == record['size'] \
+                and sample_hash(output_file) == record['sample_sha256']:
+            return True
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        os.makedirs(output_dir, exist_ok=True)
+        tmp_path = output_file + '.cache-tmp'
+        clone_file(path, tmp_path)
+        os.replace(tmp_path, output_file)
+        return True
+
+    def store(self, key, output_file, params=None):
+        """
+        Add output_file to the cache under key and evict down to the size cap
+
+        Outputs larger than the whole cap are not stored.
+
+        Returns:
+            bool: True if the output was stored
+        """
+        size = os.path.getsize(output_file)
+        if size > self.max_bytes:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        ext = os.path.splitext(output_file)[1]
+        path = os.path.join(self.directory, key + ext)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        clone_file(output_file, tmp_path)
+        os.replace(tmp_path, path)
+        record = {
+            'ext': ext,
+            'size': size,
+            'sample_sha256': sample_hash(path, size),
+            'source': os.path.abspath(output_file),
+            'params': params,
+            'created': time.time(),
+        }
+        tmp_record = f'{self._record_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_record, 'w') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_record, self._record_path(key))
+        self.evict()
+        return True
+
+    def entries(self):
+        """
+        Entries of the cache, least recently used first
+
+        Returns:
+            list: dicts with key, path, size, last_used and params
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            key = filename[:-len('.json')]
+            record = self._read_record(key)
+            if record is None:
+                continue
+            path = os.path.join(self.directory, key + record['ext'])
+            try:
+                last_used = os.path.getmtime(path)
+            except OSError:
+                continue
+            entries.append({
+                'key': key,
+                'path': path,
+                'size': record['size'],
+                'last_used': last_used,
+                'params': record.get('params'),
+            })
+        return sorted(entries, key=lambda entry: entry['last_used'])
+
+    def remove(self, key):
+        """Remove one entry"""
+        record = self._read_record(key)
+        paths = [self._record_path(key)]
+        if record is not None:
+            paths.append(os.path.join(self.directory, key + record['ext']))
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self, max_bytes=None):
+        """
+        Remove least recently used entries until the cache fits max_bytes
+
+        Returns:
+            list: Keys of the removed entries
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            entries = self.entries()
+            total = sum(entry['size'] for entry in entries)
+            removed = []
+            for entry in entries:
+                if total <= max_bytes:
+                    break
+                self.remove(entry['key'])
+                total -= entry['size']
+                removed.append(entry['key'])
+            return removed
+
+def open_cache(args):
+    """OutputCache from parsed add_cache_args options, or None without --cache"""
+    if not args.cache:
+        return None
+    return OutputCache(args.cache_dir, int(args.cache_max_gb * 1e9))
+
+def run_cached(cmd, input_files, output_file, cache):
+    """
+    Run a command that writes output_file from input_files, unless cached
+
+    The key covers the command itself with the input and output paths
+    replaced by placeholders, so the same conversion of the same content
+    hits wherever the files live.
+
+    Returns:
+        bool: True on a cache hit
+    """
+    placeholders = {path: f'{{input{i}}}' for i, path in enumerate(input_files)}
+    placeholders[output_file] = '{output}'
+    params = {
+        'command': [placeholders.get(arg, arg) for arg in cmd],
+        'format': os.path.splitext(output_file)[1],
+    }
+    key = make_cache_key(input_files, params)
+    if cache.fetch(key, output_file):
+        return True
+    subprocess.run(cmd, check=True)
+    cache.store(key, output_file, params)
+    return False
+
+def main():
+    """Run a command through the cache, or list or trim the cache"""
+    parser = argparse.ArgumentParser(
+        description='Content-addressed cache of combined and converted videos'
+    )
+    add_cache_args(parser, opt_in=False)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser(
+        'run', help='Run a command that writes OUTPUT from the INPUT files, or reuse its cached output')
+    run_parser.add_argument('-i', '--input', action='append', required=True, help='Input file of the command')
+    run_parser.add_argument('-o', '--output', required=True, help='Output file of the command')
+    run_parser.add_argument('cmd', nargs=argparse.REMAINDER, help='Command to run, after --')
+    subparsers.add_parser('list', help='List cached outputs, least recently used first')
+    evict_parser = subparsers.add_parser('evict', help='Evict least recently used outputs')
+    evict_parser.add_argument('--max-gb', type=float, default=None,
+                              help='Evict down to this size (default: --cache-max-gb, 0 empties the cache)')
+    args = parser.parse_args()
+
+    cache = OutputCache(args.cache_dir, int(args.cache_max_gb * 1e9))
+
+    if args.command == 'run':
+        cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        if not cmd:
+            parser.error('run needs a command after --')
+        try:
+            if run_cached(cmd, args.input, args.output, cache):
+                print(f"Using cached output for {args.output}")
+        except subprocess.CalledProcessError as e:
+            sys.exit(e.returncode)
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    elif args.command == 'list':
+        entries = cache.entries()
+        for entry in entries:
+            last_used = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['last_used']))
+            print(f"{entry['key'][:12]}  {entry['size'] / 1e6:10.1f} MB  {last_used}  {entry['path']}")
+        total = sum(entry['size'] for entry in entries)
+        print(f"{len(entries)} entries, {total / 1e9:.2f} of {cache.max_bytes / 1e9:.2f} GB in {cache.directory}")
+    elif args.command == 'evict':
+        max_bytes = None if args.max_gb is None else int(args.max_gb * 1e9)
+        removed = cache.evict(max_bytes)
+        print(f"Evicted {len(removed)} entries")
+
+if __name__ == '__main__':
+    main()
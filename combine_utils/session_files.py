@@ -0,0 +1,166 @@
+"""
+Files of recorded sessions
+Sessions are found by their <name>_video_<timestamp>_markers.txt file and
+their cameras either next to the markers or, for sessions recorded to
+several volumes, through the <session>_volumes.json manifest. Cameras
+recorded in several parts are joined before they are used. Shared by the
+split tools in the repository root (as combine_utils.session_files) and
+the combine tools in combine_utils
+"""
+
+import json
+import os
+import re
+import subprocess
+
+# Marker file written by recording_utils.sh start_recording/stop_recording
+MARKER_PATTERN = re.compile(r'^(?P<session>.+_video_\d{6}-\d{6})_markers\.txt$')
+
+# Camera recordings in a session directory: whole files, the _part<n> files
+# of restarted captures and the _seg<nnnn> chunks of segmented recordings
+# (see segment_index.py); trial clips are excluded
+VIDEO_PATTERN = re.compile(
+    r'^(?!trial\d+_cam).+_cam(?P<cam>\d+)(_part(?P<part>\d+))?(?P<segment>_seg\d{4})?\.(?P<ext>mp4|avi|mkv|mov)$')
+
+# Manifest of a multi-volume session, next to its markers
+VOLUMES_SUFFIX = '_volumes.json'
+
+# Added to the name of the file a camera recorded in several parts is joined into
+JOINED_SUFFIX = '_joined'
+
+def get_volumes_file(session_dir, session_name):
+    """Path of the volume manifest of a session"""
+    return os.path.join(session_dir, session_name + VOLUMES_SUFFIX)
+
+def load_volume_manifest(session_dir, session_name):
+    """The volume manifest of a session, None if it was recorded to one directory"""
+    try:
+        with open(get_volumes_file(session_dir, session_name)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def get_manifest_videos(manifest):
+    """
+    Files of every camera of a manifest, in camera order
+
+    Returns:
+        list: One list per camera of its existing files in recording order;
+        a camera has several parts after restarts or moves to another volume
+    """
+    videos = []
+    for camera in sorted(manifest['cameras'], key=lambda camera: camera['cam']):
+        parts = [path for path in camera['files'] if os.path.exists(path)]
+        if parts:
+            videos.append(parts)
+    return videos
+
+def file_signature(path):
+    """Size and mtime of a file, used to detect changed inputs"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def parts_signature(parts):
+    """Signature of a camera, from all its parts if it was recorded in several"""
+    if len(parts) == 1:
+        return file_signature(parts[0])
+    return {'parts': [file_signature(part) for part in parts]}
+
+def find_sessions(root, triallist_name='{session}_trials.txt'):
+    """
+    Find recorded sessions by their marker files
+
+    Sessions recorded to several volumes list their cameras' files in a
+    volume manifest, which is used instead of the videos next to the
+    markers. A camera recorded in several parts (restarts or moves to
+    another volume) is used through the file its parts are joined into by
+    join_session_parts.
+
+    Returns:
+        list: One dict per session with name, directory, marker_file,
+        triallist_file (None if missing), video_parts (the files of every
+        camera in recording order) and video_files in camera order
+    """
+    sessions = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            match = MARKER_PATTERN.match(filename)
+            if not match:
+                continue
+            session = match.group('session')
+            triallist_file = os.path.join(dirpath, triallist_name.format(session=session))
+            manifest = load_volume_manifest(dirpath, session)
+            if manifest is not None:
+                video_parts = get_manifest_videos(manifest)
+            else:
+                videos = {}
+                for video in filenames:
+                    video_match = VIDEO_PATTERN.match(video)
+                    # Segments are chunks of a camera file, joined into it by segment_index.py
+                    if video_match and not video_match.group('segment'):
+                        part = int(video_match.group('part') or 0)
+                        videos.setdefault(int(video_match.group('cam')), []).append((part, os.path.join(dirpath, video)))
+                video_parts = [[path for _, path in sorted(videos[cam])] for cam in sorted(videos)]
+            video_files = [parts[0] if len(parts) == 1 else get_joined_path(dirpath, parts[0])
+                           for parts in video_parts]
+            sessions.append({
+                'name': session,
+                'directory': dirpath,
+                'marker_file': os.path.join(dirpath, filename),
+                'triallist_file': triallist_file if os.path.exists(triallist_file) else None,
+                'video_parts': video_parts,
+                'video_files': video_files,
+            })
+    return sessions
+
+def get_joined_path(directory, first_part):
+    """File in the session directory that the parts of a camera are joined into"""
+    stem, ext = os.path.splitext(os.path.basename(first_part))
+    return os.path.join(directory, stem + JOINED_SUFFIX + ext)
+
+def concat_videos(files, video_path):
+    """Join files with the same codec and settings into video_path with the concat demuxer"""
+    list_file = video_path + '.concat.txt'
+    tmp_path = video_path + '.tmp' + os.path.splitext(video_path)[1]
+    with open(list_file, 'w') as f:
+        for path in files:
+            f.write("file '{}'\n".format(os.path.abspath(path).replace("'", "'\\''")))
+    try:
+        subprocess.run(['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                        '-i', list_file, '-c', 'copy', '-movflags', '+faststart', tmp_path],
+                       check=True, capture_output=True, text=True)
+        os.replace(tmp_path, video_path)
+    finally:
+        os.remove(list_file)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def join_session_parts(session, join_sidecars=None):
+    """
+    Join every camera recorded in several parts with the concat demuxer
+
+    The joined file is rebuilt when it is missing or older than one of its
+    parts.
+
+    Args:
+        join_sidecars: Optional function called as join_sidecars(parts,
+            joined_file) for every joined camera, e.g.
+            frame_timestamps.join_timestamp_files
+
+    Returns:
+        list: Joined files of the session
+    """
+    joined = []
+    for parts, video in zip(session['video_parts'], session['video_files']):
+        if len(parts) == 1:
+            continue
+        print(f"⚠️  WARNING: {os.path.basename(parts[0])} of {session['name']} was recorded in "
+              f"{len(parts)} parts, using them joined in {os.path.basename(video)}")
+        joined.append(video)
+        newest = max(os.path.getmtime(part) for part in parts)
+        if not os.path.exists(video) or os.path.getmtime(video) < newest:
+            concat_videos(parts, video)
+        if join_sidecars is not None:
+            join_sidecars(parts, video)
+    return joined
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for batch_combine.py functionality
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from batch_combine import find_trial_groups, get_grid_size
+
+def test_trial_grouping():
+    """Test grouping split clips by trial"""
+    print("Testing trial grouping...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        names = ['trial0_cam1.avi', 'trial0_cam0.avi', 'trial10_cam0.avi', 'trial2_cam0.avi',
+                 'trial2_cam1.avi', 'session_cam0.mp4', 'frames_cam0.npy']
+        for name in names:
+            open(os.path.join(temp_dir, name), 'w').close()
+        
+        groups = find_trial_groups(temp_dir)
+        assert list(groups) == [0, 2, 10], f"Failed: Trials should be sorted numerically, got {list(groups)}"
+        assert [os.path.basename(p) for p in groups[0]] == ['trial0_cam0.avi', 'trial0_cam1.avi'], \
+            "Failed: Clips should be in camera order"
+        assert len(groups[10]) == 1, "Failed: Trials with missing cameras should keep their clips"
+    
+    print("✓ Trial grouping tests passed")
+
+def test_grid_size():
+    """Test composite size from probed dimensions"""
+    print("Testing grid size computation...")
+    
+    dimensions = [{'width': 1280, 'height': 720}, {'width': 640, 'height': 480}]
+    assert get_grid_size(dimensions, 1, 2, 640) == (1280, 480), "Failed: Height should fit the tallest input"
+    assert get_grid_size(dimensions[:1], 2, 2, 320) == (320, 180), "Failed: Single input should not be padded"
+
+    # Rows of different heights are only as tall as their own tallest tile
+    dimensions = [{'width': 1280, 'height': 720}] * 2 + [{'width': 640, 'height': 480}]
+    assert get_grid_size(dimensions, 2, 2, 640) == (1280, 840), "Failed: Rows should keep their own heights"
+    
+    print("✓ Grid size computation tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running batch_combine.py tests...\n")
+    
+    try:
+        test_trial_grouping()
+        test_grid_size()
+        
+        print("\n✓ All tests passed! The batch_combine.py functionality is working correctly.")
+        return 0
+        
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
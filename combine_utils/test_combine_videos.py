@@ -66,6 +66,99 @@ def test_ffmpeg_command_building():
     
     print("✓ FFmpeg command building tests passed")
 
+def test_chunk_planning():
+    """Test splitting the timeline into chunks"""
+    print("Testing chunk planning...")
+    
+    from combine_videos import plan_chunks
+    
+    chunks = plan_chunks(600, 4)
+    assert chunks == [(0, 150), (150, 150), (300, 150), (450, 150)], f"Failed: Unexpected chunks {chunks}"
+    
+    chunks = plan_chunks(10, 3)
+    assert sum(n for _, n in chunks) == 10, "Failed: Chunks should cover every frame"
+    assert all(chunks[i][0] + chunks[i][1] == chunks[i + 1][0] for i in range(len(chunks) - 1)), \
+        "Failed: Chunks should be contiguous"
+    
+    assert plan_chunks(2, 8) == [(0, 1), (1, 1)], "Failed: There should be no empty chunks"
+    
+    print("✓ Chunk planning tests passed")
+
+def test_chunk_command_building():
+    """Test ffmpeg command building for one chunk"""
+    print("Testing chunk command building...")
+    
+    from combine_videos import build_concat_command
+    
+    cmd = build_ffmpeg_command(['video1.avi', 'video2.avi'], 'chunk.mp4', 1, 2, 640, 'high',
+                               start_time=4.983333, n_frames=150, frame_rate=30, threads=2)
+    assert cmd.count('-ss') == 2, "Failed: Every input should be seeked"
+    assert cmd.index('-ss') < cmd.index('-i'), "Failed: Seeking should happen on the inputs"
+    assert cmd[cmd.index('-frames:v') + 1] == '150', "Failed: Chunk should stop after its frames"
+    assert cmd[cmd.index('-r') + 1] == '30', "Failed: Chunk should keep the input frame rate"
+    assert cmd[cmd.index('-threads') + 1] == '2', "Failed: Chunk should limit encoder threads"
+    assert 'setpts=PTS-STARTPTS[outv]' in ' '.join(cmd), "Failed: Chunk should start at timestamp 0"
+    
+    # Without chunk options the single encode is unchanged
+    cmd = build_ffmpeg_command(['video1.avi', 'video2.avi'], 'combined.mp4', 1, 2, 640, 'high')
+    assert '-ss' not in cmd and '-frames:v' not in cmd, "Failed: Single encode should not be limited"
+    
+    cmd = build_concat_command('chunks.txt', 'combined.mp4')
+    assert cmd[cmd.index('-f') + 1] == 'concat', "Failed: Chunks should be joined with the concat demuxer"
+    assert cmd[cmd.index('-c') + 1] == 'copy', "Failed: Chunks should be joined without re-encoding"
+    
+    print("✓ Chunk command building tests passed")
+
+def make_info(width, height, pix_fmt='yuv420p'):
+    """Build a stream info dict like probe_video_info returns"""
+    return {'width': width, 'height': height, 'pix_fmt': pix_fmt, 'codec_name': 'h264',
+            'fps': 30, 'duration': 10.0}
+
+def test_input_scale_planning():
+    """Test choosing the scaler per input"""
+    print("Testing input scale planning...")
+    
+    from combine_videos import plan_input_scale
+    
+    assert plan_input_scale(make_info(640, 480), 640) == (None, 640, 480), "Failed: Target size should not be scaled"
+    assert plan_input_scale(make_info(1280, 960), 640)[0] == 'scale=640:480:flags=area', \
+        "Failed: Integer downscale should use the area filter"
+    assert plan_input_scale(make_info(1920, 1080), 640)[0] == 'scale=640:360:flags=area', \
+        "Failed: 3x downscale should use the area filter"
+    assert plan_input_scale(make_info(1280, 720), 960)[0] == 'scale=960:540:flags=lanczos', \
+        "Failed: Non-integer scale should use lanczos"
+    assert plan_input_scale(make_info(640, 362), 320)[2] % 2 == 0, "Failed: Height should be even"
+    
+    print("✓ Input scale planning tests passed")
+
+def test_filter_graph_planning():
+    """Test planning filter graphs from probed inputs"""
+    print("Testing filter graph planning...")
+    
+    from combine_videos import plan_filter_graph
+    
+    # Matching inputs in a row are stacked directly without any conversion
+    parts = plan_filter_graph([make_info(640, 480), make_info(640, 480)], 1, 2, 640)
+    assert parts == ['[0:v][1:v]hstack=inputs=2[outv]'], f"Failed: Unexpected graph {parts}"
+    
+    # Pixel formats are converted once, after stacking
+    parts = plan_filter_graph([make_info(1280, 960, 'yuvj422p'), make_info(640, 480, 'yuvj422p')], 1, 2, 640)
+    assert parts[-1].endswith('hstack=inputs=2,format=yuv420p[outv]'), "Failed: Format should be converted after stacking"
+    assert sum('format=' in part for part in parts) == 1, "Failed: Format should be converted once"
+    
+    # Tiles of different heights get exact xstack offsets
+    parts = plan_filter_graph([make_info(640, 480), make_info(640, 360), make_info(640, 360)], 2, 2, 640)
+    assert 'layout=0_0|640_0|0_480:fill=black' in parts[-1], f"Failed: Unexpected layout {parts[-1]}"
+    
+    # Rows of different heights cannot use hstack
+    parts = plan_filter_graph([make_info(640, 480), make_info(640, 360)], 1, 2, 640)
+    assert 'xstack' in parts[-1] and 'layout=0_0|640_0' in parts[-1], "Failed: Uneven row should use xstack"
+    
+    parts = plan_filter_graph([make_info(640, 480)], 1, 1, 640)
+    assert parts == ['[0:v]null[outv]'], "Failed: Single input at target size should pass through"
+    
+    print("✓ Filter graph planning tests passed")
+
 def test_file_validation():
     """Test file validation functionality"""
     print("Testing file validation...")
@@ -88,6 +181,10 @@ def main():
         test_grid_layout()
         test_quality_settings()
         test_ffmpeg_command_building()
+        test_chunk_planning()
+        test_chunk_command_building()
+        test_input_scale_planning()
+        test_filter_graph_planning()
         test_file_validation()
         
         print("\n✓ All tests passed! The combine_videos.py functionality is working correctly.")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for ffmpeg_progress.py functionality
+"""
+
+import sys
+import os
+import json
+import subprocess
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ffmpeg_progress import add_progress_args, parse_progress_block, run_ffmpeg, ProgressMonitor
+
+def test_progress_args():
+    """Test adding progress options to a command"""
+    print("Testing progress options...")
+    
+    cmd = add_progress_args(['ffmpeg', '-i', 'video1.avi', 'out.mp4'])
+    assert cmd[:4] == ['ffmpeg', '-progress', 'pipe:1', '-nostats'], "Failed: Progress should go to stdout"
+    assert cmd[-1] == 'out.mp4', "Failed: Output should stay last"
+    
+    print("✓ Progress options tests passed")
+
+def test_parse_progress_block():
+    """Test parsing of ffmpeg progress blocks"""
+    print("Testing progress block parsing...")
+    
+    fields = {
+        'frame': '240', 'fps': '59.87', 'bitrate': '1234.5kbits/s', 'total_size': '1048576',
+        'out_time_us': '8000000', 'dup_frames': '0', 'drop_frames': '1', 'speed': '1.99x',
+        'progress': 'continue',
+    }
+    metrics = parse_progress_block(fields)
+    assert metrics['frame'] == 240, "Failed: Frame should be an integer"
+    assert metrics['fps'] == 59.87, "Failed: Unexpected fps"
+    assert metrics['bitrate_kbps'] == 1234.5, "Failed: Bitrate unit should be stripped"
+    assert metrics['speed'] == 1.99, "Failed: Speed suffix should be stripped"
+    assert metrics['out_time'] == 8.0, "Failed: out_time should be in seconds"
+    assert metrics['drop_frames'] == 1, "Failed: Unexpected dropped frames"
+    
+    # Values are N/A before the first frame is written
+    metrics = parse_progress_block({'bitrate': 'N/A', 'speed': 'N/A', 'out_time_us': 'N/A', 'progress': 'end'})
+    assert metrics['bitrate_kbps'] is None and metrics['speed'] is None, "Failed: N/A should be None"
+    assert metrics['out_time'] is None and metrics['frame'] is None, "Failed: Missing fields should be None"
+    assert metrics['progress'] == 'end', "Failed: Final block should be marked"
+    
+    print("✓ Progress block parsing tests passed")
+
+def test_run_ffmpeg():
+    """Test streaming progress from a real ffmpeg run into a log"""
+    print("Testing ffmpeg progress streaming...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_file = os.path.join(temp_dir, 'progress.jsonl')
+        seen = []
+        monitor = ProgressMonitor(2.0, log_file, show_bar=False, callback=seen.append)
+        cmd = ['ffmpeg', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10:duration=2',
+               '-f', 'null', '-']
+        try:
+            run_ffmpeg(cmd, monitor, total_seconds=2.0, label='test')
+        except FileNotFoundError:
+            print("  ffmpeg not available, skipping")
+            return
+        finally:
+            monitor.close()
+        
+        assert seen and seen[-1]['progress'] == 'end', "Failed: Last block should mark the end"
+        assert seen[-1]['frame'] == 20, f"Failed: Expected 20 frames, got {seen[-1]['frame']}"
+        assert seen[-1]['label'] == 'test', "Failed: Metrics should carry their label"
+        with open(log_file) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == len(seen), "Failed: Every block should be logged"
+        
+        try:
+            run_ffmpeg(['ffmpeg', '-i', os.path.join(temp_dir, 'missing.avi'), '-f', 'null', '-'])
+            assert False, "Should have raised for a failing ffmpeg"
+        except subprocess.CalledProcessError as e:
+            assert 'missing.avi' in e.stderr, "Failed: Error should carry ffmpeg stderr"
+    
+    print("✓ ffmpeg progress streaming tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running ffmpeg_progress.py tests...\n")
+    
+    try:
+        test_progress_args()
+        test_parse_progress_block()
+        test_run_ffmpeg()
+        
+        print("\n✓ All tests passed! The ffmpeg_progress.py functionality is working correctly.")
+        return 0
+        
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for make_proxies.py functionality
+"""
+
+import sys
+import os
+import json
+import subprocess
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fractions import Fraction
+
+from make_proxies import plan_sprite, build_proxy_command, get_proxy_paths, make_session_proxy
+from combine_videos import probe_video_info
+
+def make_info(width, height, fps=30, duration=65.0):
+    """Build a stream info dict like probe_video_info returns"""
+    return {'width': width, 'height': height, 'pix_fmt': 'yuv420p', 'codec_name': 'h264',
+            'fps': Fraction(fps), 'duration': duration}
+
+def test_sprite_planning():
+    """Test laying out thumbnails"""
+    print("Testing sprite planning...")
+
+    sprite = plan_sprite(make_info(1280, 720), 10, 160, 4)
+    assert (sprite['tile_width'], sprite['tile_height']) == (160, 90), "Failed: Tiles should keep the aspect ratio"
+    assert len(sprite['tiles']) == 7, f"Failed: 65 s at 10 s intervals should give 7 tiles, got {len(sprite['tiles'])}"
+    assert (sprite['columns'], sprite['rows']) == (4, 2), "Failed: 7 tiles in 4 columns need 2 rows"
+    assert sprite['tiles'][5] == {'time': 50, 'x': 160, 'y': 90}, f"Failed: Unexpected tile {sprite['tiles'][5]}"
+
+    sprite = plan_sprite(make_info(1280, 720, duration=15.0), 10, 160, 10)
+    assert (sprite['columns'], sprite['rows']) == (2, 1), "Failed: Short videos should not get empty columns"
+
+    print("✓ Sprite planning tests passed")
+
+def test_proxy_command_building():
+    """Test the single pass proxy command"""
+    print("Testing proxy command building...")
+
+    session = {'name': 'rat1_video_250101-120000', 'directory': '/data/rat1',
+               'video_files': ['cam0.mp4', 'cam1.mp4']}
+    paths = get_proxy_paths(session)
+    assert paths['proxy'] == '/data/rat1/proxy/rat1_video_250101-120000_proxy.mp4', "Failed: Unexpected proxy path"
+
+    video_info = [make_info(1280, 720), make_info(1280, 720)]
+    sprites = [plan_sprite(info, 10, 160, 10) for info in video_info]
+    cmd = build_proxy_command(session['video_files'], video_info, paths, sprites, 1, 2, 320, 5, 10)
+
+    assert cmd.count('-i') == 2, "Failed: Every camera should be read once"
+    graph = cmd[cmd.index('-filter_complex') + 1]
+    assert '[0:v]fps=5,split=2[c0][t0]' in graph, "Failed: Inputs should be reduced to the proxy rate and split"
+    assert 'tile=7x1[s1]' in graph, "Failed: Every camera should get a sprite sheet"
+    assert graph.endswith('[v0][v1]hstack=inputs=2[outv]'), "Failed: Preview should be a grid of the cameras"
+    assert cmd[cmd.index('-preset') + 1] == 'veryfast', "Failed: Preview should use a fast preset"
+    assert cmd[-1] == paths['sprites'][1], "Failed: Sprites should be written by the same command"
+
+    # Sources slower than the proxy rate are not resampled
+    cmd = build_proxy_command(session['video_files'], [make_info(1280, 720, fps=2)] * 2, paths, sprites, 1, 2, 320, 5, 10)
+    assert 'fps=5' not in cmd[cmd.index('-filter_complex') + 1], "Failed: Frame rate should never be raised"
+
+    print("✓ Proxy command building tests passed")
+
+def test_make_session_proxy():
+    """Test making proxies of a generated session"""
+    print("Testing session proxies...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        name = 'rat1_video_250101-120000'
+        videos = []
+        for i in range(2):
+            video = os.path.join(temp_dir, f'{name}_cam{i}.mp4')
+            try:
+                subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi',
+                                '-i', 'testsrc=size=320x240:rate=10:duration=5',
+                                '-c:v', 'libx264', '-pix_fmt', 'yuv420p', video],
+                               check=True)
+            except (FileNotFoundError, subprocess.CalledProcessError):
+                print("  ffmpeg not available, skipping")
+                return
+            videos.append(video)
+        session = {'name': name, 'directory': temp_dir, 'video_files': videos, 'video_parts': [[video] for video in videos]}
+        params = {'version': 1, 'grid': 'auto', 'scale': 160, 'fps': 5, 'interval': 2,
+                  'tile_width': 80, 'columns': 10}
+
+        index = make_session_proxy(session, params)
+        assert index is not None, "Failed: Proxies should be made"
+        paths = get_proxy_paths(session)
+        info = probe_video_info(paths['proxy'])
+        assert (info['width'], info['height'], info['fps']) == (320, 120, 5), "Failed: Unexpected preview format"
+        sprite = probe_video_info(paths['sprites'][0])
+        assert (sprite['width'], sprite['height']) == (240, 60), "Failed: Sprite should hold 3 tiles of 80x60"
+        with open(paths['index']) as f:
+            assert json.load(f)['cameras'][1]['tiles'][2]['time'] == 4, "Failed: Index should list tile times"
+
+        assert make_session_proxy(session, params) is None, "Failed: Up to date proxies should be skipped"
+        assert make_session_proxy(session, dict(params, fps=2)) is not None, "Failed: New settings should remake proxies"
+
+    print("✓ Session proxy tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running make_proxies.py tests...\n")
+
+    try:
+        test_sprite_planning()
+        test_proxy_command_building()
+        test_make_session_proxy()
+
+        print("\n✓ All tests passed! The make_proxies.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test script for numpy_compositor.py functionality
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import numpy_compositor
+
+from combine_videos import plan_tile_offsets, probe_video_info
+from numpy_compositor import TextOverlay, build_decode_command, build_encode_command, composite_videos
+
+def test_tile_offsets():
+    """Test placing tiles on the canvas"""
+    print("Testing tile offsets...")
+
+    offsets, canvas = plan_tile_offsets([(640, 480), (640, 360), (640, 360)], 2)
+    assert offsets == [(0, 0), (640, 0), (0, 480)], f"Failed: Unexpected offsets {offsets}"
+    assert canvas == (1280, 840), f"Failed: Unexpected canvas size {canvas}"
+
+    print("✓ Tile offset tests passed")
+
+def test_text_overlay():
+    """Test drawing overlay text in place"""
+    print("Testing text overlay...")
+
+    frame = np.full((40, 200, 3), 128, dtype=np.uint8)
+    address = frame.__array_interface__['data'][0]
+    text = TextOverlay(scale=2)
+    text.draw(frame, 'cam0 f000012', 2, 2)
+
+    assert frame.__array_interface__['data'][0] == address, "Failed: Frame should be drawn in place"
+    box = frame[2:2 + text.height, 2:2 + 12 * text.char_width]
+    assert (box == 255).any() and (box == 0).any(), "Failed: Text and background should be drawn"
+    assert (frame[30:] == 128).all(), "Failed: Pixels outside the box should be untouched"
+
+    # Text running off the frame is clipped
+    text.draw(frame, '0123456789' * 5, 150, 30)
+
+    print("✓ Text overlay tests passed")
+
+def test_command_building():
+    """Test decoder and encoder commands"""
+    print("Testing command building...")
+
+    cmd = build_decode_command('video1.avi', 640, 480, 'scale=640:480:flags=area', 30, 30)
+    assert cmd[cmd.index('-vf') + 1] == 'scale=640:480:flags=area', "Failed: Scale filter should be applied"
+    assert cmd[cmd.index('-pix_fmt') + 1] == 'rgb24', "Failed: Decoder should write rgb24"
+    assert '-ss' not in cmd, "Failed: No seek without an offset"
+
+    cmd = build_decode_command('video1.avi', 640, 480, None, 30, 15, start_time=0.5)
+    assert cmd[cmd.index('-ss') + 1] == '0.500000', "Failed: Positive offset should seek"
+    assert cmd[cmd.index('-vf') + 1] == 'fps=30', "Failed: Other frame rates should be resampled"
+
+    cmd = build_encode_command('out.mp4', 1280, 480, 30, 'low')
+    assert cmd[cmd.index('-s') + 1] == '1280x480', "Failed: Encoder should read the canvas size"
+    assert cmd[cmd.index('-i') + 1] == '-', "Failed: Encoder should read stdin"
+    assert cmd[cmd.index('-crf') + 1] == '28', "Failed: Quality should set the CRF"
+
+    print("✓ Command building tests passed")
+
+def test_composite_videos():
+    """Test compositing two generated videos with an offset and overlay"""
+    print("Testing NumPy compositing...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        videos = []
+        for i, size in enumerate(['160x120', '320x240']):
+            video = os.path.join(temp_dir, f'cam{i}.mp4')
+            try:
+                subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi',
+                                '-i', f'testsrc=size={size}:rate=10:duration=2',
+                                '-c:v', 'libx264', '-pix_fmt', 'yuv420p', video],
+                               check=True)
+            except (FileNotFoundError, subprocess.CalledProcessError):
+                print("  ffmpeg not available, skipping")
+                return
+            videos.append(video)
+
+        output = os.path.join(temp_dir, 'combined.mp4')
+        seen = []
+        n_frames = composite_videos(videos, output, 1, 2, 160, 'low', sync_offsets=[0.0, -0.5],
+                                    overlay=True, callback=seen.append)
+        assert n_frames == 25, f"Failed: Expected 20 frames plus 5 of lead-in, got {n_frames}"
+        assert seen[-1]['progress'] == 'end', "Failed: Final metrics should mark the end"
+
+        info = probe_video_info(output)
+        assert (info['width'], info['height']) == (320, 120), "Failed: Tiles should be scaled to 160 wide"
+
+    print("✓ NumPy compositing tests passed")
+
+def test_encoder_failure():
+    """Test that a failing encoder is reported instead of hanging on the decoders"""
+    print("Testing encoder failure...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'cam0.mp4')
+        try:
+            subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi',
+                            '-i', 'testsrc=size=320x240:rate=10:duration=10',
+                            '-c:v', 'libx264', '-pix_fmt', 'yuv420p', video],
+                           check=True)
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        # The decoders fill their pipes long before the last frame
+        output = os.path.join(temp_dir, 'missing', 'combined.mp4')
+        start = time.perf_counter()
+        try:
+            composite_videos([video, video], output, 1, 2, 320, 'low')
+            assert False, "Failed: Encoder failure should be raised"
+        except subprocess.CalledProcessError as e:
+            assert e.returncode != 0, "Failed: Encoder return code should be reported"
+            assert 'missing' in e.stderr, "Failed: Encoder error should be reported"
+        assert time.perf_counter() - start < 30, "Failed: Encoder failure should not hang"
+
+    print("✓ Encoder failure tests passed")
+
+def test_chatty_decoder():
+    """Test that a decoder writing more to stderr than a pipe holds does not hang the compositor"""
+    print("Testing chatty decoders...")
+
+    # Stand-in decoder: 1 MB of warnings before its frames, then a failure
+    script = ("import sys; sys.stderr.write('warning: damaged packet\\n' * 40000); sys.stderr.flush(); "
+              "sys.stdout.buffer.write(bytes(160 * 120 * 3 * 5)); sys.exit(1)")
+    build_decode_command = numpy_compositor.build_decode_command
+    numpy_compositor.build_decode_command = lambda *args, **kwargs: [sys.executable, '-c', script]
+    info = {'width': 160, 'height': 120, 'pix_fmt': 'rgb24', 'codec_name': 'h264', 'fps': 10, 'duration': 0.5}
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            start = time.perf_counter()
+            try:
+                composite_videos(['cam0.mp4'], os.path.join(temp_dir, 'combined.mp4'), 1, 1, 160, 'low',
+                                 video_info=[info])
+                assert False, "Failed: Decoder failure should be raised"
+            except subprocess.CalledProcessError as e:
+                assert e.returncode == 1, "Failed: Decoder return code should be reported"
+                assert e.stderr.count('damaged packet') == 40000, "Failed: Decoder stderr should be kept whole"
+            assert time.perf_counter() - start < 30, "Failed: Chatty decoder should not hang"
+    except FileNotFoundError:
+        print("  ffmpeg not available, skipping")
+        return
+    finally:
+        numpy_compositor.build_decode_command = build_decode_command
+
+    print("✓ Chatty decoder tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running numpy_compositor.py tests...\n")
+
+    try:
+        test_tile_offsets()
+        test_text_overlay()
+        test_command_building()
+        test_composite_videos()
+        test_encoder_failure()
+        test_chatty_decoder()
+
+        print("\n✓ All tests passed! The numpy_compositor.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test script for output_cache.py functionality
+"""
+
+import argparse
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from output_cache import (SAMPLE_COUNT, SAMPLE_SIZE, sample_hash, fingerprint_file, make_cache_key, OutputCache,
+                          run_cached, clone_file, add_cache_args, open_cache)
+
+def write_file(path, content):
+    """Write bytes to a file"""
+    with open(path, 'wb') as f:
+        f.write(content)
+
+def test_cache_key():
+    """Test that keys follow input content and parameters"""
+    print("Testing cache keys...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video1 = os.path.join(temp_dir, 'video1.avi')
+        video2 = os.path.join(temp_dir, 'video2.avi')
+        write_file(video1, os.urandom(SAMPLE_COUNT * SAMPLE_SIZE * 4))
+        write_file(video2, b'camera 2')
+
+        params = {'grid': [1, 2], 'scale': 640, 'quality': 'high'}
+        key = make_cache_key([video1, video2], params)
+        assert key == make_cache_key([video1, video2], dict(params)), "Failed: Key should be stable"
+        assert key != make_cache_key([video2, video1], params), "Failed: Input order should change the key"
+        assert key != make_cache_key([video1, video2], dict(params, quality='low')), \
+            "Failed: Encode parameters should change the key"
+
+        # A change in a sampled chunk changes the hash even if size and mtime stay
+        before = fingerprint_file(video1)
+        with open(video1, 'r+b') as f:
+            f.write(b'changed')
+        assert sample_hash(video1) != before['sample_sha256'], "Failed: Sampled hash should see the change"
+        assert make_cache_key([video1, video2], params) != key, "Failed: Changed input should change the key"
+
+    print("✓ Cache key tests passed")
+
+def test_fetch_and_store():
+    """Test storing, fetching and LRU eviction"""
+    print("Testing fetch and store...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = OutputCache(os.path.join(temp_dir, 'cache'), max_bytes=2500)
+        output = os.path.join(temp_dir, 'combined.mp4')
+
+        assert not cache.fetch('a' * 64, output), "Failed: Empty cache should miss"
+
+        for key, fill in [('a' * 64, b'a'), ('b' * 64, b'b')]:
+            write_file(output, fill * 1000)
+            assert cache.store(key, output, {'fill': fill.decode()}), "Failed: Output should be stored"
+
+        os.remove(output)
+        assert cache.fetch('a' * 64, output), "Failed: Stored output should hit"
+        with open(output, 'rb') as f:
+            assert f.read() == b'a' * 1000, "Failed: Fetched output should match the stored one"
+
+        # 'a' was used last, so storing a third entry evicts 'b'
+        os.utime(cache.lookup('b' * 64), (0, 0))
+        write_file(output, b'c' * 1000)
+        cache.store('c' * 64, output)
+        keys = [entry['key'] for entry in cache.entries()]
+        assert keys == ['a' * 64, 'c' * 64], f"Failed: Least recently used entry should be evicted, got {keys}"
+
+        # Outputs larger than the cap are never stored
+        write_file(output, b'd' * 3000)
+        assert not cache.store('d' * 64, output), "Failed: Oversized output should not be stored"
+
+        assert cache.evict(0) == ['a' * 64, 'c' * 64], "Failed: Evicting to 0 should empty the cache"
+
+    print("✓ Fetch and store tests passed")
+
+def test_run_cached():
+    """Test running a command through the cache"""
+    print("Testing cached commands...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = OutputCache(os.path.join(temp_dir, 'cache'))
+        source = os.path.join(temp_dir, 'video1.avi')
+        write_file(source, b'frames')
+        output = source + '_converted.avi'
+        cmd = [sys.executable, '-c', 'import shutil, sys; shutil.copyfile(sys.argv[1], sys.argv[2])', source, output]
+
+        assert not run_cached(cmd, [source], output, cache), "Failed: First run should run the command"
+        os.remove(output)
+        assert run_cached(cmd, [source], output, cache), "Failed: Second run should hit"
+        assert os.path.exists(output), "Failed: Hit should restore the output"
+
+        # Same content under another name also hits
+        moved = os.path.join(temp_dir, 'moved.avi')
+        os.rename(source, moved)
+        cmd = cmd[:-2] + [moved, moved + '_converted.avi']
+        assert run_cached(cmd, [moved], moved + '_converted.avi', cache), "Failed: Moved input should hit"
+
+    print("✓ Cached command tests passed")
+
+def test_clone_and_opt_in():
+    """Test cloning entries and that scripts only use the cache with --cache"""
+    print("Testing clones and opt-in...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, 'combined.mp4')
+        clone = os.path.join(temp_dir, 'clone.mp4')
+        write_file(source, os.urandom(100000))
+        clone_file(source, clone)
+        with open(source, 'rb') as f, open(clone, 'rb') as g:
+            assert f.read() == g.read(), "Failed: Clone should have the same content"
+        # Encodes overwrite their output in place, which must not reach the other file
+        write_file(clone, b'new encode')
+        assert os.path.getsize(source) == 100000, "Failed: Overwriting the clone should keep the source"
+
+        parser = argparse.ArgumentParser()
+        add_cache_args(parser)
+        assert open_cache(parser.parse_args([])) is None, "Failed: Cache should be off by default"
+        cache = open_cache(parser.parse_args(['--cache', '--cache-dir', temp_dir, '--cache-max-gb', '1']))
+        assert cache.directory == temp_dir and cache.max_bytes == int(1e9), "Failed: --cache should open the cache"
+
+    print("✓ Clone and opt-in tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running output_cache.py tests...\n")
+
+    try:
+        test_cache_key()
+        test_fetch_and_store()
+        test_run_cached()
+        test_clone_and_opt_in()
+
+        print("\n✓ All tests passed! The output_cache.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for session_files.py functionality
+"""
+
+import sys
+import os
+import json
+import subprocess
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from session_files import find_sessions, join_session_parts, parts_signature, file_signature
+
+def touch(path, content=b''):
+    """Create a file with some content"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+def test_find_sessions():
+    """Test session discovery by marker files"""
+    print("Testing session discovery...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session_dir = os.path.join(temp_dir, 'rat1_video_250101-120000')
+        prefix = os.path.join(session_dir, 'rat1_video_250101-120000')
+        touch(prefix + '_markers.txt')
+        touch(prefix + '_trials.txt')
+        touch(prefix + '_cam1.mp4')
+        touch(prefix + '_cam0.mp4')
+        touch(os.path.join(session_dir, 'trial0_cam0.avi'))
+        touch(prefix + '_cam0.mp4.index.npz')
+        touch(prefix + '_cam1_seg0000.mp4')
+
+        other_dir = os.path.join(temp_dir, 'rat2_video_250102-120000')
+        touch(os.path.join(other_dir, 'rat2_video_250102-120000_markers.txt'))
+        touch(os.path.join(other_dir, 'notes.txt'))
+
+        sessions = find_sessions(temp_dir)
+        assert [s['name'] for s in sessions] == ['rat1_video_250101-120000', 'rat2_video_250102-120000'], \
+            "Failed: Sessions should be found by marker file"
+
+        session = sessions[0]
+        assert session['triallist_file'] == prefix + '_trials.txt', "Failed: Trial list should be found"
+        assert session['video_files'] == [prefix + '_cam0.mp4', prefix + '_cam1.mp4'], \
+            "Failed: Camera videos should be listed in camera order without trial clips or segments"
+
+        assert sessions[1]['triallist_file'] is None, "Failed: Missing trial list should be None"
+        assert sessions[1]['video_files'] == [], "Failed: Session without videos should have none"
+
+        # Cameras recorded to another volume are found through the volume manifest
+        other_volume = os.path.join(temp_dir, 'volume2', 'rat2_video_250102-120000', 'rat2_video_250102-120000_cam0.mp4')
+        touch(other_volume)
+        with open(os.path.join(other_dir, 'rat2_video_250102-120000_volumes.json'), 'w') as f:
+            json.dump({'session': 'rat2_video_250102-120000', 'volumes': [],
+                       'cameras': [{'cam': 0, 'device': '/dev/video0', 'files': [other_volume]}]}, f)
+        sessions = find_sessions(temp_dir)
+        assert sessions[1]['video_files'] == [other_volume], "Failed: Manifest videos should be used"
+        assert sessions[1]['video_parts'] == [[other_volume]], "Failed: Single part camera should have one part"
+
+    print("✓ Session discovery tests passed")
+
+def test_join_parts():
+    """Test that every part of a restarted camera is joined before splitting"""
+    print("Testing multi-part cameras...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session = 'rat1_video_250101-120000'
+        prefix = os.path.join(temp_dir, session, session)
+        touch(prefix + '_markers.txt')
+        parts = [prefix + '_cam0.mp4', prefix + '_cam0_part1.mp4', prefix + '_cam0_part2.mp4']
+        for part_num, part in enumerate(parts):
+            subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10',
+                            '-t', '2', '-c:v', 'libx264', '-preset', 'ultrafast', part], check=True)
+        touch(prefix + '_cam1.mp4')
+
+        found = find_sessions(temp_dir)[0]
+        assert found['video_parts'] == [parts, [prefix + '_cam1.mp4']], \
+            "Failed: Parts should be grouped by camera in part order"
+        joined = prefix + '_cam0_joined.mp4'
+        assert found['video_files'] == [joined, prefix + '_cam1.mp4'], "Failed: Multi-part camera should be joined"
+
+        assert join_session_parts(found) == [joined], "Failed: Joined files should be returned"
+        result = subprocess.run(['ffprobe', '-v', 'error', '-count_packets', '-select_streams', 'v:0',
+                                 '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', joined],
+                                check=True, capture_output=True, text=True)
+        assert int(result.stdout) == 60, "Failed: Joined file should hold the frames of every part"
+        joined_parts = []
+        join_session_parts(found, lambda parts, video: joined_parts.append((parts, video)))
+        assert joined_parts == [(parts, joined)], "Failed: Sidecars of every joined camera should be joined"
+
+        mtime = os.path.getmtime(joined)
+        join_session_parts(found)
+        assert os.path.getmtime(joined) == mtime, "Failed: Up to date joined file should be kept"
+        assert find_sessions(temp_dir)[0]['video_files'][0] == joined, "Failed: Joined file is not a camera"
+
+    print("✓ Multi-part camera tests passed")
+
+def test_parts_signature():
+    """Test that a multi-part camera changes with any of its parts"""
+    print("Testing part signatures...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        parts = [os.path.join(temp_dir, 'cam0.mp4'), os.path.join(temp_dir, 'cam0_part1.mp4')]
+        for part in parts:
+            touch(part, b'video')
+        assert parts_signature(parts[:1]) == file_signature(parts[0]), "Failed: One part is signed like a file"
+        signature = parts_signature(parts)
+        touch(parts[1], b'longer video')
+        assert parts_signature(parts) != signature, "Failed: Changed later part should change the signature"
+
+    print("✓ Part signature tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running session_files.py tests...\n")
+
+    try:
+        test_find_sessions()
+        test_join_parts()
+        test_parts_signature()
+
+        print("\n✓ All tests passed! The session_files.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,7 @@
 #!/bin/bash
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 folder=$(zenity --file-selection --directory \
     --title="Find folder to search for files in")
 
@@ -19,4 +21,7 @@ echo "Converting files:"
 echo "$files"
 echo
 
-echo "$files" | parallel ffmpeg -i {} -b:v 2500k {}_converted.avi
+# Files converted before with the same settings are copied from the output cache
+# (combine_utils/output_cache.py) instead of being encoded again
+echo "$files" | parallel python3 "$SCRIPT_DIR/combine_utils/output_cache.py" run -i {} -o {}_converted.avi -- \
+    ffmpeg -i {} -b:v 2500k {}_converted.avi
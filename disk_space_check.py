@@ -2,6 +2,8 @@
 """
 Disk space checking utility for multicam recording
 Checks available disk space and validates against configuration requirements
+The space a recording needs is learned from past sessions under the output
+directory (see storage_index.py), falling back to the configured estimate
 """
 
 import os
@@ -11,6 +13,8 @@ import shutil
 import argparse
 from pathlib import Path
 
+from storage_index import estimate_storage_rate, get_capture_key
+
 def load_config(config_path="config.json"):
     """Load configuration from JSON file"""
     try:
@@ -33,7 +37,23 @@ def get_free_disk_space(path="."):
         print(f"Error checking disk space for '{path}': {e}")
         sys.exit(1)
 
-def check_disk_space(config_path="config.json", check_path=".", duration_minutes=None):
+def get_capture_config(config, single_channel=False, codec=None):
+    """Capture configuration of the next recording, matched against past sessions"""
+    recording = config.get("recording", {})
+    return {
+        "codec": codec or recording.get("codec", "h264"),
+        "video_resolution": recording.get("video_resolution", "1280x720"),
+        "frame_rate": recording.get("frame_rate", 30),
+        "single_channel": single_channel,
+    }
+
+def get_num_cameras(config):
+    """Number of cameras of the next recording"""
+    recording = config.get("recording", {})
+    return recording.get("num_cameras") or len(config.get("video_devices", [])) or 1
+
+def check_disk_space(config_path="config.json", check_path=".", duration_minutes=None,
+                     single_channel=False, use_history=True, codec=None):
     """
     Check if there's enough disk space for recording
     
@@ -41,6 +61,10 @@ def check_disk_space(config_path="config.json", check_path=".", duration_minutes
         config_path: Path to configuration file
         check_path: Path to check for disk space (default: current directory)
         duration_minutes: Expected recording duration in minutes (optional)
+        single_channel: Whether only the Y plane will be recorded
+        use_history: Estimate the space needed from past sessions under
+            check_path, with estimated_space_per_minute_gb as the fallback
+        codec: Codec written to disk (default: recording.codec or h264)
     
     Returns:
         bool: True if enough space, False otherwise
@@ -65,11 +89,24 @@ def check_disk_space(config_path="config.json", check_path=".", duration_minutes
     free_space_gb = get_free_disk_space(check_path)
     
     # Calculate estimated space needed for this recording
-    estimated_needed_gb = duration_minutes * estimated_space_per_minute_gb
+    capture = get_capture_config(config, single_channel, codec)
+    num_cameras = get_num_cameras(config)
+    learned = estimate_storage_rate(check_path, capture) if use_history else None
+    if learned is not None:
+        space_per_minute_gb = learned["gb_per_camera_minute"] * num_cameras
+    else:
+        space_per_minute_gb = estimated_space_per_minute_gb
+    estimated_needed_gb = duration_minutes * space_per_minute_gb
     
     print(f"Disk space check for path: {os.path.abspath(check_path)}")
     print(f"Available free space: {free_space_gb:.2f} GB")
     print(f"Minimum required free space: {min_free_space_gb:.2f} GB")
+    if learned is not None:
+        print(f"Space per minute: {space_per_minute_gb:.3f} GB for {num_cameras} camera(s), "
+              f"learned from {learned['sessions']} past session(s) of {learned['key']}")
+    else:
+        print(f"Space per minute: {space_per_minute_gb:.3f} GB (configured estimate, "
+              f"no past sessions of {get_capture_key(capture)})")
     print(f"Estimated space needed for {duration_minutes} minutes: {estimated_needed_gb:.2f} GB")
     
     # Check if we have enough space
@@ -113,10 +150,26 @@ def main():
         type=int,
         help='Expected recording duration in minutes'
     )
+    parser.add_argument(
+        '--single-channel',
+        action='store_true',
+        help='Estimate for recording only the Y (luminance) plane'
+    )
+    parser.add_argument(
+        '--codec',
+        choices=['h264', 'mjpeg'],
+        help='Codec written to disk, mjpeg for camera passthrough (default: recording.codec or h264)'
+    )
+    parser.add_argument(
+        '--no-history',
+        action='store_true',
+        help='Use the configured estimate instead of learning from past sessions'
+    )
     
     args = parser.parse_args()
     
-    success = check_disk_space(args.config, args.path, args.duration)
+    success = check_disk_space(args.config, args.path, args.duration, args.single_channel,
+                               not args.no_history, args.codec)
     sys.exit(0 if success else 1)
 
 if __name__ == '__main__':
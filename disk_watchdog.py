@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Live disk space watchdog for multicam recording
+Runs alongside the recorder, sampling the free space of the output disk and
+the growth of the recorded files, and computes the real write rate and the
+projected time until the disk is full. Every sample is written as one JSON
+line; warnings are raised as thresholds are crossed, and before the disk
+fills the cameras are stopped the way Ctrl+C stops them, so every file is
+finalized. record_supervisor.py runs the same watchdog in its event loop
+For usage, type python disk_watchdog.py -h
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import sys
+import time
+from collections import deque
+
+from disk_space_check import load_config
+
+# Seconds of samples the write rate is measured over
+RATE_WINDOW = 60
+
+def get_watchdog_settings(config):
+    """Watchdog thresholds from the disk_space section of the config"""
+    disk_config = config.get('disk_space', {})
+    return {
+        'interval': disk_config.get('watchdog_interval_seconds', 10),
+        'warn_minutes': sorted(disk_config.get('warn_minutes_to_full', [30, 10]), reverse=True),
+        'stop_minutes': disk_config.get('stop_minutes_to_full', 2),
+        'warning_free_gb': disk_config.get('warning_threshold_gb', 5),
+        'stop_free_gb': disk_config.get('stop_free_space_gb', 1),
+    }
+
+def get_output_size(output_dir):
+    """Total size in bytes of the files under a directory"""
+    total = 0
+    for dirpath, _, filenames in os.walk(output_dir):
+        for filename in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                # Temporary files may disappear between listing and stat
+                pass
+    return total
+
+class DiskWatchdog:
+    """
+    Samples free space and output growth and decides when to warn or stop
+
+    Write rates are measured over the last RATE_WINDOW seconds, both from
+    the shrinking free space (every writer on the disk) and from the
+    growing output files (the recorder alone). The larger of the two is
+    used to project how long the free space above stop_free_gb lasts.
+    """
+
+    def __init__(self, path, output_dir=None, warn_minutes=(30, 10), stop_minutes=2,
+                 warning_free_gb=5, stop_free_gb=1, window=RATE_WINDOW):
+        self.path = path
+        self.output_dir = output_dir or path
+        self.warn_minutes = sorted(warn_minutes, reverse=True)
+        self.stop_minutes = stop_minutes
+        self.warning_free_bytes = warning_free_gb * 1024**3
+        self.stop_free_bytes = stop_free_gb * 1024**3
+        self.window = window
+        self._samples = deque()
+        self._warned = set()
+
+    def _rate(self, index):
+        """Bytes per second of one sampled quantity over the window, None until two samples"""
+        first, last = self._samples[0], self._samples[-1]
+        elapsed = last[0] - first[0]
+        if elapsed <= 0:
+            return None
+        return max(0.0, (last[index] - first[index]) / elapsed)
+
+    def sample(self, now=None):
+        """
+        Measure the disk once
+
+        Returns:
+            dict: event 'disk' with time, free and output bytes, write rates
+            (bytes/s), minutes_to_full (None until a rate is known), level
+            ('ok', 'warning' or 'stop') and the warnings raised by this sample
+        """
+        now = time.time() if now is None else now
+        free = shutil.disk_usage(self.path).free
+        output = get_output_size(self.output_dir)
+        # Used space (negative free) grows as the disk fills
+        self._samples.append((now, -free, output))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+
+        disk_rate = self._rate(1)
+        output_rate = self._rate(2)
+        rates = [rate for rate in (disk_rate, output_rate) if rate is not None]
+        write_rate = max(rates) if rates else None
+        minutes_to_full = None
+        if write_rate:
+            minutes_to_full = max(0.0, free - self.stop_free_bytes) / write_rate / 60
+
+        warnings = []
+        if free < self.warning_free_bytes and 'free' not in self._warned:
+            self._warned.add('free')
+            warnings.append(f'free space below {self.warning_free_bytes / 1024**3:g} GB')
+        if minutes_to_full is not None:
+            # One warning however many thresholds were crossed since the last sample
+            crossed = [minutes for minutes in self.warn_minutes
+                       if minutes_to_full <= minutes and minutes not in self._warned]
+            if crossed:
+                self._warned.update(crossed)
+                warnings.append(f'disk full in {minutes_to_full:.1f} minutes')
+
+        stop = free <= self.stop_free_bytes or (
+            minutes_to_full is not None and minutes_to_full <= self.stop_minutes)
+        if stop:
+            level = 'stop'
+        elif self._warned:
+            level = 'warning'
+        else:
+            level = 'ok'
+        return {
+            'event': 'disk',
+            'time': now,
+            'path': os.path.abspath(self.path),
+            'free_bytes': free,
+            'output_bytes': output,
+            'disk_rate': disk_rate,
+            'output_rate': output_rate,
+            'write_rate': write_rate,
+            'minutes_to_full': minutes_to_full,
+            'level': level,
+            'warnings': warnings,
+        }
+
+def format_sample(sample):
+    """One line summary of a sample for the terminal"""
+    rate = sample['write_rate']
+    minutes = sample['minutes_to_full']
+    return (f"disk: {sample['free_bytes'] / 1024**3:.2f} GB free, "
+            f"writing {rate / 1024**2 if rate is not None else 0:.1f} MB/s, "
+            f"full in {f'{minutes:.1f} min' if minutes is not None else 'unknown'}")
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Watch free disk space while recording and stop the cameras before the disk fills'
+    )
+    parser.add_argument(
+        '--config',
+        default='config.json',
+        help='Path to configuration file (default: config.json)'
+    )
+    parser.add_argument(
+        '--path',
+        default='.',
+        help='Directory the recording is written to (default: current directory)'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        help='Seconds between samples (default: disk_space.watchdog_interval_seconds or 10)'
+    )
+    parser.add_argument(
+        '--stop-group',
+        action='store_true',
+        help='On stop, send SIGINT to this process group (the recording script and its ffmpegs), like Ctrl+C'
+    )
+    parser.add_argument(
+        '--stop-pid',
+        type=int,
+        action='append',
+        default=[],
+        help='On stop, send SIGINT to this process (repeat for several)'
+    )
+    return parser.parse_args()
+
+def main():
+    """Print one JSON line per sample until the disk is about to fill or the watchdog is stopped"""
+    args = parse_arguments()
+    settings = get_watchdog_settings(load_config(args.config))
+    interval = args.interval or settings['interval']
+    watchdog = DiskWatchdog(args.path, args.path, settings['warn_minutes'], settings['stop_minutes'],
+                            settings['warning_free_gb'], settings['stop_free_gb'])
+
+    parent = os.getppid()
+    try:
+        # Run until stopped, or until the recording script that started the watchdog is gone
+        while os.getppid() == parent:
+            sample = watchdog.sample()
+            print(json.dumps(sample), flush=True)
+            for warning in sample['warnings']:
+                print(f"⚠️  WARNING: {warning} ({format_sample(sample)})", file=sys.stderr)
+            if sample['level'] == 'stop':
+                print(f"❌ Stopping recording before the disk fills ({format_sample(sample)})", file=sys.stderr)
+                for pid in args.stop_pid:
+                    os.kill(pid, signal.SIGINT)
+                if args.stop_group:
+                    # Like Ctrl+C, without stopping the watchdog itself first
+                    signal.signal(signal.SIGINT, signal.SIG_IGN)
+                    os.killpg(os.getpgrp(), signal.SIGINT)
+                sys.exit(2)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        # Recording was stopped with Ctrl+C
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Dropped-frame and timing-gap analysis of recorded sessions
+Reads the packet timestamps of every camera file in one demux-only ffprobe
+pass (cached in the video index sidecar, see video_index.py), and the
+capture timestamps sidecar where the recorder wrote one, and finds gaps
+(dropped frames), duplicates and drift against the nominal frame rate with
+vectorized NumPy. The effective duration of every camera is compared with
+the start and stop times of the session's markers file. One JSON report is
+written per session as <session>_frames.json, and the camera files of a
+whole output directory are analyzed in parallel
+For usage, type python frame_analysis.py -h
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from disk_space_check import load_config
+from frame_timestamps import get_timestamp_path, read_timestamps, join_timestamp_files
+from split_script import read_timelist
+from storage_index import CAPTURE_SUFFIX
+from video_index import load_video_index
+from combine_utils.session_files import find_sessions, join_session_parts
+
+# Report written next to the session markers
+REPORT_SUFFIX = '_frames.json'
+
+# An interval longer than this many frame periods is a gap (at least one dropped frame)
+GAP_FACTOR = 1.5
+
+# An interval shorter than this many frame periods is a duplicate
+DUPLICATE_FACTOR = 0.5
+
+# Seconds a camera's duration may differ from the markers before it is reported
+MARKER_TOLERANCE = 2.0
+
+# Largest gaps listed per camera
+MAX_LISTED_GAPS = 10
+
+def analyze_frame_times(times, frame_rate):
+    """
+    Gaps, duplicates and drift of a sequence of frame times
+
+    Args:
+        times: Sorted frame times in seconds (any origin)
+        frame_rate: Nominal frames per second
+
+    Returns:
+        dict: frames, duration (s, first frame to the end of the last one),
+        measured_fps, gaps (count, missing_frames and the largest ones with
+        time from the first frame, interval and missing), duplicates and
+        drift (final_s and max_s of the frame times against the nominal
+        clock, and ppm of the fitted rate)
+    """
+    times = np.asarray(times, dtype=np.float64)
+    period = 1.0 / frame_rate
+    n_frames = len(times)
+    result = {
+        'frames': n_frames,
+        'duration': float(times[-1] - times[0] + period) if n_frames else 0.0,
+        'measured_fps': None,
+        'gaps': {'count': 0, 'missing_frames': 0, 'largest': []},
+        'duplicates': 0,
+        'drift': {'final_s': 0.0, 'max_s': 0.0, 'ppm': 0.0},
+    }
+    if n_frames < 2:
+        return result
+
+    intervals = np.diff(times)
+    elapsed = times[-1] - times[0]
+    if elapsed > 0:
+        result['measured_fps'] = float((n_frames - 1) / elapsed)
+
+    gap_mask = intervals > GAP_FACTOR * period
+    missing = np.where(gap_mask, np.rint(intervals / period) - 1, 0).astype(np.int64)
+    gap_indices = np.flatnonzero(gap_mask)
+    largest = gap_indices[np.argsort(intervals[gap_indices], kind='stable')[::-1][:MAX_LISTED_GAPS]]
+    result['gaps'] = {
+        'count': int(len(gap_indices)),
+        'missing_frames': int(missing.sum()),
+        'largest': [{'time': float(times[i] - times[0]), 'interval': float(intervals[i]),
+                     'missing': int(missing[i])} for i in largest],
+    }
+    result['duplicates'] = int(np.count_nonzero(intervals < DUPLICATE_FACTOR * period))
+
+    # Frame times against a clock that ticks once per recorded frame
+    drift = times - times[0] - np.arange(n_frames) * period
+    slope = np.polyfit(np.arange(n_frames, dtype=np.float64) * period, times - times[0], 1)[0]
+    result['drift'] = {
+        'final_s': float(drift[-1]),
+        'max_s': float(drift[np.argmax(np.abs(drift))]),
+        'ppm': float((slope - 1.0) * 1e6),
+    }
+    return result
+
+def has_problems(analysis, marker_duration=None):
+    """Check an analysis for gaps, duplicates or a duration off the markers"""
+    if analysis['gaps']['count'] or analysis['duplicates']:
+        return True
+    return marker_duration is not None and abs(analysis['duration'] - marker_duration) > MARKER_TOLERANCE
+
+def get_session_frame_rate(session, default_rate):
+    """Nominal frame rate of a session from its capture file, else default_rate"""
+    capture_file = os.path.join(session['directory'], session['name'] + CAPTURE_SUFFIX)
+    try:
+        with open(capture_file) as f:
+            return json.load(f).get('frame_rate') or default_rate
+    except (FileNotFoundError, ValueError):
+        return default_rate
+
+def analyze_video(video, frame_rate, markers=None):
+    """
+    Analyze one camera file
+
+    Returns:
+        dict: video, packets (analysis of the packet timestamps), capture
+        (analysis of the capture timestamps sidecar, with the first and
+        last frame relative to the start and stop markers, or None) and
+        problems
+    """
+    index = load_video_index(video)
+    marker_duration = markers[1] - markers[0] if markers is not None else None
+    packets = analyze_frame_times(index['pts'], frame_rate)
+    if marker_duration is not None:
+        packets['duration_vs_markers'] = packets['duration'] - marker_duration
+
+    capture = None
+    if os.path.exists(get_timestamp_path(video)):
+        times = read_timestamps(get_timestamp_path(video))
+        capture = analyze_frame_times(times, frame_rate)
+        if markers is not None and len(times):
+            capture['duration_vs_markers'] = capture['duration'] - marker_duration
+            capture['start_after_marker'] = float(times[0] - markers[0])
+            capture['stop_before_marker'] = float(markers[1] - times[-1])
+
+    problems = has_problems(packets, marker_duration) or (
+        capture is not None and has_problems(capture, marker_duration))
+    return {'video': video, 'packets': packets, 'capture': capture, 'problems': bool(problems)}
+
+def get_session_markers(session):
+    """(start, stop) of a session's markers file, None while it has no stop marker"""
+    marker_vec = read_timelist(session['marker_file'])
+    return tuple(marker_vec[:2]) if len(marker_vec) >= 2 else None
+
+def write_session_report(session, frame_rate, markers, cameras):
+    """
+    Write the report of a session from the analyses of its cameras
+
+    Returns:
+        dict: The report, also written to <session>_frames.json
+    """
+    report = {
+        'session': session['name'],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'frame_rate': frame_rate,
+        'markers': None if markers is None else {
+            'start': markers[0], 'stop': markers[1], 'duration': markers[1] - markers[0]},
+        'cameras': cameras,
+        'ok': not any(camera['problems'] for camera in cameras),
+    }
+    path = os.path.join(session['directory'], session['name'] + REPORT_SUFFIX)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return report
+
+def analyze_sessions(sessions, frame_rate, jobs=1):
+    """
+    Analyze every camera of every session and write the session reports
+
+    Cameras are analyzed in jobs processes at once, across sessions, so
+    one long session with many cameras is spread over all of them. Cameras
+    recorded in several parts are analyzed joined (see join_session_parts).
+
+    Args:
+        frame_rate: Nominal frame rate of sessions without a capture file
+
+    Returns:
+        list: Reports in the order of sessions
+    """
+    for session in sessions:
+        join_session_parts(session, join_timestamp_files)
+    plans = [(get_session_frame_rate(session, frame_rate), get_session_markers(session)) for session in sessions]
+    cameras = [[None] * len(session['video_files']) for session in sessions]
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {}
+        for session_num, (session, (rate, markers)) in enumerate(zip(sessions, plans)):
+            for video_num, video in enumerate(session['video_files']):
+                futures[executor.submit(analyze_video, video, rate, markers)] = (session_num, video_num)
+        for future in as_completed(futures):
+            session_num, video_num = futures[future]
+            try:
+                camera = future.result()
+            except Exception as e:
+                video = sessions[session_num]['video_files'][video_num]
+                camera = {'video': video, 'error': f'{type(e).__name__}: {e}', 'problems': True}
+            cameras[session_num][video_num] = camera
+    return [write_session_report(session, rate, markers, session_cameras)
+            for session, (rate, markers), session_cameras in zip(sessions, plans, cameras)]
+
+def format_camera(camera):
+    """One line summary of a camera's analysis"""
+    name = os.path.basename(camera['video'])
+    if 'error' in camera:
+        return f"{name}: error: {camera['error']}"
+    parts = []
+    for source in ('packets', 'capture'):
+        analysis = camera[source]
+        if analysis is None:
+            continue
+        gaps = analysis['gaps']
+        text = (f"{source} {analysis['frames']} frames, {gaps['count']} gaps "
+                f"({gaps['missing_frames']} missing), {analysis['duplicates']} duplicates, "
+                f"drift {analysis['drift']['final_s']:+.3f} s")
+        if 'duration_vs_markers' in analysis:
+            text += f", {analysis['duration_vs_markers']:+.2f} s vs markers"
+        parts.append(text)
+    return f"{'⚠️ ' if camera['problems'] else '✅'} {name}: {'; '.join(parts)}"
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Find dropped and duplicated frames and timing drift in recorded sessions'
+    )
+    parser.add_argument(
+        'root',
+        help='Session directory or directory to search for sessions (e.g. ./recorded_videos)'
+    )
+    parser.add_argument(
+        '--config',
+        default='config.json',
+        help='Configuration with recording.frame_rate, used when a session has no capture file '
+             '(default: config.json)'
+    )
+    parser.add_argument(
+        '--frame-rate',
+        type=float,
+        help='Nominal frame rate of sessions without a capture file (default: from the config)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Camera files analyzed in parallel (default: number of CPU cores)'
+    )
+    return parser.parse_args()
+
+def main():
+    """Analyze every session under the root directory"""
+    args = parse_arguments()
+    frame_rate = args.frame_rate or load_config(args.config).get('recording', {}).get('frame_rate', 30)
+
+    sessions = [session for session in find_sessions(args.root) if session['video_files']]
+    if not sessions:
+        print(f"No recorded sessions found in {args.root}")
+        sys.exit(1)
+
+    n_problems = 0
+    for report in analyze_sessions(sessions, frame_rate, args.jobs):
+        print(f"{report['session']}:")
+        for camera in report['cameras']:
+            print(f"  {format_camera(camera)}")
+        if not report['ok']:
+            n_problems += 1
+
+    print(f"\n{len(sessions)} session(s) analyzed, {n_problems} with problems "
+          f"(reports: <session>{REPORT_SUFFIX})")
+    if n_problems:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Per-frame capture timestamp sidecars
+Every recorded video gets a <video>.timestamps.f64 sidecar holding the
+capture time of each frame as little-endian float64 Unix seconds, one
+value per frame in file order. The file has no header so it can be
+appended to while recording and read with a single np.fromfile
+For usage, type python frame_timestamps.py -h
+"""
+
+import argparse
+import os
+import sys
+from array import array
+
+import numpy as np
+
+# Suffix of the sidecar written next to every recorded video
+TIMESTAMP_SUFFIX = '.timestamps.f64'
+
+# One capture time per frame, Unix seconds
+TIMESTAMP_DTYPE = np.dtype('<f8')
+
+# Timestamps buffered before they are written, about 2 s at 30 fps
+FLUSH_EVERY = 64
+
+def get_timestamp_path(video_path):
+    """Path of the timestamp sidecar for a video"""
+    return video_path + TIMESTAMP_SUFFIX
+
+def parse_timecode_line(line):
+    """
+    Parse one line of ffmpeg's mkvtimestamp_v2 output
+
+    Returns:
+        float or None: Frame time in ms from the start of the stream, None
+        for the '# timecode format v2' header and blank lines
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    return float(line)
+
+class TimestampWriter:
+    """
+    Buffered, append-only writer of a timestamp sidecar
+
+    Values are collected in an array and written with one call every
+    flush_every frames, so recording many cameras costs a handful of
+    writes per second. A crash loses at most the unflushed values.
+    """
+
+    def __init__(self, path, flush_every=FLUSH_EVERY):
+        self.path = path
+        self.flush_every = flush_every
+        self.n_written = 0
+        self._buffer = array('d')
+        self._file = open(path, 'ab')
+
+    def append(self, timestamp):
+        """Add the capture time of the next frame"""
+        self._buffer.append(timestamp)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered values"""
+        if not self._buffer:
+            return
+        if sys.byteorder != 'little':
+            self._buffer.byteswap()
+        self._file.write(self._buffer.tobytes())
+        self._file.flush()
+        self.n_written += len(self._buffer)
+        self._buffer = array('d')
+
+    def close(self):
+        """Flush and close the sidecar"""
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_timestamps(path):
+    """Read a sidecar, ignoring a partly written last value"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    n = len(data) // TIMESTAMP_DTYPE.itemsize
+    return np.frombuffer(data, dtype=TIMESTAMP_DTYPE, count=n).astype(np.float64)
+
+def load_frame_timestamps(video_path):
+    """
+    Capture time of every frame of a recorded video
+
+    Returns:
+        np.ndarray or None: float64 Unix seconds per frame, None if the
+        video has no sidecar
+    """
+    try:
+        return read_timestamps(get_timestamp_path(video_path))
+    except FileNotFoundError:
+        return None
+
+def join_timestamp_files(videos, output_video):
+    """
+    Join the sidecars of videos recorded one after another into the sidecar of output_video
+
+    Nothing is written unless every video has a sidecar, or if the joined
+    sidecar is newer than all of them.
+    """
+    paths = [get_timestamp_path(video) for video in videos]
+    if not all(os.path.exists(path) for path in paths):
+        return
+    output_path = get_timestamp_path(output_video)
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= max(map(os.path.getmtime, paths)):
+        return
+    tmp_path = output_path + '.tmp'
+    np.concatenate([read_timestamps(path) for path in paths]).astype(TIMESTAMP_DTYPE).tofile(tmp_path)
+    os.replace(tmp_path, output_path)
+
+def summarize_timestamps(timestamps):
+    """Frame count, span, mean rate and the largest gap of a timestamp array"""
+    intervals = np.diff(timestamps)
+    return {
+        'frames': len(timestamps),
+        'first': float(timestamps[0]) if len(timestamps) else None,
+        'duration': float(timestamps[-1] - timestamps[0]) if len(timestamps) > 1 else 0.0,
+        'mean_fps': float(1 / intervals.mean()) if len(intervals) and intervals.mean() > 0 else None,
+        'max_gap': float(intervals.max()) if len(intervals) else None,
+    }
+
+def main():
+    """Print a summary of the timestamp sidecars of videos"""
+    parser = argparse.ArgumentParser(
+        description='Summarize the per-frame capture timestamps recorded next to videos'
+    )
+    parser.add_argument('video_files', nargs='+', help='Recorded videos')
+    args = parser.parse_args()
+
+    for video in args.video_files:
+        timestamps = load_frame_timestamps(video)
+        if timestamps is None:
+            print(f"{video}: no timestamp sidecar")
+            continue
+        summary = summarize_timestamps(timestamps)
+        print(f"{video}: {summary['frames']} frames over {summary['duration']:.3f} s, "
+              f"mean {summary['mean_fps'] or 0:.3f} fps, largest gap {(summary['max_gap'] or 0) * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Multi-volume output for recordings
+config.json output_volumes lists several directories, usually on different
+disks. Every volume's sequential write throughput is measured, cameras are
+assigned to the volumes by free space and throughput, and a camera whose
+volume runs low is moved to another one (see record_supervisor.py). Where
+every camera's files went is kept in <session>_volumes.json in the session
+directory of the first volume, which downstream tools read instead of
+looking for <session>_cam<n>.mp4 next to the markers
+For usage, type python output_volumes.py -h
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from disk_space_check import load_config, get_capture_config, get_num_cameras
+from storage_index import estimate_storage_rate
+from combine_utils.session_files import get_volumes_file, load_volume_manifest, get_manifest_videos
+
+# Size of the synced write used to measure a volume's throughput
+PROBE_SIZE = 64 * 1024**2
+
+# Fraction of a volume's measured throughput the cameras on it may use
+BANDWIDTH_HEADROOM = 0.5
+
+def get_output_volumes(config, output_dir=None):
+    """Output directories to record to: output_dir if given, else config output_volumes"""
+    if output_dir:
+        return [output_dir]
+    return config.get('output_volumes') or ['./recorded_videos']
+
+def estimate_camera_rate(config, output_dir, single_channel=False, codec=None):
+    """
+    Bytes per second one camera writes
+
+    Learned from past sessions in output_dir (see storage_index), else the
+    configured estimated_space_per_minute_gb shared by the cameras.
+    """
+    learned = estimate_storage_rate(output_dir, get_capture_config(config, single_channel, codec))
+    if learned is not None:
+        gb_per_camera_minute = learned['gb_per_camera_minute']
+    else:
+        disk_config = config.get('disk_space', {})
+        gb_per_camera_minute = disk_config.get('estimated_space_per_minute_gb', 0.5) / get_num_cameras(config)
+    return gb_per_camera_minute * 1024**3 / 60
+
+def measure_write_throughput(path, size=PROBE_SIZE):
+    """Bytes per second of a sequential write of size bytes, synced to the disk"""
+    block = os.urandom(min(size, 1024**2))
+    fd, tmp_path = tempfile.mkstemp(dir=path, prefix='.throughput_')
+    try:
+        start = time.perf_counter()
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(max(1, size // len(block))):
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        elapsed = time.perf_counter() - start
+    finally:
+        os.remove(tmp_path)
+    return max(1, size // len(block)) * len(block) / max(elapsed, 1e-6)
+
+def plan_camera_volumes(free, throughput, n_cameras, camera_rate, load=None, exclude=()):
+    """
+    Assign cameras to volumes
+
+    Each camera goes to the volume that would last longest with it added,
+    among the volumes whose throughput leaves room for one more camera
+    (BANDWIDTH_HEADROOM); if none has room, to the volume with the most
+    throughput per camera.
+
+    Args:
+        free: Free bytes of every volume
+        throughput: Measured write throughput (bytes/s) of every volume
+        n_cameras: Cameras to assign
+        camera_rate: Bytes per second one camera writes
+        load: Cameras already on every volume (default: none)
+        exclude: Volumes not to use, e.g. ones that ran low
+
+    Returns:
+        list: Volume index of every camera, empty if every volume is excluded
+    """
+    load = list(load) if load is not None else [0] * len(free)
+    usable = [i for i in range(len(free)) if i not in exclude]
+    if not usable:
+        return []
+    assignment = []
+    for _ in range(n_cameras):
+        fits = [i for i in usable if (load[i] + 1) * camera_rate <= throughput[i] * BANDWIDTH_HEADROOM]
+        if fits:
+            best = max(fits, key=lambda i: free[i] / ((load[i] + 1) * max(camera_rate, 1)))
+        else:
+            best = max(usable, key=lambda i: throughput[i] / (load[i] + 1))
+        load[best] += 1
+        assignment.append(best)
+    return assignment
+
+class OutputVolume:
+    """One output directory of a session and the cameras recording to it"""
+
+    def __init__(self, root, session_name, throughput=None, watchdog=None):
+        self.root = root
+        self.session_dir = os.path.join(root, session_name)
+        self.output_prefix = os.path.join(self.session_dir, session_name)
+        self.throughput = throughput
+        self.watchdog = watchdog
+        self.cameras = []
+        self.full = False
+
+    def free_bytes(self):
+        return shutil.disk_usage(self.root).free
+
+def write_volume_manifest(path, session_name, volumes, cameras):
+    """
+    Write where every camera's files went
+
+    Args:
+        volumes: OutputVolume list
+        cameras: One dict per camera with cam, device and files (paths in
+            recording order)
+    """
+    manifest = {
+        'session': session_name,
+        'volumes': [{'root': os.path.abspath(volume.root), 'throughput': volume.throughput}
+                    for volume in volumes],
+        'cameras': [dict(camera, files=[os.path.abspath(path) for path in camera['files']])
+                    for camera in cameras],
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def main():
+    """Print free space and measured throughput of the configured output volumes"""
+    parser = argparse.ArgumentParser(
+        description='Measure the output volumes of config.json and show how cameras would be assigned'
+    )
+    parser.add_argument(
+        '--config',
+        default='config.json',
+        help='Path to configuration file (default: config.json)'
+    )
+    parser.add_argument(
+        '--probe-mb',
+        type=int,
+        default=PROBE_SIZE // 1024**2,
+        help=f'MB written to measure every volume (default: {PROBE_SIZE // 1024**2})'
+    )
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    roots = get_output_volumes(config)
+    free = []
+    throughput = []
+    for root in roots:
+        if not os.path.isdir(root):
+            print(f"❌ Missing: {root}")
+            sys.exit(1)
+        free.append(shutil.disk_usage(root).free)
+        throughput.append(measure_write_throughput(root, args.probe_mb * 1024**2))
+        print(f"{root}: {free[-1] / 1024**3:.1f} GB free, {throughput[-1] / 1024**2:.0f} MB/s")
+
+    camera_rate = estimate_camera_rate(config, roots[0])
+    print(f"Every camera writes about {camera_rate / 1024**2:.1f} MB/s")
+    for cam, volume in enumerate(plan_camera_volumes(free, throughput, get_num_cameras(config), camera_rate)):
+        print(f"cam{cam}: {roots[volume]}")
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,8 @@ Outputs:
 -Marker text file (start and stop times for recording)
 
 Options:
+- MJPEG passthrough: Writes the cameras MJPEG as is (MKV), without encoding; the session is
+  transcoded to H.264 in the background once the machine is idle (see transcode_queue.py)
 - Single channel recording: Uses extractplanes filter to record only Y (luminance) channel for better performance
 - Normal recording: Records full color video
 '
@@ -39,26 +41,65 @@ setup_recording_directory "$output_dir" "$fin_name"
 # Build device list for parallel execution
 build_device_list
 
-# Ask for single channel recording option
-echo -n "Record single channel (Y/luminance only) for better performance? (y/n): "
-read single_channel
+# Ask for MJPEG passthrough option
+echo -n "Record the cameras' MJPEG without encoding (transcoded to H.264 later, when idle)? (y/n): "
+read mjpeg_passthrough
+
+# Single channel and segments need encoding
+if [[ ! "$mjpeg_passthrough" =~ ^[Yy]$ ]]; then
+    # Ask for single channel recording option
+    echo -n "Record single channel (Y/luminance only) for better performance? (y/n): "
+    read single_channel
+
+    # Ask for segmented recording option
+    echo -n "Record in segments of how many minutes? (leave empty for one file per camera): "
+    read segment_minutes
+fi
+
+# Output of every camera: one MP4, or fragmented MP4 chunks listed in a running index
+# (see segment_index.py, join them with: python segment_index.py join <session>)
+# The key frame expression is quoted for eval below and again for the shell GNU parallel runs it in
+if [[ "$segment_minutes" =~ ^[0-9]+([.][0-9]+)?$ ]]; then
+    segment_time=$(awk "BEGIN { print $segment_minutes * 60 }")
+    echo "Recording in ${segment_minutes} minute segments..."
+    output_string="-force_key_frames \"'expr:gte(t,n_forced*$segment_time)'\" -f segment -segment_time $segment_time -segment_format mp4 -segment_format_options movflags=+frag_keyframe+empty_moov+default_base_moof:frag_duration=1000000 -reset_timestamps 1 -segment_list name_cam{1}_segments.csv -segment_list_type csv name_cam{1}_seg%04d.mp4"
+else
+    output_string="name_cam{1}.mp4"
+fi
 
 # Generate string to be evaluated using ffmpeg for video recording
-if [[ "$single_channel" =~ ^[Yy]$ ]]; then
+if [[ "$mjpeg_passthrough" =~ ^[Yy]$ ]]; then
+    echo "Recording camera MJPEG without encoding..."
+    single_channel_json=false
+    capture_codec=mjpeg
+    exec_string="echo -e '$DEVICE_LIST' | parallel -j $NUM_CAMERAS --colsep ':' ffmpeg -f v4l2 -input_format mjpeg -s 1280x720 -r 30 -i {2} -map 0:v -c:v copy name_cam{1}.mkv"
+elif [[ "$single_channel" =~ ^[Yy]$ ]]; then
     echo "Recording single channel (Y/luminance only) for better performance..."
-    exec_string="echo -e '$DEVICE_LIST' | parallel -j $NUM_CAMERAS --colsep ':' ffmpeg -f v4l2 -i {2} -s 1280x720 -r 30 -vf \"extractplanes=y\" -c:v libx264 -preset ultrafast -crf 23 -pix_fmt yuv420p name_cam{1}.mp4"
+    single_channel_json=true
+    exec_string="echo -e '$DEVICE_LIST' | parallel -j $NUM_CAMERAS --colsep ':' ffmpeg -f v4l2 -i {2} -s 1280x720 -r 30 -vf \"extractplanes=y\" -c:v libx264 -preset ultrafast -crf 23 -pix_fmt yuv420p $output_string"
 else
     echo "Recording full color video..."
-    exec_string="echo -e '$DEVICE_LIST' | parallel -j $NUM_CAMERAS --colsep ':' ffmpeg -f v4l2 -i {2} -s 1280x720 -r 30 -c:v libx264 -preset ultrafast -crf 23 -pix_fmt yuv420p name_cam{1}.mp4"
+    single_channel_json=false
+    exec_string="echo -e '$DEVICE_LIST' | parallel -j $NUM_CAMERAS --colsep ':' ffmpeg -f v4l2 -i {2} -s 1280x720 -r 30 -c:v libx264 -preset ultrafast -crf 23 -pix_fmt yuv420p $output_string"
 fi
 
 time_file="${fin_name}_markers.txt"
+write_capture_info "${fin_name}_capture.json" "${capture_codec:-h264}" "$single_channel_json"
 
 # Start recording with marker
 start_recording "$time_file"
 
+# Stop the cameras before the disk fills
+start_disk_watchdog "$SCRIPT_DIR" "${fin_name}_disk.jsonl"
+
 # Execute video recording
-eval $exec_string
+eval "$exec_string"
 
 # Stop recording with marker
+stop_disk_watchdog
 stop_recording "$time_file"
+
+# Re-encode the MJPEG files to H.264 once the machine is idle
+if [[ "$mjpeg_passthrough" =~ ^[Yy]$ ]]; then
+    queue_transcode "$SCRIPT_DIR"
+fi
@@ -40,12 +40,17 @@ build_device_list
 exec_string="echo -e '$DEVICE_LIST' | parallel -j $NUM_CAMERAS --colsep ':' streamer -q -c {2} -s 1280x720 -f jpeg -t $frames -r 30 -j 75 -w 0 -o ${fin_name}_cam{1}.avi"
 
 time_file="${fin_name}_markers.txt"
+write_capture_info "${fin_name}_capture.json" mjpeg false
 
 # Start recording with marker
 start_recording "$time_file"
 
+# Stop the cameras before the disk fills
+start_disk_watchdog "$SCRIPT_DIR" "${fin_name}_disk.jsonl"
+
 # Execute video recording
 eval $exec_string
 
 # Stop recording with marker
+stop_disk_watchdog
 stop_recording "$time_file"
@@ -0,0 +1,916 @@
+#!/usr/bin/env python3
+"""
+Recording supervisor for multicam recording
+Launches one ffmpeg capture per device in config.json video_devices under a
+single asyncio event loop, watches each capture's progress and stderr,
+restarts captures that fail or stall, writes per-camera start, stop and
+restart events next to the session markers, and stops every camera cleanly
+(finalizing its file) on Ctrl+C, at the end of the requested duration or
+before the disk fills (see disk_watchdog.py)
+With --segment-minutes every camera is recorded as fixed-length chunks
+plus a running segment index instead of one file (see segment_index.py)
+With --mjpeg the cameras' MJPEG streams are written to .mkv files as they
+arrive, without encoding, and the session is queued to be transcoded to
+H.264 once the machine is idle (see transcode_queue.py)
+With --shared-clock every camera is an input of one ffmpeg process that
+starts them together and stamps all their frames on one clock
+Devices of the form lavfi:<source> (e.g. lavfi:testsrc) stand in for
+/dev/video* so the supervisor can be run and tested without cameras, and
+devices of the form file:<path> replay a recorded file (e.g. MJPEG) in a loop
+For usage, type python record_supervisor.py -h
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import sys
+import time
+from collections import deque
+
+from disk_space_check import load_config, check_disk_space
+from disk_watchdog import DiskWatchdog, format_sample, get_watchdog_settings
+from frame_timestamps import get_timestamp_path, parse_timecode_line, TimestampWriter
+from segment_index import build_segment_output_args, get_segment_paths, read_segment_index
+from storage_index import CAPTURE_SUFFIX, write_capture_info
+from output_volumes import (
+    OutputVolume, estimate_camera_rate, get_output_volumes, get_volumes_file, measure_write_throughput,
+    plan_camera_volumes, write_volume_manifest)
+from transcode_queue import enqueue_session, start_worker
+from combine_utils.ffmpeg_progress import parse_progress_block
+
+# Prefix of devices that are lavfi sources instead of cameras
+LAVFI_PREFIX = 'lavfi:'
+
+# Prefix of devices that replay a file instead of a camera
+FILE_PREFIX = 'file:'
+
+# Encoder settings of parallel2video_ffmpeg.sh, unless config.json recording has preset and crf
+# (see benchmarks/benchmark_capture.py)
+CAPTURE_PRESET = 'ultrafast'
+CAPTURE_CRF = 23
+
+# Container of passthrough captures, readable up to the last frame written if ffmpeg dies
+PASSTHROUGH_EXTENSION = '.mkv'
+
+# stderr lines kept per capture for error reports
+STDERR_LINES = 20
+
+# Seconds a capture gets to finalize its file after being asked to stop
+STOP_TIMEOUT = 10
+
+# Start time of the input in ffmpeg's stream dump, the origin of frame timestamps
+INPUT_START_PATTERN = re.compile(r'Duration: .*, start: (-?\d+\.\d+)')
+
+# Input start times below this are not Unix times (e.g. lavfi sources start at 0)
+MIN_EPOCH_START = 1e9
+
+def parse_arguments(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Record from every camera in config.json, restarting captures that fail'
+    )
+    parser.add_argument(
+        '--name',
+        required=True,
+        help='Base name of the session, files are named <name>_video_<timestamp>_cam<n>.mp4'
+    )
+    parser.add_argument(
+        '--output-dir',
+        help='Directory to save recordings (default: config output_volumes, else ./recorded_videos)'
+    )
+    parser.add_argument(
+        '--config',
+        default='config.json',
+        help='Path to configuration file (default: config.json)'
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        help='Stop after this many minutes (default: record until Ctrl+C)'
+    )
+    parser.add_argument(
+        '--single-channel',
+        action='store_true',
+        help='Record only the Y (luminance) plane (default: config recording.single_channel)'
+    )
+    parser.add_argument(
+        '--test-source',
+        action='store_true',
+        help='Record a lavfi testsrc in place of every configured device'
+    )
+    parser.add_argument(
+        '--max-restarts',
+        type=int,
+        default=5,
+        help='Restarts of a failing capture before it is given up (default: 5)'
+    )
+    parser.add_argument(
+        '--stall-timeout',
+        type=float,
+        default=10,
+        help='Restart a capture whose recorded time has not advanced for this many seconds (default: 10)'
+    )
+    parser.add_argument(
+        '--status-interval',
+        type=float,
+        default=30,
+        help='Seconds between status lines, 0 to disable (default: 30)'
+    )
+    parser.add_argument(
+        '--segment-minutes',
+        type=float,
+        help='Record every camera as chunks of this many minutes with a running segment index '
+             '(join them with python segment_index.py join <session>)'
+    )
+    parser.add_argument(
+        '--mjpeg',
+        action='store_true',
+        help='Request MJPEG from the cameras and write it without encoding, then queue the session '
+             'to be transcoded to H.264 when the machine is idle'
+    )
+    parser.add_argument(
+        '--no-transcode',
+        action='store_true',
+        help='With --mjpeg, keep the MJPEG files and do not queue the session'
+    )
+    parser.add_argument(
+        '--shared-clock',
+        action='store_true',
+        help='Record every camera as an input of one ffmpeg process, started together and stamped on one clock '
+             '(default: config recording.shared_clock)'
+    )
+    parser.add_argument(
+        '--no-timestamps',
+        action='store_true',
+        help='Do not write per-frame capture timestamp sidecars'
+    )
+    parser.add_argument(
+        '--no-watchdog',
+        action='store_true',
+        help='Do not watch free disk space while recording'
+    )
+    parser.add_argument(
+        '--skip-disk-check',
+        action='store_true',
+        help='Do not check for free disk space before recording'
+    )
+    args = parser.parse_args(argv)
+    if args.mjpeg and (args.single_channel or args.segment_minutes):
+        parser.error('--mjpeg writes the camera stream as is and cannot be combined with '
+                     '--single-channel or --segment-minutes')
+    return args
+
+def get_capture_settings(config):
+    """Resolution, frame rate and encoder settings of the captures from the recording section of the config"""
+    recording = config.get('recording', {})
+    return {
+        'video_resolution': recording.get('video_resolution', '1280x720'),
+        'frame_rate': recording.get('frame_rate', 30),
+        'preset': recording.get('preset', CAPTURE_PRESET),
+        'crf': recording.get('crf', CAPTURE_CRF),
+    }
+
+def get_session_name(name, start_time=None):
+    """<name>_video_<yymmdd-HHMMSS>, like generate_recording_name in recording_utils.sh"""
+    return f"{name}_video_{time.strftime('%y%m%d-%H%M%S', time.localtime(start_time))}"
+
+def is_passthrough(settings):
+    """Check whether captures write the camera's stream without encoding"""
+    return settings.get('input_format') == 'mjpeg'
+
+def get_capture_extension(settings):
+    """Extension of the files captures write"""
+    return PASSTHROUGH_EXTENSION if is_passthrough(settings) else '.mp4'
+
+def build_input_args(device, settings):
+    """ffmpeg input options of one device, a camera or a lavfi or file stand-in"""
+    size = settings['video_resolution']
+    rate = settings['frame_rate']
+    if device.startswith(LAVFI_PREFIX):
+        source = device[len(LAVFI_PREFIX):]
+        if '=' not in source:
+            source = f'{source}=size={size}:rate={rate}'
+        # Read at the native rate, like a camera
+        return ['-re', '-f', 'lavfi', '-i', source]
+    if device.startswith(FILE_PREFIX):
+        # ffmpeg reads file:<path> itself; loop at the native rate, like a camera
+        return ['-re', '-stream_loop', '-1', '-i', device]
+    input_format = ['-input_format', settings['input_format']] if is_passthrough(settings) else []
+    # Kernel capture timestamps, converted to Unix time
+    return ['-f', 'v4l2', '-ts', 'abs', *input_format, '-s', size, '-r', str(rate), '-i', device]
+
+def build_output_args(input_index, output_file, settings, single_channel=False, timestamp_fd=None,
+                      segment_time=None):
+    """ffmpeg output options recording input input_index to output_file (see build_capture_command)"""
+    passthrough = is_passthrough(settings)
+    args = ['-map', f'{input_index}:v']
+    if passthrough:
+        args.extend(['-c:v', 'copy'])
+    else:
+        if single_channel:
+            args.extend(['-vf', 'extractplanes=y'])
+        args.extend(['-c:v', 'libx264', '-preset', settings.get('preset', CAPTURE_PRESET),
+                     '-crf', str(settings.get('crf', CAPTURE_CRF))])
+        args.extend(['-pix_fmt', 'gray' if single_channel else 'yuv420p'])
+    if timestamp_fd is not None:
+        args.extend(['-fps_mode', 'passthrough'])
+    if segment_time:
+        args.extend(build_segment_output_args(output_file, segment_time))
+    else:
+        args.append(output_file)
+    if timestamp_fd is not None:
+        # wrapped_avframe only references the decoded frame, the muxer keeps just its timestamp;
+        # copied packets carry their timestamps without being decoded at all
+        args.extend(['-map', f'{input_index}:v', '-c:v', 'copy' if passthrough else 'wrapped_avframe',
+                     '-fps_mode', 'passthrough', '-flush_packets', '1', '-f', 'mkvtimestamp_v2',
+                     f'pipe:{timestamp_fd}'])
+    return args
+
+def build_capture_command(device, output_file, settings, single_channel=False, timestamp_fd=None,
+                          segment_time=None):
+    """
+    Build the ffmpeg command recording one device
+
+    Progress blocks go to stdout and commands (q to stop) are read from stdin.
+    With segment_time (s), output_file is written as chunks listed in a
+    running index (see segment_index) that join into output_file.
+    With timestamp_fd, the time of every frame is written to that pipe in
+    mkvtimestamp_v2 format (ms since the input start in ffmpeg's stream
+    dump), and frames are passed through so line n belongs to frame n.
+    In passthrough mode (settings input_format mjpeg) the camera's packets
+    are copied to output_file without being decoded or encoded.
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'info', '-progress', 'pipe:1', '-nostats', '-y']
+    cmd.extend(build_input_args(device, settings))
+    cmd.extend(build_output_args(0, output_file, settings, single_channel, timestamp_fd, segment_time))
+    return cmd
+
+def build_group_capture_command(devices, output_files, settings, single_channel=False, timestamp_fds=None,
+                                segment_time=None):
+    """
+    Build one ffmpeg command recording every device to its own output file
+
+    Every device is an input of the same process, so all of them are opened
+    and started together, and each input is read in its own thread. Inputs
+    after the first are synced to the first (-isync 0): their timestamps
+    keep their offset from the first camera's start, so the frame times of
+    every output (timestamp_fds, one per device) count from the input start
+    of the first device on one clock.
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'info', '-progress', 'pipe:1', '-nostats', '-y']
+    for index, device in enumerate(devices):
+        if index:
+            cmd.extend(['-isync', '0'])
+        cmd.extend(build_input_args(device, settings))
+    for index, output_file in enumerate(output_files):
+        cmd.extend(build_output_args(index, output_file, settings, single_channel,
+                                     timestamp_fds[index] if timestamp_fds else None, segment_time))
+    return cmd
+
+def get_part_file(output_prefix, cam, part, ext='.mp4'):
+    """File of one camera; captures restarted after a failure write _part<n> files"""
+    if part == 0:
+        return f'{output_prefix}_cam{cam}{ext}'
+    return f'{output_prefix}_cam{cam}_part{part}{ext}'
+
+def write_marker(time_file, timestamp=None):
+    """Append a marker like date +%s.%N | cut -b-14 in recording_utils.sh"""
+    timestamp = time.time() if timestamp is None else timestamp
+    with open(time_file, 'a') as f:
+        f.write(f'{timestamp:.3f}\n')
+
+class CaptureProcess:
+    """
+    One camera's ffmpeg capture, restarted when it fails or stalls
+
+    Every state change is reported to the supervisor as an event dict with
+    at least event, cam, device and time.
+    """
+
+    def __init__(self, cam, device, output_prefix, settings, emit, single_channel=False,
+                 max_restarts=5, stall_timeout=10, restart_delay=1.0, timestamps=True, segment_time=None):
+        self.cam = cam
+        self.device = device
+        self.output_prefix = output_prefix
+        self.settings = settings
+        self.single_channel = single_channel
+        self.timestamps = timestamps
+        self.segment_time = segment_time
+        self.max_restarts = max_restarts
+        self.stall_timeout = stall_timeout
+        self.restart_delay = restart_delay
+        self._emit = emit
+        self.part = 0
+        self.restarts = 0
+        self.files = []
+        self.metrics = None
+        self.started = asyncio.Event()
+        self.stderr = deque(maxlen=STDERR_LINES)
+        self._process = None
+        self._stopping = False
+        self._stop_requested = asyncio.Event()
+        self._moving = False
+        self._last_advance = time.monotonic()
+        self._input_start = None
+        self._input_start_known = asyncio.Event()
+        self._origin = None
+        self._last_frames = {}
+
+    def emit(self, event, **fields):
+        self._emit(dict(event=event, cam=self.cam, device=self.device, time=time.time(), **fields))
+
+    async def run(self):
+        """Capture until stopped or until the restarts are used up"""
+        while not self._stopping:
+            # A move requested before this file is started is already done by starting it
+            self._moving = False
+            output_file = self._get_output_file()
+            self.files.append(output_file)
+            try:
+                returncode, stalled = await self._capture(output_file)
+            except OSError as e:
+                self.emit('failed', error=str(e))
+                return False
+            if self._stopping:
+                break
+            if self._moving:
+                # Finished its file to continue on another volume, not a failure
+                self._moving = False
+                self.part += 1
+                continue
+            self.emit('exit', returncode=returncode, stalled=stalled, file=output_file,
+                      stderr=list(self.stderr)[-3:])
+            if self.restarts >= self.max_restarts:
+                self.emit('failed', restarts=self.restarts)
+                return False
+            self.restarts += 1
+            self.part += 1
+            # Back off so a missing device does not spin, but wake up at once on stop
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(),
+                                       min(self.restart_delay * 2 ** (self.restarts - 1), 30))
+            except asyncio.TimeoutError:
+                self.emit('restart', restarts=self.restarts)
+        return True
+
+    def _get_output_file(self):
+        """File the next ffmpeg writes"""
+        return get_part_file(self.output_prefix, self.cam, self.part, get_capture_extension(self.settings))
+
+    def _get_timestamp_paths(self, output_file):
+        """Timestamp sidecars of the files of one ffmpeg, one pipe is opened for each"""
+        return [get_timestamp_path(output_file)]
+
+    def _build_command(self, output_file, timestamp_fds):
+        return build_capture_command(self.device, output_file, self.settings, self.single_channel,
+                                     timestamp_fds[0] if timestamp_fds else None, self.segment_time)
+
+    def _is_stalled(self):
+        """Check whether the recorded time has not advanced for stall_timeout"""
+        return time.monotonic() - self._last_advance >= self.stall_timeout
+
+    async def _end_stalled(self):
+        """End a stalled ffmpeg, which may no longer read its commands"""
+        self._process.kill()
+
+    async def _capture(self, output_file):
+        """Run one ffmpeg until it exits, returning (returncode, stalled)"""
+        timestamp_paths = self._get_timestamp_paths(output_file) if self.timestamps else []
+        pipes = [os.pipe() for _ in timestamp_paths]
+        write_fds = [write_fd for _, write_fd in pipes]
+        cmd = self._build_command(output_file, write_fds)
+        self.stderr.clear()
+        self._input_start = None
+        self._input_start_known.clear()
+        self._origin = None
+        # Own session: Ctrl+C reaches only the supervisor, which stops captures with q
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                *cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE, start_new_session=True, pass_fds=write_fds)
+        except OSError:
+            for read_fd, _ in pipes:
+                os.close(read_fd)
+            raise
+        finally:
+            for write_fd in write_fds:
+                os.close(write_fd)
+        self.emit('start', file=output_file, pid=self._process.pid, part=self.part)
+        if self._moving:
+            # Moved while ffmpeg was starting
+            await self._quit(self._process)
+
+        self._last_advance = time.monotonic()
+        self._last_frames = dict.fromkeys(timestamp_paths, self._last_advance)
+        stderr_task = asyncio.ensure_future(self._read_stderr())
+        progress_task = asyncio.ensure_future(self._read_progress())
+        timestamp_tasks = [asyncio.ensure_future(self._read_timestamps(read_fd, path))
+                           for (read_fd, _), path in zip(pipes, timestamp_paths)]
+        stalled = False
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(progress_task), timeout=self.stall_timeout)
+                    break
+                except asyncio.TimeoutError:
+                    if self._stopping or not self._is_stalled():
+                        continue
+                    stalled = True
+                    await self._end_stalled()
+                    break
+            returncode = await self._process.wait()
+        finally:
+            progress_task.cancel()
+            await asyncio.gather(progress_task, stderr_task, *timestamp_tasks, return_exceptions=True)
+            self._process = None
+        return returncode, stalled
+
+    async def _read_progress(self):
+        """Parse the progress blocks of the running ffmpeg"""
+        last_out_time = None
+        fields = {}
+        async for line in self._process.stdout:
+            key, sep, value = line.decode(errors='replace').strip().partition('=')
+            if not sep:
+                continue
+            fields[key] = value
+            if key != 'progress':
+                continue
+            metrics = parse_progress_block(fields)
+            fields = {}
+            out_time = metrics['out_time']
+            if out_time is not None and (last_out_time is None or out_time > last_out_time):
+                last_out_time = out_time
+                self._last_advance = time.monotonic()
+                if not self.started.is_set():
+                    self.started.set()
+            self.metrics = metrics
+
+    async def _read_stderr(self):
+        """Keep the last stderr lines of the running ffmpeg and find the input start time"""
+        async for line in self._process.stderr:
+            line = line.decode(errors='replace').rstrip()
+            self.stderr.append(line)
+            if not self._input_start_known.is_set():
+                match = INPUT_START_PATTERN.search(line)
+                if match:
+                    self._input_start = float(match.group(1))
+                    self._input_start_known.set()
+        self._input_start_known.set()
+
+    async def _read_timestamps(self, read_fd, path):
+        """
+        Write the capture time of every frame to the sidecar of the running file
+
+        Camera timestamps are Unix times already; sources that start at 0
+        are anchored at the wall clock time the first frame of the ffmpeg
+        arrived, one origin shared by every sidecar it writes.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(read_fd, 'rb', 0))
+        try:
+            with TimestampWriter(path) as writer:
+                async for line in reader:
+                    frame_ms = parse_timecode_line(line.decode(errors='replace'))
+                    if frame_ms is None:
+                        continue
+                    if self._origin is None:
+                        await self._input_start_known.wait()
+                    if self._origin is None:
+                        if self._input_start is not None and self._input_start >= MIN_EPOCH_START:
+                            self._origin = self._input_start
+                        else:
+                            self._origin = time.time() - frame_ms / 1000
+                    writer.append(self._origin + frame_ms / 1000)
+                    self._last_frames[path] = time.monotonic()
+        finally:
+            transport.close()
+
+    async def _quit(self, process):
+        """Ask ffmpeg to finish its file"""
+        try:
+            process.stdin.write(b'q')
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    async def move(self, output_prefix):
+        """Finish the current file and continue recording as the next part under output_prefix"""
+        self.output_prefix = output_prefix
+        self._moving = True
+        process = self._process
+        if process is not None and process.returncode is None:
+            await self._quit(process)
+
+    async def stop(self, timeout=STOP_TIMEOUT):
+        """Ask ffmpeg to finish its file, killing it if it does not exit in time"""
+        self._stopping = True
+        self._stop_requested.set()
+        process = self._process
+        if process is None or process.returncode is not None:
+            return
+        await self._quit(process)
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+        self.emit('stop', file=self.files[-1], returncode=process.returncode,
+                  frame=self.metrics['frame'] if self.metrics else None)
+
+class CaptureGroup(CaptureProcess):
+    """
+    Every camera as an input of one ffmpeg capture, restarted as a whole
+
+    The process opens and starts all devices together and stamps their
+    frames on one clock (see build_group_capture_command), so every
+    timestamp sidecar shares one origin. members are the CaptureProcess of
+    each camera; they are not run but hold that camera's output prefix,
+    files, metrics and events. A camera that fails or stops delivering
+    frames restarts every camera as the next part.
+    """
+
+    def __init__(self, members, settings, emit, single_channel=False, max_restarts=5, stall_timeout=10,
+                 restart_delay=1.0, timestamps=True, segment_time=None):
+        self.members = members
+        super().__init__(None, [member.device for member in members], None, settings, emit, single_channel,
+                         max_restarts, stall_timeout, restart_delay, timestamps, segment_time)
+        for member in members:
+            member.started = self.started
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        # Progress covers the whole process; every camera shows it
+        self._metrics = metrics
+        for member in self.members:
+            member.metrics = metrics
+
+    def emit(self, event, **fields):
+        """Report an event for every camera, file being the list of their files"""
+        for index, member in enumerate(self.members):
+            member.part = self.part
+            member.restarts = self.restarts
+            member_fields = dict(fields)
+            if 'file' in fields:
+                member_fields['file'] = fields['file'][index]
+            member.emit(event, **member_fields)
+
+    def _get_output_file(self):
+        output_files = [get_part_file(member.output_prefix, member.cam, self.part, get_capture_extension(self.settings))
+                        for member in self.members]
+        for member, output_file in zip(self.members, output_files):
+            member.files.append(output_file)
+        return output_files
+
+    def _get_timestamp_paths(self, output_file):
+        return [get_timestamp_path(path) for path in output_file]
+
+    def _build_command(self, output_file, timestamp_fds):
+        return build_group_capture_command(self.device, output_file, self.settings, self.single_channel,
+                                           timestamp_fds, self.segment_time)
+
+    def _is_stalled(self):
+        """Check whether the process or any camera with a timestamp sidecar stopped advancing"""
+        now = time.monotonic()
+        return super()._is_stalled() or any(now - last_frame >= self.stall_timeout
+                                            for last_frame in self._last_frames.values())
+
+    async def _end_stalled(self):
+        if super()._is_stalled():
+            await super()._end_stalled()
+        else:
+            # Only some cameras stopped, let ffmpeg finish the files of the others
+            await self._quit(self._process)
+
+class RecordingSupervisor:
+    """
+    Runs one CaptureProcess per device and stops them together
+
+    Events of every capture are appended to <session>_events.jsonl and
+    passed to callback, which may call request_stop, e.g. to stop the
+    recording from a watchdog. With a DiskWatchdog, disk samples are
+    logged as events every watchdog_interval seconds and the recording is
+    stopped before the disk fills.
+
+    With volumes (OutputVolume list, the first one holding session_dir and
+    every camera listed in the cameras of one volume), every camera records
+    to its volume, a camera whose volume runs low is moved to the best
+    other volume, and <session>_volumes.json lists every camera's files.
+    camera_rate (bytes/s of one camera) is used to pick that volume.
+
+    With shared_clock, all cameras are recorded by one CaptureGroup instead
+    of one ffmpeg each.
+    """
+
+    def __init__(self, devices, session_dir, session_name, settings, single_channel=False,
+                 max_restarts=5, stall_timeout=10, restart_delay=1.0, callback=None, timestamps=True,
+                 segment_time=None, watchdog=None, watchdog_interval=10, volumes=None, camera_rate=0,
+                 shared_clock=False):
+        self.session_dir = session_dir
+        self.session_name = session_name
+        self.callback = callback
+        self.watchdog = watchdog
+        self.watchdog_interval = watchdog_interval
+        self.volumes = volumes
+        self.camera_rate = camera_rate
+        self.volumes_file = get_volumes_file(session_dir, session_name)
+        output_prefix = os.path.join(session_dir, session_name)
+        self.time_file = output_prefix + '_markers.txt'
+        self.events_file = output_prefix + '_events.jsonl'
+        self.capture_file = output_prefix + CAPTURE_SUFFIX
+        self.settings = settings
+        self.single_channel = single_channel
+        self.test_source = any(device.startswith(LAVFI_PREFIX) for device in devices)
+        self.captures = [
+            CaptureProcess(cam, device, self._get_camera_volume(cam).output_prefix if volumes else output_prefix,
+                           settings, self.emit, single_channel, max_restarts, stall_timeout, restart_delay,
+                           timestamps, segment_time)
+            for cam, device in enumerate(devices)
+        ]
+        self.group = None
+        if shared_clock:
+            self.group = CaptureGroup(self.captures, settings, self.emit, single_channel, max_restarts,
+                                      stall_timeout, restart_delay, timestamps, segment_time)
+        self._stop_event = None
+        self._events = None
+
+    def _get_camera_volume(self, cam):
+        return next(volume for volume in self.volumes if cam in volume.cameras)
+
+    def _write_volume_manifest(self):
+        write_volume_manifest(
+            self.volumes_file, self.session_name, self.volumes,
+            [{'cam': capture.cam, 'device': capture.device, 'files': capture.files} for capture in self.captures])
+
+    def emit(self, event):
+        """Record an event and hand it to the callback"""
+        self._events.write(json.dumps(event) + '\n')
+        self._events.flush()
+        if self.volumes and event['event'] == 'start':
+            self._write_volume_manifest()
+        if event['event'] in ('exit', 'failed', 'restart'):
+            print(f"cam{event['cam']}: {event['event']} "
+                  + ' '.join(f'{key}={value}' for key, value in event.items()
+                             if key not in ('event', 'cam', 'time', 'stderr')))
+            for line in event.get('stderr', []):
+                print(f'  {line}')
+        for warning in event.get('warnings', []):
+            print(f"⚠️  WARNING: {warning} ({format_sample(event)})")
+        if self.callback is not None:
+            self.callback(event)
+
+    def request_stop(self, reason='requested'):
+        """Stop every capture; safe to call from callbacks and signal handlers"""
+        if self._stop_event is not None and not self._stop_event.is_set():
+            self.emit({'event': 'stopping', 'reason': reason, 'time': time.time()})
+            self._stop_event.set()
+
+    def status(self):
+        """One line of frame, fps and speed per camera"""
+        parts = []
+        for capture in self.captures:
+            metrics = capture.metrics or {}
+            parts.append(f"cam{capture.cam} frame={metrics.get('frame')} fps={metrics.get('fps')} "
+                         f"speed={metrics.get('speed')} restarts={capture.restarts}")
+        return ' | '.join(parts)
+
+    async def _watch_disk(self):
+        """Sample the disks until stopped, moving cameras off or stopping the recording before one fills"""
+        if self.volumes is None:
+            watched = [(None, self.watchdog)]
+        else:
+            watched = [(volume, volume.watchdog) for volume in self.volumes if volume.watchdog is not None]
+        while True:
+            for volume, watchdog in watched:
+                if volume is not None and volume.full:
+                    continue
+                sample = watchdog.sample()
+                if volume is not None:
+                    sample['volume'] = volume.root
+                self.emit(sample)
+                if sample['level'] != 'stop':
+                    continue
+                if volume is not None and await self._spill(volume):
+                    continue
+                print(f"❌ Stopping recording before the disk fills ({format_sample(sample)})")
+                self.request_stop('disk full')
+                return
+            await asyncio.sleep(self.watchdog_interval)
+
+    async def _spill(self, volume):
+        """
+        Move the cameras of a volume that runs low to the other volumes
+
+        Returns:
+            bool: False if no other volume has room
+        """
+        volume.full = True
+        exclude = {i for i, other in enumerate(self.volumes) if other.full}
+        targets = plan_camera_volumes(
+            [other.free_bytes() for other in self.volumes], [other.throughput or 0 for other in self.volumes],
+            len(volume.cameras), self.camera_rate, [len(other.cameras) for other in self.volumes], exclude)
+        if not targets:
+            return False
+        for cam, target_index in zip(list(volume.cameras), targets):
+            target = self.volumes[target_index]
+            os.makedirs(target.session_dir, exist_ok=True)
+            volume.cameras.remove(cam)
+            target.cameras.append(cam)
+            self.emit({'event': 'move', 'cam': cam, 'from': volume.root, 'to': target.root, 'time': time.time()})
+            print(f"cam{cam}: {volume.root} is running low, continuing on {target.root}")
+            await self.captures[cam].move(target.output_prefix)
+        if self.group is not None:
+            # The moved cameras continue under their new prefix when the group starts its next part
+            await self.group.move(None)
+        return True
+
+    async def _print_status(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.status())
+
+    async def run(self, duration=None, status_interval=0):
+        """
+        Record until stopped, duration (s) has passed or every capture failed
+
+        Returns:
+            bool: True if no capture was given up
+        """
+        os.makedirs(self.session_dir, exist_ok=True)
+        for volume in self.volumes or []:
+            if volume.cameras:
+                os.makedirs(volume.session_dir, exist_ok=True)
+        # Read back by the disk space check to learn how much space recordings need
+        write_capture_info(self.capture_file, 'mjpeg' if is_passthrough(self.settings) else 'h264',
+                           self.settings['video_resolution'], self.settings['frame_rate'], self.single_channel,
+                           self.test_source)
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.request_stop, signal.Signals(sig).name)
+
+        launch_time = time.time()
+        processes = self.captures if self.group is None else [self.group]
+        with open(self.events_file, 'a') as self._events:
+            tasks = [asyncio.ensure_future(process.run()) for process in processes]
+            helpers = []
+            all_done = asyncio.ensure_future(asyncio.gather(*tasks))
+
+            async def mark_start():
+                # The session starts once every camera is actually writing frames
+                await asyncio.gather(*(capture.started.wait() for capture in self.captures))
+                write_marker(self.time_file)
+                self.emit({'event': 'recording', 'time': time.time()})
+            helpers.append(asyncio.ensure_future(mark_start()))
+            if status_interval:
+                helpers.append(asyncio.ensure_future(self._print_status(status_interval)))
+            if self.watchdog is not None or any(volume.watchdog is not None for volume in self.volumes or []):
+                helpers.append(asyncio.ensure_future(self._watch_disk()))
+
+            stop_wait = asyncio.ensure_future(self._stop_event.wait())
+            await asyncio.wait([stop_wait, all_done], timeout=duration, return_when=asyncio.FIRST_COMPLETED)
+            if not self._stop_event.is_set():
+                self.request_stop('duration' if not all_done.done() else 'captures ended')
+            await asyncio.gather(*(process.stop() for process in processes))
+            results = await all_done
+            if not helpers[0].done():
+                # Some camera never delivered a frame, fall back to the launch time
+                write_marker(self.time_file, launch_time)
+            write_marker(self.time_file)
+            if self.volumes:
+                self._write_volume_manifest()
+            for task in helpers + [stop_wait]:
+                task.cancel()
+            await asyncio.gather(*helpers, stop_wait, return_exceptions=True)
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        return all(results)
+
+def select_devices(config, test_source=False):
+    """Configured devices that exist, or lavfi stand-ins for all of them"""
+    devices = config.get('video_devices', [])
+    if test_source:
+        return [f'{LAVFI_PREFIX}testsrc'] * len(devices)
+    available = []
+    for device in devices:
+        if device.startswith(LAVFI_PREFIX) or os.path.exists(device[len(FILE_PREFIX):]
+                                                              if device.startswith(FILE_PREFIX) else device):
+            print(f"✅ Found: {device}")
+            available.append(device)
+        else:
+            print(f"❌ Missing: {device}")
+    return available
+
+def main():
+    """Record from every configured device until Ctrl+C"""
+    args = parse_arguments()
+    config = load_config(args.config)
+
+    devices = select_devices(config, args.test_source)
+    if not devices:
+        print("❌ No video devices available. Cannot proceed.")
+        sys.exit(1)
+
+    roots = get_output_volumes(config, args.output_dir)
+    for root in roots:
+        os.makedirs(root, exist_ok=True)
+    session_name = get_session_name(args.name)
+    session_dir = os.path.join(roots[0], session_name)
+
+    codec = 'mjpeg' if args.mjpeg else None
+    settings = get_capture_settings(config)
+    if not args.mjpeg and config.get('recording', {}).get('single_channel'):
+        args.single_channel = True
+    if config.get('recording', {}).get('shared_clock'):
+        args.shared_clock = True
+    if args.mjpeg:
+        settings['input_format'] = 'mjpeg'
+
+    volumes = None
+    camera_rate = estimate_camera_rate(config, roots[0], args.single_channel, codec)
+    if len(roots) > 1:
+        # Spread the cameras over the volumes by free space and measured throughput
+        volumes = [OutputVolume(root, session_name, measure_write_throughput(root)) for root in roots]
+        assignment = plan_camera_volumes([volume.free_bytes() for volume in volumes],
+                                         [volume.throughput for volume in volumes], len(devices), camera_rate)
+        for cam, index in enumerate(assignment):
+            volumes[index].cameras.append(cam)
+        for volume in volumes:
+            print(f"{volume.root}: {volume.free_bytes() / 1024**3:.1f} GB free, "
+                  f"{volume.throughput / 1024**2:.0f} MB/s, cameras {volume.cameras or 'none'}")
+
+    if not args.skip_disk_check:
+        duration_minutes = args.duration or config.get('recording', {}).get('default_duration_minutes', 180)
+        # Every volume needs room for its share of the cameras
+        checks = [(roots[0], duration_minutes)] if volumes is None else [
+            (volume.root, duration_minutes * len(volume.cameras) / len(devices)) for volume in volumes if volume.cameras]
+        if not all(check_disk_space(args.config, root, minutes, args.single_channel, codec=codec)
+                   for root, minutes in checks):
+            print("❌ Disk space check failed. Please free up disk space and try again.")
+            sys.exit(1)
+
+    print(f"Recording {len(devices)} camera(s) to {session_dir}")
+    print("Press Ctrl+C to stop recording.")
+
+    watchdog = None
+    watchdog_settings = get_watchdog_settings(config)
+    if not args.no_watchdog:
+        watched = [(roots[0], session_dir)] if volumes is None else [(volume.root, volume.session_dir) for volume in volumes]
+        watchdogs = [DiskWatchdog(root, output_dir, watchdog_settings['warn_minutes'], watchdog_settings['stop_minutes'],
+                                  watchdog_settings['warning_free_gb'], watchdog_settings['stop_free_gb'])
+                     for root, output_dir in watched]
+        if volumes is None:
+            watchdog = watchdogs[0]
+        else:
+            for volume, volume_watchdog in zip(volumes, watchdogs):
+                volume.watchdog = volume_watchdog
+
+    supervisor = RecordingSupervisor(
+        devices, session_dir, session_name, settings, args.single_channel,
+        args.max_restarts, args.stall_timeout, timestamps=not args.no_timestamps,
+        segment_time=args.segment_minutes * 60 if args.segment_minutes else None,
+        watchdog=watchdog, watchdog_interval=watchdog_settings['interval'],
+        volumes=volumes, camera_rate=camera_rate, shared_clock=args.shared_clock)
+    duration = args.duration * 60 if args.duration else None
+    ok = asyncio.run(supervisor.run(duration, args.status_interval))
+
+    for capture in supervisor.captures:
+        if args.segment_minutes:
+            files = [f"{os.path.basename(f)} ({len(read_segment_index(get_segment_paths(f)['index']))} segments)"
+                     for f in capture.files if os.path.exists(get_segment_paths(f)['index'])]
+        else:
+            files = [f if volumes else os.path.basename(f) for f in capture.files if os.path.exists(f)]
+        print(f"cam{capture.cam}: {', '.join(files) or 'no files'} "
+              f"({capture.restarts} restarts)")
+    if volumes:
+        print(f"Camera files are listed in {supervisor.volumes_file}")
+    if args.segment_minutes:
+        session_dirs = [session_dir] if volumes is None else [
+            volume.session_dir for volume in volumes if os.path.isdir(volume.session_dir)]
+        for directory in session_dirs:
+            print(f"Join the segments with: python segment_index.py join {directory}")
+    if args.mjpeg and not args.no_transcode:
+        entry = enqueue_session(session_dir, session_name,
+                                [path for capture in supervisor.captures for path in capture.files if os.path.exists(path)])
+        if entry is not None:
+            # The worker waits until nothing is recorded and the machine is idle
+            start_worker(roots[0])
+            print(f"Queued {len(entry['videos'])} file(s) for transcoding to H.264 "
+                  f"(python transcode_queue.py list {roots[0]})")
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
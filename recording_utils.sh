@@ -176,6 +176,47 @@ start_recording() {
     date +%s.%N | cut -b-14 > "$time_file"
 }
 
+# Write the capture configuration of the session
+# Read back by disk_space_check.py to learn how much space recordings need
+# Args: $1 = capture_file, $2 = codec, $3 = single_channel (true/false)
+write_capture_info() {
+    local capture_file="$1"
+    local codec="$2"
+    local single_channel="$3"
+
+    echo "{\"codec\": \"$codec\", \"video_resolution\": \"1280x720\", \"frame_rate\": 30, \"single_channel\": $single_channel}" > "$capture_file"
+}
+
+# Start the disk space watchdog in the background
+# Samples are written as JSON lines to the log file; before the disk fills
+# the watchdog stops the recording the way Ctrl+C does
+# Args: $1 = script_dir, $2 = log_file
+# Sets: WATCHDOG_PID
+start_disk_watchdog() {
+    local script_dir="$1"
+    local log_file="$2"
+
+    python3 "$script_dir/disk_watchdog.py" --config "$script_dir/config.json" --path . --stop-group > "$log_file" &
+    WATCHDOG_PID=$!
+}
+
+# Stop the disk space watchdog
+stop_disk_watchdog() {
+    if [ -n "$WATCHDOG_PID" ]; then
+        kill "$WATCHDOG_PID" 2>/dev/null
+        wait "$WATCHDOG_PID" 2>/dev/null
+    fi
+}
+
+# Queue the session in the current directory for transcoding to H.264
+# and start a background worker that runs once the machine is idle
+# Args: $1 = script_dir
+queue_transcode() {
+    local script_dir="$1"
+
+    python3 "$script_dir/transcode_queue.py" add . --start-worker
+}
+
 # Write stop marker
 # Args: $1 = time_file
 stop_recording() {
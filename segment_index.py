@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Segmented recordings and their running segment index
+In segmented mode a camera is recorded as fixed-length fragmented MP4
+chunks <video>_seg0000.mp4, <video>_seg0001.mp4, ... with ffmpeg's segment
+muxer, which appends filename,start,end to <video>_segments.csv every time
+a chunk is finished. A crash loses at most the chunk being written (and
+fragments keep most of that one readable), and finished chunks can be
+processed while recording continues. Once the session is over the chunks of
+every camera are joined without re-encoding into <video>, the file the rest
+of the pipeline expects
+For usage, type python segment_index.py -h
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+
+from combine_utils.session_files import concat_videos
+
+# Segment files and index of a video, e.g. rat1_video_..._cam0_seg0003.mp4
+SEGMENT_PATTERN = '{stem}_seg%04d{ext}'
+INDEX_SUFFIX = '_segments.csv'
+
+# Fragmented MP4 with a fragment every second, readable up to the last fragment if ffmpeg dies
+SEGMENT_FORMAT_OPTIONS = 'movflags=+frag_keyframe+empty_moov+default_base_moof:frag_duration=1000000'
+
+# Session marker file of recording_utils.sh, holds the stop time once recording is over
+MARKER_SUFFIX = '_markers.txt'
+
+# Videos in a session directory that were recorded in segments
+SEGMENT_INDEX_PATTERN = re.compile(r'^(?P<video>.+_cam\d+(_part\d+)?)_segments\.csv$')
+
+def get_segment_paths(video_path):
+    """
+    Segment files and index of a segmented video
+
+    Returns:
+        dict: pattern (printf pattern of the segment files for ffmpeg) and index (csv)
+    """
+    stem, ext = os.path.splitext(video_path)
+    return {
+        'pattern': SEGMENT_PATTERN.format(stem=stem, ext=ext),
+        'index': stem + INDEX_SUFFIX,
+    }
+
+def build_segment_output_args(video_path, segment_time):
+    """
+    ffmpeg output options writing a video as segment_time (s) long chunks
+
+    Keyframes are forced at every segment boundary so chunks have exactly
+    the requested length, and every chunk starts its timestamps at 0.
+    """
+    paths = get_segment_paths(video_path)
+    return [
+        '-force_key_frames', f'expr:gte(t,n_forced*{segment_time:g})',
+        '-f', 'segment',
+        '-segment_time', f'{segment_time:g}',
+        '-segment_format', 'mp4',
+        '-segment_format_options', SEGMENT_FORMAT_OPTIONS,
+        '-reset_timestamps', '1',
+        '-segment_list', paths['index'],
+        '-segment_list_type', 'csv',
+        paths['pattern'],
+    ]
+
+def read_segment_index(index_path):
+    """
+    Finished segments of a video
+
+    The index is written by ffmpeg while recording, so a last line that is
+    not complete yet is ignored.
+
+    Returns:
+        list: One dict per segment with file (path), start and end (s from
+        the start of the recording), in recording order
+    """
+    try:
+        with open(index_path, newline='') as f:
+            lines = f.read().split('\n')
+    except FileNotFoundError:
+        return []
+    directory = os.path.dirname(index_path)
+    segments = []
+    # The last item is '' if the index ends with a newline, else an unfinished line
+    for row in csv.reader(lines[:-1]):
+        if len(row) != 3:
+            continue
+        segments.append({
+            'file': os.path.join(directory, row[0]),
+            'start': float(row[1]),
+            'end': float(row[2]),
+        })
+    return segments
+
+def find_unlisted_segments(video_path, segments):
+    """Segment files on disk after the last finished one, e.g. left by a crash"""
+    stem, ext = os.path.splitext(video_path)
+    listed = {segment['file'] for segment in segments}
+    return [path for path in sorted(glob.glob(glob.escape(stem) + '_seg[0-9][0-9][0-9][0-9]' + ext))
+            if path not in listed]
+
+def find_segmented_videos(session_dir):
+    """Videos of a session directory that were recorded in segments, in camera order"""
+    videos = []
+    for filename in sorted(os.listdir(session_dir)):
+        match = SEGMENT_INDEX_PATTERN.match(filename)
+        if match:
+            videos.append(os.path.join(session_dir, match.group('video') + '.mp4'))
+    return videos
+
+def is_recording_finished(session_dir):
+    """Check whether the session marker file holds its stop marker"""
+    for marker_file in glob.glob(os.path.join(glob.escape(session_dir), '*' + MARKER_SUFFIX)):
+        with open(marker_file) as f:
+            if len([line for line in f if line.strip()]) >= 2:
+                return True
+    return False
+
+def follow_segments(session_dir, poll_interval=2.0, finished=None):
+    """
+    Yield (video, segment) for every finished segment of a session as it appears
+
+    Runs until the recording is over (see is_recording_finished) and every
+    listed segment has been yielded.
+    """
+    finished = finished or (lambda: is_recording_finished(session_dir))
+    seen = set()
+    while True:
+        # Check before reading, so segments listed right before the stop marker are not missed
+        done = finished()
+        for video in find_segmented_videos(session_dir):
+            for segment in read_segment_index(get_segment_paths(video)['index']):
+                if segment['file'] not in seen:
+                    seen.add(segment['file'])
+                    yield video, segment
+        if done:
+            return
+        time.sleep(poll_interval)
+
+def join_segments(video_path, include_unlisted=False):
+    """
+    Join the segments of a video into video_path without re-encoding
+
+    Args:
+        video_path: Path of the joined video
+        include_unlisted: Also join segment files the index does not list,
+            e.g. the chunk that was being written when ffmpeg crashed
+
+    Returns:
+        list: Segment files that were joined
+    """
+    segments = read_segment_index(get_segment_paths(video_path)['index'])
+    files = [segment['file'] for segment in segments]
+    if include_unlisted:
+        files.extend(find_unlisted_segments(video_path, segments))
+    if not files:
+        raise ValueError(f"No segments found for {video_path}")
+
+    concat_videos(files, video_path)
+    return files
+
+def format_command(template, path):
+    """Fill {} (segment path) and {.} (path without extension) like GNU parallel"""
+    return [arg.replace('{.}', os.path.splitext(path)[0]).replace('{}', path) for arg in template]
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='List, process and join the segments of recordings made in segmented mode'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='List the finished segments of a session')
+    list_parser.add_argument('session_dir', help='Session directory')
+
+    watch_parser = subparsers.add_parser(
+        'watch', help='Run a command on every finished segment while the session is recorded')
+    watch_parser.add_argument('session_dir', help='Session directory')
+    watch_parser.add_argument(
+        '--poll-interval', type=float, default=2.0,
+        help='Seconds between reads of the segment indexes (default: 2)')
+    watch_parser.add_argument(
+        'cmd', nargs=argparse.REMAINDER,
+        help="Command after --, {} is replaced by the segment and {.} by it without extension "
+             "(e.g. -- python video_index.py {})")
+
+    join_parser = subparsers.add_parser('join', help='Join the segments of every camera of a session')
+    join_parser.add_argument('session_dir', help='Session directory')
+    join_parser.add_argument(
+        '--include-unlisted', action='store_true',
+        help='Also join segment files missing from the index, e.g. after a crash')
+    join_parser.add_argument(
+        '--delete-segments', action='store_true',
+        help='Delete the segments and index of a camera once it is joined')
+    return parser.parse_args()
+
+def main():
+    """List, watch or join the segments of a session"""
+    args = parse_arguments()
+    videos = find_segmented_videos(args.session_dir)
+    if not videos and args.command != 'watch':
+        print(f"No segmented recordings in {args.session_dir}")
+        sys.exit(1)
+
+    if args.command == 'list':
+        for video in videos:
+            segments = read_segment_index(get_segment_paths(video)['index'])
+            print(f"{os.path.basename(video)}: {len(segments)} finished segments")
+            for segment in segments:
+                print(f"  {os.path.basename(segment['file'])}  {segment['start']:.3f}-{segment['end']:.3f} s")
+        return
+
+    if args.command == 'watch':
+        template = args.cmd[1:] if args.cmd and args.cmd[0] == '--' else args.cmd
+        if not template:
+            print("No command given, use: watch <session_dir> -- <command> {}")
+            sys.exit(1)
+        n_failed = 0
+        for video, segment in follow_segments(args.session_dir, args.poll_interval):
+            cmd = format_command(template, segment['file'])
+            print(f"{os.path.basename(segment['file'])}: {shlex.join(cmd)}", flush=True)
+            if subprocess.run(cmd).returncode != 0:
+                n_failed += 1
+        if n_failed:
+            print(f"\n{n_failed} segment(s) had errors")
+            sys.exit(1)
+        return
+
+    n_failed = 0
+    for video in videos:
+        try:
+            files = join_segments(video, args.include_unlisted)
+        except subprocess.CalledProcessError as e:
+            error = e.stderr.strip().splitlines()[-1] if e.stderr and e.stderr.strip() else str(e)
+            print(f"Error joining {os.path.basename(video)}: {error}")
+            n_failed += 1
+            continue
+        except ValueError as e:
+            print(f"Error: {e}")
+            n_failed += 1
+            continue
+        print(f"{os.path.basename(video)}: joined {len(files)} segments")
+        if args.delete_segments:
+            for path in files:
+                os.remove(path)
+            os.remove(get_segment_paths(video)['index'])
+    if n_failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
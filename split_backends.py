@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Clip cutting backends for split_script.py
+Every backend cuts one [start, end) window of a video into a new file and
+imports its library only when it is first used, so choosing a backend
+never pays for the others. Each cut is timed, and the measured throughput
+is aggregated per backend and source codec
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+# Bitstream filters that make MP4-style packets muxable into AVI
+ANNEXB_FILTERS = {
+    'h264': 'h264_mp4toannexb',
+    'hevc': 'hevc_mp4toannexb',
+}
+
+def cut_clip_ffmpeg(video_name, start, end, output_name):
+    """Stream copy the window with a direct ffmpeg subprocess"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+        '-ss', '%0.2f' % start, '-i', video_name,
+        '-t', '%0.2f' % (end - start),
+        '-map', '0', '-c', 'copy',
+        output_name,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+def cut_clip_moviepy(video_name, start, end, output_name):
+    """Stream copy the window with moviepy's ffmpeg_extract_subclip"""
+    from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_subclip
+    # Output name is positional: targetname in moviepy 1.x, outputfile in 2.x
+    ffmpeg_extract_subclip(video_name, start, end, output_name)
+
+def cut_clip_opencv(video_name, start, end, output_name):
+    """Decode the window with OpenCV and re-encode it as MJPEG"""
+    import cv2
+
+    cap = cv2.VideoCapture(video_name)
+    if not cap.isOpened():
+        raise RuntimeError(f"OpenCV cannot open '{video_name}'")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000.0)
+        writer = cv2.VideoWriter(
+            output_name, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+        try:
+            while cap.get(cv2.CAP_PROP_POS_MSEC) < end * 1000.0:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                writer.write(frame)
+        finally:
+            writer.release()
+    finally:
+        cap.release()
+
+def cut_clip_pyav(video_name, start, end, output_name):
+    """Remux the packets of the window with PyAV, without decoding"""
+    import av
+    from av.bitstream import BitStreamFilterContext
+
+    with av.open(video_name) as src, av.open(output_name, 'w') as dst:
+        in_stream = src.streams.video[0]
+        if hasattr(dst, 'add_stream_from_template'):
+            out_stream = dst.add_stream_from_template(in_stream)
+        else:
+            out_stream = dst.add_stream(template=in_stream)
+        time_base = in_stream.time_base
+        stream_start = in_stream.start_time or 0
+
+        # AVI needs in-band parameter sets, which the ffmpeg CLI adds by itself
+        bsf_name = ANNEXB_FILTERS.get(in_stream.codec_context.name)
+        bsf = BitStreamFilterContext(bsf_name, in_stream, out_stream) if bsf_name else None
+
+        def mux(packet):
+            for out_packet in (bsf.filter(packet) if bsf else [packet]):
+                out_packet.stream = out_stream
+                dst.mux(out_packet)
+
+        # Seek lands on the keyframe before start, like ffmpeg -ss with -c copy
+        src.seek(stream_start + int(max(start, 0.0) / time_base), stream=in_stream, backward=True)
+        offset = None
+        for packet in src.demux(in_stream):
+            if packet.pts is None:
+                continue
+            if float((packet.pts - stream_start) * time_base) >= end:
+                break
+            # The clip starts at 0 from its first packet, as ffmpeg -ss shifts it
+            if offset is None:
+                offset = packet.dts if packet.dts is not None else packet.pts
+            packet.pts -= offset
+            if packet.dts is not None:
+                packet.dts -= offset
+            mux(packet)
+        if bsf:
+            for out_packet in bsf.filter(None):
+                out_packet.stream = out_stream
+                dst.mux(out_packet)
+
+# Registry of cutting backends by name
+BACKENDS = {
+    'ffmpeg': cut_clip_ffmpeg,
+    'moviepy': cut_clip_moviepy,
+    'opencv': cut_clip_opencv,
+    'pyav': cut_clip_pyav,
+}
+
+# Aggregated throughput per (backend, codec)
+_throughput = {}
+_throughput_lock = threading.Lock()
+
+def get_backend(name):
+    """Look up a cutting backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name]
+
+def cut_clip(backend, video_name, start, end, output_name, codec='unknown'):
+    """
+    Cut one clip with a backend and record its throughput
+
+    Args:
+        backend: Backend name from BACKENDS
+        video_name: Input video
+        start: Clip start time (s), clamped to 0
+        end: Clip end time (s)
+        output_name: File to write
+        codec: Codec of the input, used to group throughput figures
+    """
+    cut_func = get_backend(backend)
+    start = max(float(start), 0.0)
+    end = float(end)
+    t0 = time.perf_counter()
+    cut_func(video_name, start, end, output_name)
+    elapsed = time.perf_counter() - t0
+    n_bytes = os.path.getsize(output_name) if os.path.exists(output_name) else 0
+    record_throughput(backend, codec, end - start, n_bytes, elapsed)
+
+def record_throughput(backend, codec, video_seconds, n_bytes, elapsed):
+    """Add one measured cut to the throughput totals"""
+    with _throughput_lock:
+        stats = _throughput.setdefault(
+            (backend, codec), {'clips': 0, 'video_seconds': 0.0, 'bytes': 0, 'seconds': 0.0})
+        stats['clips'] += 1
+        stats['video_seconds'] += video_seconds
+        stats['bytes'] += n_bytes
+        stats['seconds'] += elapsed
+
+def get_throughput():
+    """
+    Throughput measured so far
+
+    Returns:
+        dict: (backend, codec) -> clips, video_seconds, bytes, seconds,
+        clips_per_second, realtime_factor and mb_per_second
+    """
+    with _throughput_lock:
+        report = {}
+        for key, stats in _throughput.items():
+            seconds = max(stats['seconds'], 1e-9)
+            report[key] = dict(
+                stats,
+                clips_per_second=stats['clips'] / seconds,
+                realtime_factor=stats['video_seconds'] / seconds,
+                mb_per_second=stats['bytes'] / seconds / 1e6,
+            )
+        return report
+
+def print_throughput():
+    """Print measured throughput per backend and codec"""
+    for (backend, codec), stats in sorted(get_throughput().items()):
+        print(f"Backend {backend} ({codec}): {stats['clips']} clips in {stats['seconds']:.2f} s, "
+              f"{stats['clips_per_second']:.1f} clips/s, "
+              f"{stats['realtime_factor']:.1f}x realtime, {stats['mb_per_second']:.1f} MB/s written")
@@ -3,67 +3,146 @@ Script to split video files according to trial times
 For usage, type python split_script.py -h
 """
 
-# ___       _ _   _       _ _         
-#|_ _|_ __ (_) |_(_) __ _| (_)_______ 
-# | || '_ \| | __| |/ _` | | |_  / _ \
-# | || | | | | |_| | (_| | | |/ /  __/
-#|___|_| |_|_|\__|_|\__,_|_|_/___\___|
-#                                     
-
-# Collect filenames to be used for processing
+# ___                            _
+#|_ _|_ __ ___  _ __   ___  _ __| |_
+# | || '_ ` _ \| '_ \ / _ \| '__| __|
+# | || | | | | | |_) | (_) | |  | |_
+#|___|_| |_| |_| .__/ \___/|_|   \__|
+#              |_|
 
 import argparse
+import subprocess
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from tqdm import tqdm
+import os
+import sys
+import json
+import tempfile
+from functools import partial
+from frame_timestamps import load_frame_timestamps
+from video_index import (
+    load_video_index, peek_video_index, get_keyframe_times, get_frame_times, find_frames)
+from split_backends import BACKENDS, cut_clip, print_throughput
 
-parser = argparse.ArgumentParser(description = 'Collects names of files to process')
-parser.add_argument('marker_file', help = 'File containing start and end times of file')
-parser.add_argument('triallist_file', help = 'File containing timestamp of each trial')
-parser.add_argument('video_file', help = 'All video files to process', nargs = '+')
-args = parser.parse_args()
+# Define how much before and after the trial we want
+T_PRIOR = 5
+T_POST = 5
 
+# Maximum number of cut jobs reading from the same disk at once
+IO_LIMIT_PER_DISK = 2
 
-# Print what files are being used
-print('\n')
-print('Marker file : {}'.format(args.marker_file))
-print('Trial list file: {}'.format(args.triallist_file))
-print('Video files : {}'.format(args.video_file))
+# Encoders used to re-encode partial GOPs at trial boundaries in smart mode,
+# keyed by the codec of the source video
+SMART_CUT_ENCODERS = {
+    'h264': ['-c:v', 'libx264', '-preset', 'fast', '-crf', '18'],
+    'hevc': ['-c:v', 'libx265', '-preset', 'fast', '-crf', '20'],
+    'mpeg4': ['-c:v', 'mpeg4', '-q:v', '2'],
+    'mjpeg': ['-c:v', 'mjpeg', '-q:v', '2'],
+}
 
-# Check how the file needs to be cut
-while True:
-    trial_bool = (input(\
-            "\nEnter 1 if taste trials, 0 if affective, and >=2 to exit: \n"))
-    try:
-        trial_bool = int(trial_bool)
-        if trial_bool >=2:
-            print('Exiting')
-            exit() 
-        elif trial_bool not in [1,0]:
-            print('Please enter 0,1 or >=2')
-        else:
-            break
-    except:
-        print('Please enter 0,1 or >=2')
-# ___                            _    
-#|_ _|_ __ ___  _ __   ___  _ __| |_  
-# | || '_ ` _ \| '_ \ / _ \| '__| __| 
-# | || | | | | | |_) | (_) | |  | |_  
-#|___|_| |_| |_| .__/ \___/|_|   \__| 
-#              |_|                    
-
-import cv2
-import glob
-import re
-import numpy as np
-import pylab as plt
-from tqdm import tqdm
-import os
-from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_subclip
+# Bitstream filters that move codec parameters in-band when copying GOPs,
+# so copied and re-encoded segments can be concatenated
+SMART_CUT_COPY_FILTERS = {
+    'h264': 'h264_mp4toannexb',
+    'hevc': 'hevc_mp4toannexb',
+}
+
+# Offset (s) applied to cut points so rounding never moves a seek across a frame
+CUT_EPSILON = 0.0005
 
-# ____       _               
-#/ ___|  ___| |_ _   _ _ __  
-#\___ \ / _ \ __| | | | '_ \ 
+# Name of the memory-mapped frame array and its trial index for a camera
+TENSOR_NAME = 'frames_cam{}'
+
+# One unit of work for the job pool: some trials of one camera
+SplitJob = namedtuple('SplitJob', ['video_num', 'video_name', 'trial_nums'])
+
+# Per-disk semaphores shared by all job pools, keyed by device id
+_disk_locks = {}
+_disk_locks_lock = threading.Lock()
+
+# ____       _
+#/ ___|  ___| |_ _   _ _ __
+#\___ \ / _ \ __| | | | '_ \
 # ___) |  __/ |_| |_| | |_) |
-#|____/ \___|\__|\__,_| .__/ 
-#                     |_|    
+#|____/ \___|\__|\__,_| .__/
+#                     |_|
+
+def parse_arguments(argv=None):
+    """Collect names of files to process"""
+    parser = argparse.ArgumentParser(description = 'Collects names of files to process')
+    parser.add_argument('marker_file', help = 'File containing start and end times of file')
+    parser.add_argument('triallist_file', help = 'File containing timestamp of each trial')
+    parser.add_argument('video_file', help = 'All video files to process', nargs = '+')
+    parser.add_argument(
+        '--mode',
+        choices = ['per_trial', 'single_pass', 'smart', 'npy'],
+        default = 'per_trial',
+        help = 'per_trial: one --backend call per trial per camera, '
+               'single_pass: one stream-copy pass per camera cutting all of its trial clips '
+               'at the keyframes around them, '
+               'smart: frame-accurate clips that stream-copy whole GOPs and only '
+               're-encode the partial GOPs at each trial boundary, '
+               'npy: decode each video once into a memory-mapped frames_cam<m>.npy '
+               'array with a JSON index of trial offsets '
+               '(default: per_trial)'
+    )
+    parser.add_argument(
+        '--backend',
+        choices = list(BACKENDS),
+        default = 'ffmpeg',
+        help = 'Library used to cut clips in per_trial mode, only the chosen one is '
+               'imported (default: ffmpeg)'
+    )
+    parser.add_argument(
+        '--time-base',
+        choices = ['index', 'nominal'],
+        default = 'index',
+        help = 'index: map trials to real frame timestamps from the cached per-video index, '
+               'nominal: assume every video starts at the start marker with a constant '
+               'frame rate (default: index)'
+    )
+    parser.add_argument(
+        '--grayscale',
+        action = 'store_true',
+        help = 'Store single-channel frames in npy mode (default: RGB)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type = int,
+        default = 1,
+        help = 'Number of cut jobs to run in parallel (default: 1)'
+    )
+    parser.add_argument(
+        '--io-limit',
+        type = int,
+        default = IO_LIMIT_PER_DISK,
+        help = 'Maximum parallel jobs reading from the same disk '
+               '(default: {})'.format(IO_LIMIT_PER_DISK)
+    )
+    return parser.parse_args(argv)
+
+def ask_trial_type():
+    """
+    Check how the file needs to be cut
+    Returns 1 for taste trials and 0 for affective, exits on >=2
+    """
+    while True:
+        trial_bool = (input(\
+                "\nEnter 1 if taste trials, 0 if affective, and >=2 to exit: \n"))
+        try:
+            trial_bool = int(trial_bool)
+            if trial_bool >=2:
+                print('Exiting')
+                exit()
+            elif trial_bool not in [1,0]:
+                print('Please enter 0,1 or >=2')
+            else:
+                return trial_bool
+        except ValueError:
+            print('Please enter 0,1 or >=2')
 
 def read_timelist(filename):
     """
@@ -73,50 +152,670 @@ def read_timelist(filename):
         timelist = [float(line) for line in file]
     return timelist
 
-# Initialize filenames
+def compute_trial_windows(trial_vec, trial_bool, t_prior=T_PRIOR, t_post=T_POST):
+    """
+    Wall-clock (start, end) of every clip
+
+    If tastes, return array with times before and after trial
+    If affective, simply return start and end times as denoted by trial list
 
-video_files = args.video_file
-marker_file = args.marker_file 
-triallist_file = args.triallist_file
-directory = os.path.dirname(os.path.abspath(marker_file))
+    Returns:
+        np.ndarray of shape (2, n_clips) with start times in row 0
+        and end times in row 1
+    """
+    trial_vec = np.asarray(trial_vec, dtype=np.float64)
+    if trial_bool:
+        return np.asarray([trial_vec-t_prior,trial_vec+t_post])
+    return trial_vec[:2,np.newaxis]
 
-# Load list files
-marker_vec = np.asarray(read_timelist(marker_file))
-trial_vec = np.asarray(read_timelist(triallist_file))
+def compute_split_times(marker_vec, trial_vec, trial_bool, t_prior=T_PRIOR, t_post=T_POST):
+    """
+    Convert trial markers to (start, end) times from start of video
 
-# Initialize Paramteres
-frame_rate = 30.0
-# Define how much before and after the trial we want
-t_prior = 5
-t_post = 5
+    Assumes every video starts exactly at the start marker and runs at a
+    constant frame rate from there on.
+
+    Returns:
+        np.ndarray of shape (2, n_clips) with start times in row 0
+        and end times in row 1
+    """
+    return compute_trial_windows(trial_vec, trial_bool, t_prior, t_post) - marker_vec[0]
+
+def frames_to_split_times(pts, frame_windows):
+    """
+    Convert [start_frame, end_frame) windows to times from start of video
+
+    Clip ends that run past the last frame are placed one frame interval
+    after it.
+    """
+    if len(pts) > 1:
+        frame_interval = float(np.median(np.diff(pts)))
+    else:
+        frame_interval = 0.0
+    padded = np.append(pts, pts[-1] + frame_interval if len(pts) else 0.0)
+    return padded[frame_windows]
+
+def compute_indexed_split_times(video_files, marker_vec, trial_vec, trial_bool,
+                                t_prior=T_PRIOR, t_post=T_POST):
+    """
+    Map trial windows to real frames of every video
+
+    Every frame gets a wall-clock time from its presentation timestamp (see
+    video_index.get_frame_times), and all clip boundaries of a video are
+    mapped to frame indices with one vectorized searchsorted. Clip times
+    then fall exactly on frame timestamps, whatever the actual frame rate.
+    Videos recorded with a capture timestamp sidecar (see frame_timestamps)
+    use the capture time of every frame instead, so cameras that started
+    at slightly different moments are still aligned.
+    Frame timestamps come from the cached index sidecar, so no video is
+    probed twice across runs.
+
+    Returns:
+        np.ndarray of shape (n_videos, 2, n_clips) with per-video start and
+        end times from the start of that video
+    """
+    windows = compute_trial_windows(trial_vec, trial_bool, t_prior, t_post)
+    split_times = []
+    for video_name in video_files:
+        index = load_video_index(video_name)
+        frame_times = load_frame_timestamps(video_name)
+        if frame_times is None or len(frame_times) != len(index['pts']):
+            frame_times = get_frame_times(index, marker_vec[0])
+        frame_windows = find_frames(frame_times, windows)
+        split_times.append(frames_to_split_times(index['pts'], frame_windows))
+    return np.asarray(split_times)
+
+def compute_session_split_times(video_files, marker_vec, trial_vec, trial_bool, time_base='index'):
+    """Clip times for a session using the 'index' or 'nominal' time base"""
+    if time_base == 'index':
+        return compute_indexed_split_times(video_files, marker_vec, trial_vec, trial_bool)
+    return compute_split_times(marker_vec, trial_vec, trial_bool)
 
-# Convert trial markers to time from start of video
-trial_times = trial_vec - marker_vec[0]
+def get_video_split_times(split_times, video_num):
+    """Clip times of one video, from shared (2, n) or per-video (n_videos, 2, n) times"""
+    if split_times.ndim == 3:
+        return split_times[video_num]
+    return split_times
 
-# If tastes, return array with times before and after trial
-# If affective, simply return start and end times as denoted by marker file
-if trial_bool:
-    split_times = np.asarray([trial_times-t_prior,trial_times+t_post])
-else:
-    split_times = trial_times[:,np.newaxis]
+def get_output_name(directory, trial_num, video_num):
+    """Path of the clip for a given trial and camera"""
+    return directory + '/' + 'trial{}_cam{}.avi'.format(trial_num,video_num)
 
-#  ____ _   _  ___  ____     ____ _   _  ___  ____  
-# / ___| | | |/ _ \|  _ \   / ___| | | |/ _ \|  _ \ 
+#  ____ _   _  ___  ____     ____ _   _  ___  ____
+# / ___| | | |/ _ \|  _ \   / ___| | | |/ _ \|  _ \
 #| |   | |_| | | | | |_) | | |   | |_| | | | | |_) |
-#| |___|  _  | |_| |  __/  | |___|  _  | |_| |  __/ 
-# \____|_| |_|\___/|_|      \____|_| |_|\___/|_|    
-#                                                   
+#| |___|  _  | |_| |  __/  | |___|  _  | |_| |  __/
+# \____|_| |_|\___/|_|      \____|_| |_|\___/|_|
+#
 
-# Open video file, extract frames bookending a delivery and write to new video
-for video_num in range(len(video_files)):
-    for trial_num in tqdm(range(split_times.shape[1])):
+def cut_per_trial(job, split_times, directory, backend='ffmpeg'):
+    """
+    Open video file, extract frames bookending a delivery and write to new video
+    Cuts every trial separately with the chosen backend from split_backends
+    """
+    index = peek_video_index(job.video_name)
+    codec = index['codec_name'] if index is not None else 'unknown'
+    for trial_num in job.trial_nums:
 
         # Open file to be split
         trial = split_times[:,trial_num]
-        video_name = video_files[video_num]
 
         # Write out the list of frames at the appropriate framerate
-        output_name = directory + '/' + 'trial{}_cam{}.avi'.format(trial_num,video_num)
+        output_name = get_output_name(directory, trial_num, job.video_num)
+
+        # Feed parameters to the cutting backend
+        cut_clip(backend, job.video_name, trial[0], trial[1], output_name, codec)
+
+def plan_single_pass(keyframe_times, split_times, trial_nums=None):
+    """
+    Plan the cut points of one stream-copy pass over the trials of a video
+
+    Every clip starts on the keyframe at or before its start, like an
+    input-side seek, and ends on the first keyframe at or after its end, or
+    at the end of the video. The segment muxer cuts the video at all of
+    these keyframes at once, so overlapping trials share segments and the
+    stretches between trials are segments nobody uses.
+
+    Args:
+        keyframe_times: Sorted keyframe presentation times (s)
+        split_times: Array of shape (2, n_clips) with start and end times
+        trial_nums: Subset of trial indices to include (default: all)
+
+    Returns:
+        tuple: (boundaries, spans) with the sorted cut times, ending with
+        inf if a clip runs to the end of the video, and for every trial its
+        first and last segment, segment k running from boundaries[k] to
+        boundaries[k + 1]
+    """
+    if trial_nums is None:
+        trial_nums = range(split_times.shape[1])
+    trial_nums = list(trial_nums)
+
+    keyframe_times = np.append(keyframe_times, np.inf)
+    starts = []
+    ends = []
+    for trial_num in trial_nums:
+        start = max(float(split_times[0, trial_num]), 0.0)
+        start_key = np.searchsorted(keyframe_times, start + CUT_EPSILON, side='right') - 1
+        end_key = np.searchsorted(keyframe_times, float(split_times[1, trial_num]) - CUT_EPSILON, side='left')
+        starts.append(keyframe_times[max(start_key, 0)])
+        ends.append(keyframe_times[end_key])
+
+    boundaries = np.unique(starts + ends)
+    spans = {
+        trial_num: (int(np.searchsorted(boundaries, start)), int(np.searchsorted(boundaries, end)) - 1)
+        for trial_num, start, end in zip(trial_nums, starts, ends)
+    }
+    return boundaries, spans
+
+def build_single_pass_command(video_name, boundaries, segment_pattern):
+    """
+    Build the ffmpeg command that cuts a video into segments in one pass
+
+    The demuxer seeks once to the first boundary and stream copies up to the
+    last one, the segment muxer starts a new file at every boundary after
+    the first. Boundaries are keyframes, so the copied segments cut exactly
+    there. The read stops just past the last boundary, and the frames read
+    after it (its keyframe and any packets demuxed with it) go to a tail
+    segment that no clip uses. Output-side -ss on the one input, or one seeked input per clip,
+    would either lose the start of every clip or read the file once per clip.
+
+    Args:
+        video_name: Input video file
+        boundaries: Cut times from plan_single_pass
+        segment_pattern: Output pattern of the segment files (e.g. seg%05d.avi)
+
+    Returns:
+        list: ffmpeg command
+    """
+    start = float(boundaries[0])
+    cmd = ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', '-ss', '%0.6f' % (start + CUT_EPSILON)]
+    if np.isfinite(boundaries[-1]):
+        cmd.extend(['-t', '%0.6f' % (boundaries[-1] - start + CUT_EPSILON)])
+    cmd.extend(['-i', video_name, '-map', '0:v:0', '-c', 'copy', '-f', 'segment', '-reset_timestamps', '1'])
+    cuts = boundaries[1:][np.isfinite(boundaries[1:])] - start - CUT_EPSILON
+    if len(cuts):
+        cmd.extend(['-segment_times', ','.join('%0.6f' % time for time in cuts)])
+    cmd.append(segment_pattern)
+    return cmd
+
+def cut_single_pass(job, split_times, directory):
+    """
+    Write all trial clips of a job from one demux pass over the video
+
+    Clips made of one segment are moved into place, clips spanning several
+    (overlapping trials) are joined from the segments with the concat
+    demuxer, which only reads the already cut segments. The tail segment
+    after the last boundary is left in the temporary directory.
+    """
+    keyframe_times = get_keyframe_times(load_video_index(job.video_name))
+    boundaries, spans = plan_single_pass(keyframe_times, split_times, job.trial_nums)
+    ext = os.path.splitext(get_output_name(directory, 0, job.video_num))[1]
+
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        segment_pattern = os.path.join(temp_dir, 'seg%05d' + ext)
+        cmd = build_single_pass_command(job.video_name, boundaries, segment_pattern)
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+        users = {}
+        for first, last in spans.values():
+            for seg_num in range(first, last + 1):
+                users[seg_num] = users.get(seg_num, 0) + 1
+        # Shared segments are read by every clip using them before any is moved
+        order = sorted(spans, key=lambda trial_num: spans[trial_num][0] == spans[trial_num][1]
+                       and users[spans[trial_num][0]] == 1)
+        for trial_num in order:
+            first, last = spans[trial_num]
+            segments = [segment_pattern % seg_num for seg_num in range(first, last + 1)]
+            for path in segments:
+                if not os.path.exists(path):
+                    raise ValueError(f"Segment {os.path.basename(path)} of trial {trial_num} was not written "
+                                     f"from {job.video_name}")
+            output_name = get_output_name(directory, trial_num, job.video_num)
+            if len(segments) == 1 and users[first] == 1:
+                os.replace(segments[0], output_name)
+                continue
+
+            list_path = os.path.join(temp_dir, f'trial{trial_num}.txt')
+            with open(list_path, 'w') as list_file:
+                for path in segments:
+                    list_file.write(f"file '{os.path.basename(path)}'\n")
+            cmd = ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+                   '-f', 'concat', '-safe', '0', '-i', list_path,
+                   '-map', '0', '-c', 'copy', output_name]
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+def plan_smart_cut(keyframe_times, start, end):
+    """
+    Split a clip window into stream-copied and re-encoded segments
+
+    Whole GOPs between the first and last keyframe inside the window are
+    copied untouched, the partial GOPs before the first keyframe and after
+    the last one are re-encoded so the clip starts and ends on the exact
+    frames asked for.
+
+    Args:
+        keyframe_times: Sorted keyframe presentation times (s)
+        start: Clip start time (s), clamped to 0
+        end: Clip end time (s)
+
+    Returns:
+        list: (action, seg_start, seg_end) with action 'copy' or 'encode'
+    """
+    start = max(float(start), 0.0)
+    end = float(end)
+    lo = np.searchsorted(keyframe_times, start - CUT_EPSILON, side='left')
+    hi = np.searchsorted(keyframe_times, end - CUT_EPSILON, side='left')
+    inside = keyframe_times[lo:hi]
+    if len(inside) == 0:
+        return [('encode', start, end)]
+
+    first_key, last_key = float(inside[0]), float(inside[-1])
+    segments = []
+    if first_key - start > CUT_EPSILON:
+        segments.append(('encode', start, first_key))
+    if last_key - first_key > CUT_EPSILON:
+        segments.append(('copy', first_key, last_key))
+    segments.append(('encode', last_key, end))
+    return segments
+
+def build_segment_command(video_name, action, seg_start, seg_end, output_name, codec_name):
+    """
+    Build the ffmpeg command for one smart-cut segment
+
+    Copy segments seek just past their keyframe so the demuxer lands exactly
+    on it, encode segments seek just before their first frame and rely on
+    ffmpeg's accurate seeking to drop everything earlier. Both stop just
+    before seg_end so the frame at seg_end goes to the next segment.
+    Segments are written as AVI with codec parameters carried in-band, so
+    they concatenate cleanly even though the re-encoded parts come from a
+    different encoder instance than the copied GOPs.
+    """
+    if action == 'copy':
+        seek = seg_start + CUT_EPSILON
+        codec_args = ['-c', 'copy']
+        if codec_name in SMART_CUT_COPY_FILTERS:
+            codec_args.extend(['-bsf:v', SMART_CUT_COPY_FILTERS[codec_name]])
+    else:
+        if codec_name not in SMART_CUT_ENCODERS:
+            raise ValueError(f"Smart cut does not support '{codec_name}' video")
+        seek = max(seg_start - CUT_EPSILON, 0.0)
+        codec_args = SMART_CUT_ENCODERS[codec_name]
+    duration = seg_end - CUT_EPSILON - seek
+
+    cmd = ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+           '-ss', '%0.6f' % seek, '-t', '%0.6f' % duration, '-i', video_name,
+           '-map', '0:v:0']
+    cmd.extend(codec_args)
+    cmd.extend(['-f', 'avi', output_name])
+    return cmd
+
+def cut_smart(job, split_times, directory):
+    """Cut frame-accurate clips by copying whole GOPs and re-encoding the edges"""
+    index = load_video_index(job.video_name)
+    keyframe_times = get_keyframe_times(index)
+
+    for trial_num in job.trial_nums:
+        start, end = split_times[:, trial_num]
+        segments = plan_smart_cut(keyframe_times, start, end)
+        output_name = get_output_name(directory, trial_num, job.video_num)
+
+        with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+            list_path = os.path.join(temp_dir, 'segments.txt')
+            with open(list_path, 'w') as list_file:
+                for seg_num, (action, seg_start, seg_end) in enumerate(segments):
+                    seg_path = os.path.join(temp_dir, f'seg{seg_num}.avi')
+                    cmd = build_segment_command(
+                        job.video_name, action, seg_start, seg_end, seg_path, index['codec_name'])
+                    subprocess.run(cmd, check=True, capture_output=True, text=True)
+                    list_file.write(f"file '{os.path.basename(seg_path)}'\n")
+
+            cmd = ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+                   '-f', 'concat', '-safe', '0', '-i', list_path,
+                   '-map', '0', '-c', 'copy', output_name]
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+def merge_frame_windows(frame_windows):
+    """
+    Merge overlapping [start, end) frame windows into contiguous runs
+
+    Frames shared by several trials (e.g. overlapping t_prior/t_post
+    windows) end up in one run, so they are decoded and stored only once.
+
+    Args:
+        frame_windows: Array of shape (2, n_clips) with start and end frames
+
+    Returns:
+        tuple: (runs, offsets) where runs is a list of [start, end) source
+        frame ranges in the order they are stored, and offsets gives the
+        position of every clip's first frame in the concatenated runs
+    """
+    frame_windows = np.asarray(frame_windows, dtype=np.int64)
+    runs = []
+    for clip_num in np.argsort(frame_windows[0], kind='stable'):
+        start, end = (int(x) for x in frame_windows[:, clip_num])
+        if end <= start:
+            continue
+        if runs and start <= runs[-1][1]:
+            runs[-1][1] = max(runs[-1][1], end)
+        else:
+            runs.append([start, end])
+
+    if not runs:
+        return runs, np.zeros(frame_windows.shape[1], dtype=np.int64)
+    run_starts = np.array([run[0] for run in runs])
+    run_offsets = np.cumsum([0] + [run[1] - run[0] for run in runs])[:-1]
+    run_nums = np.clip(np.searchsorted(run_starts, frame_windows[0], side='right') - 1, 0, None)
+    offsets = run_offsets[run_nums] + frame_windows[0] - run_starts[run_nums]
+    offsets[frame_windows[1] <= frame_windows[0]] = 0
+    return runs, offsets
+
+def build_decode_command(video_name, start_time, n_frames, grayscale):
+    """
+    Build an ffmpeg command that decodes n_frames raw frames to stdout
+
+    Seeking is frame accurate, and frames are passed through untouched
+    (no duplication or dropping to a constant rate) so they line up with
+    the timestamps in the video index.
+    """
+    return [
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
+        '-ss', '%0.6f' % max(start_time - CUT_EPSILON, 0.0), '-i', video_name,
+        '-map', '0:v:0', '-frames:v', str(n_frames), '-fps_mode', 'passthrough',
+        '-f', 'rawvideo', '-pix_fmt', 'gray' if grayscale else 'rgb24', '-',
+    ]
+
+def decode_frames_into(video_name, start_time, out, grayscale):
+    """
+    Decode len(out) frames starting at start_time straight into out
+
+    Frames are read from the ffmpeg pipe directly into the (memory-mapped)
+    output buffer, without intermediate copies.
+    """
+    cmd = build_decode_command(video_name, start_time, len(out), grayscale)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for frame in out:
+            view = memoryview(frame.reshape(-1))
+            n_read = 0
+            while n_read < len(view):
+                chunk = proc.stdout.readinto(view[n_read:])
+                if not chunk:
+                    raise RuntimeError(
+                        f"'{video_name}' ended before {len(out)} frames from {start_time:.3f} s")
+                n_read += chunk
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode(errors='replace')
+        proc.stderr.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+
+def cut_tensor(job, split_times, directory, grayscale=False):
+    """
+    Decode the trial windows of one video into a memory-mapped .npy array
+
+    Writes frames_cam<m>.npy of shape (frames, H, W) or (frames, H, W, 3)
+    and frames_cam<m>.json with, for every trial, its offset and length in
+    that array, so downstream code can slice trials with np.load(...,
+    mmap_mode='r') without decoding again.
+    """
+    index = load_video_index(job.video_name)
+    pts = index['pts']
+    trial_nums = list(job.trial_nums)
+    frame_windows = find_frames(pts, split_times[:, trial_nums] - CUT_EPSILON)
+    frame_windows = np.clip(frame_windows, 0, len(pts))
+    runs, offsets = merge_frame_windows(frame_windows)
+
+    n_frames = sum(end - start for start, end in runs)
+    shape = (n_frames, index['height'], index['width'])
+    if not grayscale:
+        shape = shape + (3,)
+
+    base_name = os.path.join(directory, TENSOR_NAME.format(job.video_num))
+    frames = np.lib.format.open_memmap(base_name + '.npy', mode='w+', dtype=np.uint8, shape=shape)
+    run_offset = 0
+    for start, end in runs:
+        decode_frames_into(
+            job.video_name, pts[start], frames[run_offset:run_offset + end - start], grayscale)
+        run_offset += end - start
+    frames.flush()
+    del frames
+
+    trials = []
+    for clip_num, trial_num in enumerate(trial_nums):
+        start, end = (int(x) for x in frame_windows[:, clip_num])
+        trials.append({
+            'trial': trial_num,
+            'offset': int(offsets[clip_num]),
+            'n_frames': max(end - start, 0),
+            'source_frame': start,
+            'start_time': float(pts[start]) if start < len(pts) else None,
+        })
+    tensor_index = {
+        'video': os.path.abspath(job.video_name),
+        'shape': list(shape),
+        'grayscale': grayscale,
+        'trials': trials,
+    }
+    with open(base_name + '.json', 'w') as f:
+        json.dump(tensor_index, f, indent=2)
+
+def build_split_jobs(video_files, n_trials, batch_size=1):
+    """
+    Break the (video, trial) grid into independent cut jobs
+
+    Args:
+        video_files: Videos to split, in camera order
+        n_trials: Number of clips per video
+        batch_size: Number of trials handled by one job
+
+    Returns:
+        list: SplitJob entries, grouped by video
+    """
+    jobs = []
+    for video_num, video_name in enumerate(video_files):
+        for batch_start in range(0, n_trials, batch_size):
+            trial_nums = list(range(batch_start, min(batch_start + batch_size, n_trials)))
+            jobs.append(SplitJob(video_num, video_name, trial_nums))
+    return jobs
+
+def get_disk_id(path):
+    """Identify the device a file lives on, so jobs can be throttled per disk"""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+def get_disk_lock(path, io_limit=IO_LIMIT_PER_DISK):
+    """
+    Semaphore limiting concurrent readers of the disk a file lives on
+
+    Locks are shared by every pool in the process, so the limit also holds
+    when several sessions are split at the same time.
+    """
+    disk_id = get_disk_id(path)
+    with _disk_locks_lock:
+        if disk_id not in _disk_locks:
+            _disk_locks[disk_id] = threading.BoundedSemaphore(max(io_limit, 1))
+        return _disk_locks[disk_id]
+
+def run_split_jobs(jobs, cut_func, split_times, directory, n_jobs=1, io_limit=IO_LIMIT_PER_DISK,
+                   show_progress=True, on_success=None):
+    """
+    Run cut jobs serially or on a thread pool
+
+    Every job spends its time inside an ffmpeg subprocess, so threads are
+    enough to keep all cores busy. A semaphore per input disk caps how many
+    jobs read from the same device at once so a single spinning drive is
+    not thrashed by seeks. Progress is aggregated into one bar and a failing
+    job is reported without stopping the others, in both serial and
+    parallel mode.
+
+    Args:
+        jobs: SplitJob entries from build_split_jobs
+        cut_func: Function called as cut_func(job, video_split_times, directory)
+        split_times: Array of shape (2, n_clips) with start and end times,
+            or (n_videos, 2, n_clips) for per-video times
+        directory: Directory to write clips to
+        n_jobs: Number of jobs to run concurrently
+        io_limit: Maximum concurrent jobs reading from the same disk
+        show_progress: Whether to show the aggregated progress bar
+        on_success: Optional function called with every finished job,
+            always from the calling thread
+
+    Returns:
+        list: (job, error message) for every job that failed
+    """
+    def run_job(job):
+        with get_disk_lock(job.video_name, io_limit):
+            try:
+                cut_func(job, get_video_split_times(split_times, job.video_num), directory)
+            except subprocess.CalledProcessError as e:
+                return f"{e}\nFFmpeg stderr: {e.stderr}"
+            except Exception as e:
+                return str(e)
+        return None
+
+    failures = []
+    total = sum(len(job.trial_nums) for job in jobs)
+    with tqdm(total=total, disable=not show_progress) as pbar:
+        if n_jobs <= 1:
+            for job in jobs:
+                error = run_job(job)
+                if error is not None:
+                    failures.append((job, error))
+                elif on_success is not None:
+                    on_success(job)
+                pbar.update(len(job.trial_nums))
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                futures = {executor.submit(run_job, job): job for job in jobs}
+                for future in as_completed(futures):
+                    job = futures[future]
+                    error = future.result()
+                    if error is not None:
+                        failures.append((job, error))
+                    elif on_success is not None:
+                        on_success(job)
+                    pbar.update(len(job.trial_nums))
+    return failures
+
+def report_failures(failures):
+    """Print which trials of which camera failed to split"""
+    for job, error in failures:
+        print(f"Error splitting {job.video_name} (cam{job.video_num}), "
+              f"trials {job.trial_nums}: {error}")
+
+def build_mode_jobs(mode, video_files, n_trials):
+    """Cut jobs for a split mode, batched the way that mode works best"""
+    if mode in ('single_pass', 'npy'):
+        batch_size = max(n_trials, 1)
+    else:
+        batch_size = 1
+    return build_split_jobs(video_files, n_trials, batch_size)
+
+def get_cut_func(mode, grayscale=False, backend='ffmpeg'):
+    """Function that runs one cut job in a split mode"""
+    cut_funcs = {
+        'per_trial': partial(cut_per_trial, backend=backend),
+        'single_pass': cut_single_pass,
+        'smart': cut_smart,
+        'npy': partial(cut_tensor, grayscale=grayscale),
+    }
+    return cut_funcs[mode]
+
+def get_job_outputs(job, directory, mode):
+    """Files a cut job writes in a split mode"""
+    if mode == 'npy':
+        base_name = os.path.join(directory, TENSOR_NAME.format(job.video_num))
+        return [base_name + '.npy', base_name + '.json']
+    return [get_output_name(directory, trial_num, job.video_num) for trial_num in job.trial_nums]
+
+def run_split_mode(mode, video_files, split_times, directory, n_jobs=1,
+                   io_limit=IO_LIMIT_PER_DISK, grayscale=False, backend='ffmpeg',
+                   jobs=None, **kwargs):
+    """
+    Split videos in any mode
+
+    Modes that need the keyframe/PTS index build it (or read its sidecar)
+    before the pool starts, so parallel jobs never probe the same file twice.
+
+    Args:
+        jobs: Subset of build_mode_jobs(...) to run (default: all)
+        kwargs: Passed on to run_split_jobs
+    """
+    if mode in ('single_pass', 'smart', 'npy'):
+        for video_name in video_files:
+            load_video_index(video_name)
+    if jobs is None:
+        jobs = build_mode_jobs(mode, video_files, split_times.shape[-1])
+    return run_split_jobs(jobs, get_cut_func(mode, grayscale, backend), split_times, directory,
+                          n_jobs, io_limit, **kwargs)
+
+def split_per_trial(video_files, split_times, directory, n_jobs=1,
+                    io_limit=IO_LIMIT_PER_DISK, backend='ffmpeg'):
+    """Split every video with one backend call per trial"""
+    return run_split_mode('per_trial', video_files, split_times, directory, n_jobs, io_limit,
+                          backend=backend)
+
+def split_single_pass(video_files, split_times, directory, n_jobs=1, io_limit=IO_LIMIT_PER_DISK):
+    """
+    Cut all trial clips of each video from one demux pass
+
+    Clips start on the keyframe before each trial like per_trial mode and
+    end on the keyframe after it, see plan_single_pass.
+    """
+    return run_split_mode('single_pass', video_files, split_times, directory, n_jobs, io_limit)
+
+def split_smart(video_files, split_times, directory, n_jobs=1, io_limit=IO_LIMIT_PER_DISK):
+    """Write frame-accurate clips at close to stream-copy speed"""
+    return run_split_mode('smart', video_files, split_times, directory, n_jobs, io_limit)
+
+def split_to_tensors(video_files, split_times, directory, n_jobs=1,
+                     io_limit=IO_LIMIT_PER_DISK, grayscale=False):
+    """Decode every video once into a memory-mapped frame array per camera"""
+    return run_split_mode('npy', video_files, split_times, directory, n_jobs, io_limit, grayscale)
+
+# ___       _ _   _       _ _
+#|_ _|_ __ (_) |_(_) __ _| (_)_______
+# | || '_ \| | __| |/ _` | | |_  / _ \
+# | || | | | | |_| | (_| | | |/ /  __/
+#|___|_| |_|_|\__|_|\__,_|_|_/___\___|
+#
+
+def main():
+    """Split every video according to the marker and trial list files"""
+    args = parse_arguments()
+
+    # Print what files are being used
+    print('\n')
+    print('Marker file : {}'.format(args.marker_file))
+    print('Trial list file: {}'.format(args.triallist_file))
+    print('Video files : {}'.format(args.video_file))
+
+    trial_bool = ask_trial_type()
+
+    # Initialize filenames
+    video_files = args.video_file
+    directory = os.path.dirname(os.path.abspath(args.marker_file))
+
+    # Load list files
+    marker_vec = np.asarray(read_timelist(args.marker_file))
+    trial_vec = np.asarray(read_timelist(args.triallist_file))
+
+    split_times = compute_session_split_times(
+        video_files, marker_vec, trial_vec, trial_bool, args.time_base)
+
+    failures = run_split_mode(args.mode, video_files, split_times, directory,
+                              args.jobs, args.io_limit, args.grayscale, args.backend)
+    if args.mode == 'per_trial':
+        print_throughput()
+
+    if failures:
+        report_failures(failures)
+        sys.exit(1)
 
-        # Feed parameters to ffmpeg_extract_subclip
-        ffmpeg_extract_subclip(video_name, trial[0], trial[1], targetname=output_name)
+if __name__ == '__main__':
+    main()
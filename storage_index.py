@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Index of the storage used by past recordings
+Every session under an output directory is summarized by its capture
+configuration (codec, resolution, frame rate, single channel), its length
+from the start and stop markers, and the size of its camera videos, giving
+the actual bytes per camera-minute of each configuration. The index is kept
+in <output_dir>/.storage_index.json and refreshed from file sizes and
+mtimes only: sessions whose files did not change are never read again
+For usage, type python storage_index.py -h
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from combine_utils.session_files import MARKER_PATTERN, VIDEO_PATTERN
+
+# Index file kept in the output directory
+INDEX_NAME = '.storage_index.json'
+
+# Bump when the summary of a session changes so old indexes are rebuilt
+INDEX_VERSION = 1
+
+# Capture configuration written next to the markers by the recorders
+CAPTURE_SUFFIX = '_capture.json'
+
+# Camera-minutes of history needed before an estimate is trusted
+MIN_CAMERA_MINUTES = 1.0
+
+# Sessions recorded before capture files existed used the fixed settings of the shell scripts
+LEGACY_CAPTURE = {
+    'mp4': {'codec': 'h264', 'video_resolution': '1280x720', 'frame_rate': 30, 'single_channel': None},
+    'avi': {'codec': 'mjpeg', 'video_resolution': '1280x720', 'frame_rate': 30, 'single_channel': None},
+}
+
+def get_capture_key(capture):
+    """
+    Key of a capture configuration, e.g. 'h264 1280x720@30 color'
+
+    single_channel None (unknown, for old sessions) gives the channel 'any'.
+    """
+    channel = {True: 'y', False: 'color', None: 'any'}[capture.get('single_channel')]
+    return f"{capture['codec']} {capture['video_resolution']}@{capture['frame_rate']:g} {channel}"
+
+def write_capture_info(path, codec, video_resolution, frame_rate, single_channel, test_source=False):
+    """
+    Write the capture configuration of a session, read back when it is indexed
+
+    Sessions of test sources are marked so they never count as history.
+    """
+    with open(path, 'w') as f:
+        json.dump({'codec': codec, 'video_resolution': video_resolution, 'frame_rate': frame_rate,
+                   'single_channel': single_channel, 'test_source': test_source}, f)
+
+def stat_signature(path):
+    """[size, mtime_ns] of a file, None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def get_camera_bytes(sizes):
+    """
+    Bytes recorded per camera from the sizes of a session's camera files
+
+    A whole file counts instead of the segments it was joined from.
+
+    Returns:
+        dict: camera number -> bytes
+    """
+    whole = {}
+    segments = {}
+    for filename, size in sizes.items():
+        match = VIDEO_PATTERN.match(filename)
+        key = (int(match.group('cam')), match.group('part'))
+        target = segments if match.group('segment') else whole
+        target[key] = target.get(key, 0) + size
+    cameras = {}
+    for key in set(whole) | set(segments):
+        cameras[key[0]] = cameras.get(key[0], 0) + whole.get(key, segments.get(key, 0))
+    return cameras
+
+def summarize_session(directory, session, filenames):
+    """
+    Capture configuration, length and size of one session
+
+    Returns:
+        dict or None: capture, duration (s), cameras and bytes, None while
+        the session is still recording (no stop marker yet), for recordings
+        of test sources and for transcoded passthrough recordings
+    """
+    prefix = os.path.join(directory, session)
+    with open(prefix + '_markers.txt') as f:
+        markers = [float(line) for line in f if line.strip()]
+    if len(markers) < 2 or markers[1] <= markers[0]:
+        return None
+
+    sizes = {}
+    for filename in filenames:
+        if VIDEO_PATTERN.match(filename):
+            sizes[filename] = os.stat(os.path.join(directory, filename)).st_size
+    camera_bytes = get_camera_bytes(sizes)
+    if not camera_bytes:
+        return None
+
+    try:
+        with open(prefix + CAPTURE_SUFFIX) as f:
+            capture = json.load(f)
+    except (FileNotFoundError, ValueError):
+        extension = VIDEO_PATTERN.match(next(iter(sizes))).group('ext')
+        capture = LEGACY_CAPTURE.get(extension)
+    if capture is None or capture.get('test_source') or capture.get('transcoded_from'):
+        # Transcoded sessions hold neither what was recorded nor a live capture's output
+        return None
+    return {
+        'capture': capture,
+        'key': get_capture_key(capture),
+        'duration': markers[1] - markers[0],
+        'cameras': len(camera_bytes),
+        'bytes': sum(camera_bytes.values()),
+    }
+
+def refresh_storage_index(output_dir):
+    """
+    Bring the storage index of an output directory up to date
+
+    Files are only stat'ed; a session is read (markers and capture file)
+    only if the size or mtime of one of its files changed.
+
+    Returns:
+        dict: Session path (relative to output_dir) -> summary
+    """
+    index_path = os.path.join(output_dir, INDEX_NAME)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError('old index')
+    except (OSError, ValueError):
+        index = {'version': INDEX_VERSION, 'sessions': {}}
+
+    sessions = {}
+    changed = False
+    for dirpath, dirnames, filenames in os.walk(output_dir):
+        dirnames.sort()
+        for filename in filenames:
+            match = MARKER_PATTERN.match(filename)
+            if not match:
+                continue
+            session = match.group('session')
+            relative = os.path.relpath(os.path.join(dirpath, session), output_dir)
+            signature = {
+                name: stat_signature(os.path.join(dirpath, name))
+                for name in sorted(filenames)
+                if name == filename or name == session + CAPTURE_SUFFIX or VIDEO_PATTERN.match(name)
+            }
+            cached = index['sessions'].get(relative)
+            if cached is not None and cached['signature'] == signature:
+                sessions[relative] = cached
+                continue
+            changed = True
+            try:
+                summary = summarize_session(dirpath, session, filenames)
+            except (OSError, ValueError):
+                summary = None
+            sessions[relative] = {'signature': signature, 'summary': summary}
+
+    if changed or set(sessions) != set(index['sessions']):
+        index['sessions'] = sessions
+        tmp_path = index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            # Read-only output directory, the index is only kept in memory
+            pass
+    return {relative: entry['summary'] for relative, entry in sessions.items()
+            if entry['summary'] is not None}
+
+def summarize_storage(sessions):
+    """
+    Bytes per camera-minute of every capture configuration
+
+    Returns:
+        dict: key -> capture, sessions, camera_minutes, bytes and
+        gb_per_camera_minute
+    """
+    totals = {}
+    for summary in sessions.values():
+        total = totals.setdefault(summary['key'], {
+            'capture': summary['capture'], 'sessions': 0, 'camera_minutes': 0.0, 'bytes': 0})
+        total['sessions'] += 1
+        total['camera_minutes'] += summary['cameras'] * summary['duration'] / 60
+        total['bytes'] += summary['bytes']
+    for total in totals.values():
+        total['gb_per_camera_minute'] = total['bytes'] / 1024**3 / total['camera_minutes']
+    return totals
+
+def estimate_storage_rate(output_dir, capture):
+    """
+    Learned GB per camera-minute of a capture configuration
+
+    Sessions of exactly this configuration are used; failing that, old
+    sessions whose single channel setting is unknown.
+
+    Returns:
+        dict or None: The totals of the matching configuration (see
+        summarize_storage), None without enough history
+    """
+    if not os.path.isdir(output_dir):
+        return None
+    totals = summarize_storage(refresh_storage_index(output_dir))
+    for key in (get_capture_key(capture), get_capture_key(dict(capture, single_channel=None))):
+        total = totals.get(key)
+        if total is not None and total['camera_minutes'] >= MIN_CAMERA_MINUTES:
+            return dict(total, key=key)
+    return None
+
+def main():
+    """Print the learned storage of every capture configuration under a directory"""
+    parser = argparse.ArgumentParser(
+        description='Index the storage used by past recordings under an output directory'
+    )
+    parser.add_argument(
+        'output_dir',
+        nargs='?',
+        default='./recorded_videos',
+        help='Directory with recorded sessions (default: ./recorded_videos)'
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.output_dir):
+        print(f"Error: '{args.output_dir}' is not a directory")
+        sys.exit(1)
+    totals = summarize_storage(refresh_storage_index(args.output_dir))
+    if not totals:
+        print("No finished sessions found")
+        return
+    for key, total in sorted(totals.items()):
+        print(f"{key}: {total['gb_per_camera_minute']:.3f} GB per camera-minute "
+              f"({total['sessions']} sessions, {total['camera_minutes']:.1f} camera-minutes)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for benchmarks/benchmark_pipeline.py functionality
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add benchmarks directory to path to import benchmark_pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from benchmark_pipeline import (
+    make_trial_times,
+    make_synthetic_session,
+    get_split_times,
+    count_clip_frames,
+    run_stage,
+    parse_arguments,
+)
+from combine_utils.session_files import find_sessions
+
+def test_trial_times():
+    """Test deterministic trial time generation"""
+    print("Testing trial time generation...")
+
+    trial_times = make_trial_times(120, 10, seed=3)
+    assert len(trial_times) == 10, "Failed: Should give one time per trial"
+    assert np.all(np.diff(trial_times) > 0), "Failed: Trial times should be increasing"
+    assert trial_times[0] > 0 and trial_times[-1] < 120, "Failed: Trials should stay inside the session"
+    assert np.array_equal(trial_times, make_trial_times(120, 10, seed=3)), "Failed: Same seed should give same times"
+    assert not np.array_equal(trial_times, make_trial_times(120, 10, seed=4)), "Failed: Seed should change the jitter"
+
+    print("✓ Trial time generation tests passed")
+
+def test_synthetic_session():
+    """Test generating a session and timing a stage on it"""
+    print("Testing synthetic session benchmark...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            session = make_synthetic_session(
+                os.path.join(temp_dir, 'session'), cameras=2, duration=4, size='160x120',
+                rate=10, n_trials=2)
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        found = find_sessions(temp_dir)
+        assert len(found) == 1, "Failed: batch_split.py should find the synthetic session"
+        assert found[0]['video_files'] == session['video_files'], "Failed: Cameras should be found in order"
+
+        split_times = get_split_times(session)
+        assert count_clip_frames(session, split_times) > 0, "Failed: Clips should cover frames"
+
+        args = parse_arguments(['--stages', 'split_single_pass'])
+        result = run_stage('split_single_pass', session, os.path.join(temp_dir, 'out'), args)
+        assert 'error' not in result, f"Failed: Stage errored: {result.get('error')}"
+        for key in ['frames', 'wall_seconds', 'fps', 'peak_rss_mb', 'output_bytes']:
+            assert key in result, f"Failed: Missing {key} in stage result"
+        assert result['output_bytes'] > 0, "Failed: Stage outputs should be measured"
+
+    print("✓ Synthetic session benchmark tests passed")
+
+class ExitOnLoad:
+    """Stage arguments that kill the stage process while it loads them"""
+    stage_timeout = None
+
+    def __reduce__(self):
+        return (os._exit, (3,))
+
+class HangOnLoad:
+    """Stage arguments that hang the stage process while it loads them"""
+    stage_timeout = 1
+
+    def __reduce__(self):
+        return (time.sleep, (60,))
+
+def test_dead_stage():
+    """Test that a stage process that dies or hangs is recorded as failed"""
+    print("Testing failed stage processes...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session = {'video_files': []}
+        start = time.monotonic()
+        result = run_stage('index', session, os.path.join(temp_dir, 'dead'), ExitOnLoad())
+        assert 'code 3' in result.get('error', ''), f"Failed: Dead stage should be reported, got {result}"
+
+        result = run_stage('index', session, os.path.join(temp_dir, 'hung'), HangOnLoad())
+        assert 'timed out' in result.get('error', ''), f"Failed: Hung stage should time out, got {result}"
+        assert time.monotonic() - start < 30, "Failed: Failed stages should not block the benchmark"
+
+    print("✓ Failed stage process tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running benchmark_pipeline.py tests...\n")
+
+    try:
+        test_trial_times()
+        test_synthetic_session()
+        test_dead_stage()
+
+        print("\n✓ All tests passed! The benchmark_pipeline.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for disk_watchdog.py functionality
+"""
+
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+
+# Add current directory to path to import disk_watchdog
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from disk_watchdog import DiskWatchdog, get_output_size, get_watchdog_settings
+
+def test_watchdog_settings():
+    """Test reading thresholds from the config"""
+    print("Testing watchdog settings...")
+
+    settings = get_watchdog_settings({})
+    assert settings['interval'] == 10, "Failed: Default interval should be 10 s"
+    assert settings['warn_minutes'] == [30, 10], "Failed: Default warnings should be at 30 and 10 minutes"
+
+    settings = get_watchdog_settings({'disk_space': {'warn_minutes_to_full': [5, 60], 'stop_free_space_gb': 3}})
+    assert settings['warn_minutes'] == [60, 5], "Failed: Warning thresholds should be sorted largest first"
+    assert settings['stop_free_gb'] == 3, "Failed: Stop threshold should come from the config"
+
+    print("✓ Watchdog settings tests passed")
+
+def test_write_rate():
+    """Test measuring the write rate and projecting time to full"""
+    print("Testing write rate measurement...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'cam0.mp4')
+        with open(video, 'wb') as f:
+            f.write(b'\0' * 1000)
+        assert get_output_size(temp_dir) == 1000, "Failed: Output size should sum the recorded files"
+
+        free_gb = shutil.disk_usage(temp_dir).free / 1024**3
+        watchdog = DiskWatchdog(temp_dir, warning_free_gb=0, stop_free_gb=0, window=30)
+        sample = watchdog.sample(now=100.0)
+        assert sample['write_rate'] is None and sample['minutes_to_full'] is None, \
+            "Failed: First sample should have no rate yet"
+        assert sample['level'] == 'ok', "Failed: Plenty of space should be ok"
+
+        with open(video, 'ab') as f:
+            f.write(b'\0' * 10 * 1024**2)
+        sample = watchdog.sample(now=110.0)
+        assert abs(sample['output_rate'] - 1024**2) < 1000, f"Failed: Output should grow 1 MiB/s, got {sample['output_rate']}"
+        assert sample['write_rate'] >= sample['output_rate'], "Failed: Larger of the rates should be used"
+        assert sample['minutes_to_full'] > 0, "Failed: Time to full should be projected"
+        json.dumps(sample)
+
+        # Old samples leave the window
+        watchdog.sample(now=150.0)
+        sample = watchdog.sample(now=160.0)
+        assert sample['output_rate'] == 0, "Failed: Rate should only cover the last window"
+
+        # Thresholds above the projection warn once and then stop
+        watchdog = DiskWatchdog(temp_dir, warn_minutes=[1e12, 1e11], stop_minutes=0,
+                                warning_free_gb=0, stop_free_gb=0)
+        watchdog.sample(now=0.0)
+        with open(video, 'ab') as f:
+            f.write(b'\0' * 1024**2)
+        sample = watchdog.sample(now=1.0)
+        assert len(sample['warnings']) == 1 and sample['level'] == 'warning', "Failed: Crossed threshold should warn"
+        assert watchdog.sample(now=1.0)['warnings'] == [], "Failed: Every threshold should warn only once"
+
+        watchdog = DiskWatchdog(temp_dir, warning_free_gb=0, stop_free_gb=free_gb * 2)
+        assert watchdog.sample()['level'] == 'stop', "Failed: Free space below the stop threshold should stop"
+
+    print("✓ Write rate measurement tests passed")
+
+def test_stop_processes():
+    """Test stopping a recorder from the command line"""
+    print("Testing stopping the recorder...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_path = os.path.join(temp_dir, 'config.json')
+        with open(config_path, 'w') as f:
+            json.dump({'disk_space': {'stop_free_space_gb': 1e9}}, f)
+        recorder = subprocess.Popen(['sleep', '30'])
+        result = subprocess.run(
+            [sys.executable, 'disk_watchdog.py', '--config', config_path, '--path', temp_dir,
+             '--stop-pid', str(recorder.pid)],
+            capture_output=True, text=True, timeout=30,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        assert recorder.wait(timeout=10) == -signal.SIGINT, "Failed: Recorder should get SIGINT like Ctrl+C"
+        assert result.returncode == 2, "Failed: Watchdog should report that it stopped the recording"
+        sample = json.loads(result.stdout.splitlines()[-1])
+        assert sample['level'] == 'stop', "Failed: Last sample should be the stop"
+
+    print("✓ Stopping the recorder tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running disk_watchdog.py tests...\n")
+
+    try:
+        test_watchdog_settings()
+        test_write_rate()
+        test_stop_processes()
+
+        print("\n✓ All tests passed! The disk_watchdog.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
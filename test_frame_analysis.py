@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for frame_analysis.py functionality
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+# Add current directory to path to import frame_analysis
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from combine_utils.session_files import find_sessions
+from frame_analysis import REPORT_SUFFIX, analyze_frame_times, analyze_sessions, format_camera
+from frame_timestamps import get_timestamp_path
+from storage_index import write_capture_info
+
+SESSION = 'rat1_video_250101-120000'
+
+def test_frame_times():
+    """Test gap, duplicate and drift detection on synthetic frame times"""
+    print("Testing frame time analysis...")
+
+    times = np.arange(300) / 30.0
+    result = analyze_frame_times(times, 30)
+    assert result['frames'] == 300, "Failed: Every frame should be counted"
+    assert abs(result['duration'] - 10.0) < 1e-9, "Failed: Duration should include the last frame"
+    assert abs(result['measured_fps'] - 30.0) < 1e-9, "Failed: Frame rate should be measured"
+    assert result['gaps']['count'] == 0 and result['duplicates'] == 0, "Failed: Clean stream has no problems"
+    assert abs(result['drift']['ppm']) < 1e-3, "Failed: Clean stream should not drift"
+
+    # Frames 100-102 and 200-209 dropped, frame 50 duplicated
+    lossy = np.sort(np.concatenate([np.delete(times, list(range(100, 103)) + list(range(200, 210))), [times[50]]]))
+    result = analyze_frame_times(lossy, 30)
+    assert result['gaps']['count'] == 2, "Failed: Both gaps should be found"
+    assert result['gaps']['missing_frames'] == 13, "Failed: Dropped frames should be counted"
+    assert result['gaps']['largest'][0]['missing'] == 10, "Failed: Largest gap should come first"
+    assert abs(result['gaps']['largest'][0]['time'] - 199 / 30) < 1e-9, "Failed: Gap time should be reported"
+    assert result['duplicates'] == 1, "Failed: Duplicate should be found"
+
+    # Camera clock running 100 ppm slow
+    result = analyze_frame_times(times * 1.0001, 30)
+    assert abs(result['drift']['ppm'] - 100) < 0.1, "Failed: Drift rate should be fitted"
+    assert result['drift']['final_s'] > 0, "Failed: Slow clock should drift forward"
+    assert result['gaps']['count'] == 0, "Failed: Drift is not a gap"
+
+    assert analyze_frame_times([], 30)['frames'] == 0, "Failed: Empty stream should be analyzed"
+
+    print("✓ Frame time analysis tests passed")
+
+def test_session_report():
+    """Test the report of a recorded session"""
+    print("Testing session report...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session_dir = os.path.join(temp_dir, SESSION)
+        os.makedirs(session_dir)
+        prefix = os.path.join(session_dir, SESSION)
+        with open(prefix + '_markers.txt', 'w') as f:
+            f.write('1000.000\n1004.000\n')
+        write_capture_info(prefix + '_capture.json', 'h264', '160x120', 10, False)
+        for cam in range(2):
+            subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10',
+                            '-t', '4', '-c:v', 'libx264', '-preset', 'ultrafast', f'{prefix}_cam{cam}.mp4'],
+                           check=True)
+        # Camera 1 dropped frames 20-24 while capturing
+        capture_times = np.delete(1000.0 + np.arange(40) / 10.0, range(20, 25))
+        capture_times.astype('<f8').tofile(get_timestamp_path(prefix + '_cam1.mp4'))
+
+        reports = analyze_sessions(find_sessions(temp_dir), 30, jobs=2)
+        assert len(reports) == 1, "Failed: Session should be analyzed"
+        with open(prefix + REPORT_SUFFIX) as f:
+            report = json.load(f)
+        assert report == reports[0], "Failed: Report should be written next to the markers"
+        assert report['frame_rate'] == 10, "Failed: Frame rate should come from the capture file"
+        assert report['markers']['duration'] == 4.0, "Failed: Markers should be read"
+
+        cam0, cam1 = report['cameras']
+        assert cam0['video'].endswith('_cam0.mp4'), "Failed: Cameras should stay in order"
+        assert cam0['packets']['frames'] == 40 and not cam0['problems'], "Failed: Clean camera should pass"
+        assert cam0['capture'] is None, "Failed: Camera without sidecar has no capture analysis"
+        assert abs(cam0['packets']['duration_vs_markers']) < 1e-6, "Failed: Duration should match the markers"
+        assert cam1['capture']['gaps']['missing_frames'] == 5, "Failed: Dropped capture frames should be found"
+        assert cam1['capture']['start_after_marker'] == 0.0, "Failed: Start should be compared with the marker"
+        assert cam1['problems'] and not report['ok'], "Failed: Session with dropped frames should be reported"
+        assert '⚠️' in format_camera(cam1), "Failed: Problem camera should be flagged"
+
+    print("✓ Session report tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running frame_analysis.py tests...\n")
+
+    try:
+        test_frame_times()
+        test_session_report()
+
+        print("\n✓ All tests passed! The frame_analysis.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
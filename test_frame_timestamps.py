@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for frame_timestamps.py functionality
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add current directory to path to import frame_timestamps
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from frame_timestamps import (
+    get_timestamp_path,
+    join_timestamp_files,
+    load_frame_timestamps,
+    parse_timecode_line,
+    read_timestamps,
+    summarize_timestamps,
+    TimestampWriter,
+)
+
+def test_parse_timecode_line():
+    """Test parsing mkvtimestamp_v2 output"""
+    print("Testing timecode parsing...")
+
+    assert parse_timecode_line('# timecode format v2\n') is None, "Failed: Header should be skipped"
+    assert parse_timecode_line('\n') is None, "Failed: Blank lines should be skipped"
+    assert parse_timecode_line('33\n') == 33.0, "Failed: Frame times should be parsed as ms"
+
+    print("✓ Timecode parsing tests passed")
+
+def test_writer_roundtrip():
+    """Test writing and reading a sidecar"""
+    print("Testing sidecar writing and reading...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'rat1_video_250101-120000_cam0.mp4')
+        assert load_frame_timestamps(video) is None, "Failed: Videos without a sidecar should give None"
+
+        expected = 1735732800.0 + np.arange(100) / 30
+        with TimestampWriter(get_timestamp_path(video), flush_every=16) as writer:
+            for timestamp in expected[:40]:
+                writer.append(timestamp)
+            assert writer.n_written == 32, "Failed: Values should be written in blocks of flush_every"
+            assert len(read_timestamps(writer.path)) == 32, "Failed: Flushed values should be readable while recording"
+        # A restarted writer appends
+        with TimestampWriter(get_timestamp_path(video)) as writer:
+            for timestamp in expected[40:]:
+                writer.append(timestamp)
+
+        timestamps = load_frame_timestamps(video)
+        assert timestamps.dtype == np.float64, "Failed: Timestamps should be float64"
+        assert np.array_equal(timestamps, expected), "Failed: Timestamps should read back exactly"
+
+        # A value cut off by a crash is ignored
+        with open(get_timestamp_path(video), 'ab') as f:
+            f.write(b'\x00' * 3)
+        assert len(load_frame_timestamps(video)) == 100, "Failed: Partly written value should be ignored"
+
+        summary = summarize_timestamps(timestamps)
+        assert summary['frames'] == 100, "Failed: Unexpected frame count"
+        assert abs(summary['mean_fps'] - 30) < 1e-6, "Failed: Unexpected mean frame rate"
+
+    print("✓ Sidecar writing and reading tests passed")
+
+def test_join_timestamp_files():
+    """Test joining the sidecars of a camera recorded in several parts"""
+    print("Testing sidecar joining...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        parts = [os.path.join(temp_dir, f'cam0_part{part}.mp4') for part in range(3)]
+        joined = os.path.join(temp_dir, 'cam0_joined.mp4')
+        for part_num, part in enumerate(parts[:2]):
+            (100.0 * part_num + np.arange(20) / 10.0).astype('<f8').tofile(get_timestamp_path(part))
+
+        join_timestamp_files(parts, joined)
+        assert load_frame_timestamps(joined) is None, "Failed: Parts without sidecar should not be joined"
+
+        join_timestamp_files(parts[:2], joined)
+        times = load_frame_timestamps(joined)
+        assert len(times) == 40 and times[-1] == 101.9, "Failed: Sidecars of every part should be joined in order"
+
+        # An up to date joined sidecar is kept
+        mtime = os.path.getmtime(get_timestamp_path(joined))
+        join_timestamp_files(parts[:2], joined)
+        assert os.path.getmtime(get_timestamp_path(joined)) == mtime, "Failed: Up to date sidecar should be kept"
+
+    print("✓ Sidecar joining tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running frame_timestamps.py tests...\n")
+
+    try:
+        test_parse_timecode_line()
+        test_writer_roundtrip()
+        test_join_timestamp_files()
+
+        print("\n✓ All tests passed! The frame_timestamps.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
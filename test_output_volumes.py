@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for output_volumes.py functionality
+"""
+
+import os
+import sys
+import tempfile
+
+# Add current directory to path to import output_volumes
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from output_volumes import (
+    OutputVolume,
+    get_manifest_videos,
+    get_output_volumes,
+    get_volumes_file,
+    load_volume_manifest,
+    measure_write_throughput,
+    plan_camera_volumes,
+    write_volume_manifest,
+)
+
+GB = 1024**3
+MB = 1024**2
+
+def test_plan_camera_volumes():
+    """Test assigning cameras by free space and throughput"""
+    print("Testing camera assignment...")
+
+    assert get_output_volumes({}, '/out') == ['/out'], "Failed: --output-dir should override the config"
+    assert get_output_volumes({'output_volumes': ['/a', '/b']}) == ['/a', '/b'], "Failed: Config volumes should be used"
+    assert get_output_volumes({}) == ['./recorded_videos'], "Failed: Default output directory should be used"
+
+    # Equal volumes share the cameras
+    assignment = plan_camera_volumes([100 * GB, 100 * GB], [200 * MB, 200 * MB], 4, 10 * MB)
+    assert sorted(assignment) == [0, 0, 1, 1], f"Failed: Equal volumes should get two cameras each, got {assignment}"
+
+    # Free space decides while every volume keeps up
+    assignment = plan_camera_volumes([300 * GB, 100 * GB], [200 * MB, 200 * MB], 4, 10 * MB)
+    assert assignment.count(0) == 3, f"Failed: Volume with more space should get more cameras, got {assignment}"
+
+    # A slow volume only takes what its throughput allows
+    assignment = plan_camera_volumes([1000 * GB, 100 * GB], [20 * MB, 200 * MB], 4, 10 * MB)
+    assert assignment.count(0) == 1, f"Failed: Slow volume should be limited by throughput, got {assignment}"
+
+    # Cameras already recording count, excluded volumes are never used
+    assignment = plan_camera_volumes([100 * GB, 100 * GB, 100 * GB], [200 * MB] * 3, 2, 10 * MB,
+                                     load=[0, 3, 0], exclude={0})
+    assert assignment == [2, 2], f"Failed: Cameras should go to the only free volume, got {assignment}"
+    assert plan_camera_volumes([GB], [MB], 1, MB, exclude={0}) == [], "Failed: No volume should be left"
+
+    print("✓ Camera assignment tests passed")
+
+def test_volume_manifest():
+    """Test writing and reading the volume manifest of a session"""
+    print("Testing volume manifest...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session = 'rat1_video_250101-120000'
+        volumes = [OutputVolume(os.path.join(temp_dir, name), session, 100 * MB) for name in ('a', 'b')]
+        volumes[0].cameras = [0]
+        volumes[1].cameras = [1]
+        for volume in volumes:
+            os.makedirs(volume.session_dir)
+        assert volumes[1].output_prefix == os.path.join(temp_dir, 'b', session, session), \
+            "Failed: Output prefix should be in the volume's session directory"
+
+        cam0 = volumes[0].output_prefix + '_cam0.mp4'
+        cam1 = volumes[1].output_prefix + '_cam1.mp4'
+        for path in (cam0, cam1):
+            open(path, 'wb').close()
+        cameras = [
+            {'cam': 1, 'device': '/dev/video1', 'files': [cam1]},
+            {'cam': 0, 'device': '/dev/video0', 'files': [cam0, volumes[1].output_prefix + '_cam0_part1.mp4']},
+        ]
+
+        assert load_volume_manifest(volumes[0].session_dir, session) is None, \
+            "Failed: Single directory sessions have no manifest"
+        write_volume_manifest(get_volumes_file(volumes[0].session_dir, session), session, volumes, cameras)
+        manifest = load_volume_manifest(volumes[0].session_dir, session)
+        assert manifest['session'] == session, "Failed: Manifest should name the session"
+        assert [volume['root'] for volume in manifest['volumes']] == [os.path.abspath(v.root) for v in volumes], \
+            "Failed: Manifest should list the volumes"
+        assert get_manifest_videos(manifest) == [[cam0], [cam1]], "Failed: Existing files of every camera in camera order"
+        part1 = volumes[1].output_prefix + '_cam0_part1.mp4'
+        open(part1, 'wb').close()
+        assert get_manifest_videos(manifest)[0] == [cam0, part1], "Failed: Every part should be listed in order"
+
+    print("✓ Volume manifest tests passed")
+
+def test_write_throughput():
+    """Test measuring the write throughput of a directory"""
+    print("Testing write throughput...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        throughput = measure_write_throughput(temp_dir, 4 * MB)
+        assert throughput > 0, "Failed: Throughput should be positive"
+        assert os.listdir(temp_dir) == [], "Failed: Probe file should be removed"
+
+    print("✓ Write throughput tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running output_volumes.py tests...\n")
+
+    try:
+        test_plan_camera_volumes()
+        test_volume_manifest()
+        test_write_throughput()
+
+        print("\n✓ All tests passed! The output_volumes.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -89,6 +89,48 @@ def test_single_channel_functionality():
     
     print("✓ Single channel functionality tests passed")
 
+def test_segment_exec_string():
+    """Test that the segmented recording command survives eval and the shell GNU parallel runs it in"""
+    print("Testing segmented recording command...")
+    
+    with open("parallel2video_ffmpeg.sh", "r") as f:
+        content = f.read()
+    block = content[content.index('if [[ "$segment_minutes"'):content.index('time_file=')]
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bin_dir = Path(temp_dir) / "bin"
+        bin_dir.mkdir()
+        # Stand-in for GNU parallel: joins the command with spaces and runs it in a shell per input line
+        (bin_dir / "parallel").write_text(
+            '#!/bin/bash\n'
+            'while [[ "$1" == -* ]]; do shift 2; done\n'
+            'cmd="$*"\n'
+            'while IFS=: read -r cam device; do c=${cmd//\\{1\\}/$cam}; bash -c "${c//\\{2\\}/$device}"; done\n'
+        )
+        # Stand-in for ffmpeg: prints the arguments it got, one per line
+        (bin_dir / "ffmpeg").write_text('#!/bin/bash\nprintf "%s\\n" "$@"\n')
+        for tool in ("parallel", "ffmpeg"):
+            os.chmod(bin_dir / tool, 0o755)
+        # A file the key frame expression would match as a glob if it were unquoted
+        (Path(temp_dir) / "expr:gte(t,n_forced_30)").touch()
+        
+        for single_channel in ("n", "y"):
+            script = (f"segment_minutes=0.5; mjpeg_passthrough=n; single_channel={single_channel}\n"
+                      "DEVICE_LIST='0:/dev/video0'; NUM_CAMERAS=1\n"
+                      f"{block}\n"
+                      'bash -n -c "$exec_string" || exit 3\n'
+                      'eval "$exec_string"\n')
+            env = dict(os.environ, PATH=f"{bin_dir}:{os.environ['PATH']}")
+            result = subprocess.run(["bash", "-c", script], capture_output=True, text=True, cwd=temp_dir, env=env)
+            assert result.returncode == 0, f"Segmented command should run. Error: {result.stderr}"
+            args = result.stdout.splitlines()
+            assert args[args.index("-force_key_frames") + 1] == "expr:gte(t,n_forced*30)", \
+                "Key frame expression should reach ffmpeg as one argument"
+            assert args[args.index("-i") + 1] == "/dev/video0", "Device should reach ffmpeg"
+            assert args[-1] == "name_cam0_seg%04d.mp4", "Segments should be the output"
+    
+    print("✓ Segmented recording command tests passed")
+
 def test_streamer_command_structure():
     """Test that streamer script contains proper streamer commands"""
     print("Testing streamer command structure...")
@@ -241,6 +283,7 @@ def main():
         test_script_syntax()
         test_ffmpeg_command_structure()
         test_single_channel_functionality()
+        test_segment_exec_string()
         test_streamer_command_structure()
         test_directory_structure_creation()
         test_device_checking()
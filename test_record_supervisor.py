@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Test script for record_supervisor.py functionality
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Add current directory to path to import record_supervisor
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from disk_watchdog import DiskWatchdog
+from frame_timestamps import load_frame_timestamps
+from output_volumes import OutputVolume, get_manifest_videos, load_volume_manifest
+from record_supervisor import (
+    build_capture_command,
+    build_group_capture_command,
+    get_part_file,
+    get_session_name,
+    parse_arguments,
+    select_devices,
+    RecordingSupervisor,
+)
+
+SETTINGS = {'video_resolution': '160x120', 'frame_rate': 10}
+
+def test_capture_command():
+    """Test capture commands for cameras and lavfi stand-ins"""
+    print("Testing capture commands...")
+
+    cmd = build_capture_command('/dev/video0', 'out_cam0.mp4', {'video_resolution': '1280x720', 'frame_rate': 30})
+    assert cmd[cmd.index('-f') + 1] == 'v4l2', "Failed: Cameras should be read with v4l2"
+    assert cmd[cmd.index('-i') + 1] == '/dev/video0', "Failed: Device should be the input"
+    assert cmd[cmd.index('-s') + 1] == '1280x720', "Failed: Resolution should come from the config"
+    assert cmd[cmd.index('-progress') + 1] == 'pipe:1', "Failed: Progress should be written to stdout"
+    assert cmd[cmd.index('-preset') + 1] == 'ultrafast', "Failed: Captures should use the ultrafast preset"
+    assert cmd[-1] == 'out_cam0.mp4', "Failed: Output should be last"
+
+    cmd = build_capture_command('/dev/video0', 'out_cam0.mp4', SETTINGS, timestamp_fd=5)
+    assert cmd[cmd.index('-ts') + 1] == 'abs', "Failed: Camera timestamps should be converted to Unix time"
+    assert cmd[-1] == 'pipe:5', "Failed: Frame times should be written to the timestamp pipe"
+    assert cmd[cmd.index('-f', cmd.index('out_cam0.mp4')) + 1] == 'mkvtimestamp_v2', "Failed: Unexpected timestamp format"
+
+    cmd = build_capture_command('/dev/video0', '/s/out_cam0.mp4', SETTINGS, segment_time=300)
+    assert '/s/out_cam0.mp4' not in cmd, "Failed: Segmented captures should not write one file"
+    assert cmd[cmd.index('-segment_list') + 1] == '/s/out_cam0_segments.csv', "Failed: Segments should be indexed"
+    assert cmd[-1] == '/s/out_cam0_seg%04d.mp4', "Failed: Segments should be the output"
+
+    cmd = build_capture_command('lavfi:testsrc', 'out_cam0.mp4', SETTINGS, single_channel=True)
+    assert cmd[cmd.index('-i') + 1] == 'testsrc=size=160x120:rate=10', "Failed: lavfi source should get size and rate"
+    assert '-re' in cmd, "Failed: lavfi source should be read in real time"
+    assert cmd[cmd.index('-pix_fmt') + 1] == 'gray', "Failed: Single channel should record gray"
+
+    passthrough = dict(SETTINGS, input_format='mjpeg')
+    cmd = build_capture_command('/dev/video0', 'out_cam0.mkv', passthrough, timestamp_fd=5)
+    assert cmd[cmd.index('-input_format') + 1] == 'mjpeg', "Failed: Passthrough should request MJPEG from the camera"
+    assert 'libx264' not in cmd and '-pix_fmt' not in cmd, "Failed: Passthrough should not encode"
+    assert cmd[cmd.index('-c:v') + 1] == 'copy', "Failed: Passthrough should copy the camera stream"
+    assert cmd[cmd.index('-c:v', cmd.index('out_cam0.mkv')) + 1] == 'copy', \
+        "Failed: Passthrough timestamps should be taken without decoding"
+
+    cmd = build_capture_command('file:/s/stand_in.avi', 'out_cam0.mkv', passthrough)
+    assert cmd[cmd.index('-i') + 1] == 'file:/s/stand_in.avi', "Failed: File stand-in should be the input"
+    assert cmd[cmd.index('-stream_loop') + 1] == '-1' and '-re' in cmd, \
+        "Failed: File stand-in should loop at its native rate"
+    assert '-input_format' not in cmd, "Failed: File stand-in should be read in its own format"
+
+    cmd = build_group_capture_command(['/dev/video0', '/dev/video1'], ['out_cam0.mp4', 'out_cam1.mp4'], SETTINGS,
+                                      timestamp_fds=[5, 6])
+    inputs = [i for i, arg in enumerate(cmd) if arg == '-i']
+    assert [cmd[i + 1] for i in inputs] == ['/dev/video0', '/dev/video1'], "Failed: Every device should be an input"
+    assert cmd.index('-isync') > inputs[0] and cmd[cmd.index('-isync') + 1] == '0', \
+        "Failed: Second camera should be synced to the first"
+    assert cmd.count('-isync') == 1, "Failed: First camera is the sync reference"
+    assert cmd.index('out_cam0.mp4') < cmd.index('pipe:5') < cmd.index('out_cam1.mp4') and cmd[-1] == 'pipe:6', \
+        "Failed: Every camera should get its file and timestamp pipe"
+    maps = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-map']
+    assert maps == ['0:v', '0:v', '1:v', '1:v'], "Failed: Every output should map its own camera"
+
+    try:
+        parse_arguments(['--name', 'rat1', '--mjpeg', '--single-channel'])
+        assert False, "Failed: --mjpeg should not be combined with --single-channel"
+    except SystemExit:
+        pass
+
+    assert get_part_file('/s/name', 1, 0) == '/s/name_cam1.mp4', "Failed: First file should be <name>_cam<n>"
+    assert get_part_file('/s/name', 1, 2) == '/s/name_cam1_part2.mp4', "Failed: Restarts should write part files"
+    assert get_session_name('rat1', 0).startswith('rat1_video_'), "Failed: Session name should follow the shell scripts"
+
+    assert select_devices({'video_devices': ['/dev/video0', '/dev/video1']}, test_source=True) == \
+        ['lavfi:testsrc', 'lavfi:testsrc'], "Failed: Test source should replace every device"
+
+    print("✓ Capture command tests passed")
+
+def test_supervised_recording():
+    """Test recording lavfi stand-ins, restarting a failing one, and stopping cleanly"""
+    print("Testing supervised recording...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        events = []
+        supervisor = RecordingSupervisor(
+            ['lavfi:testsrc', 'lavfi:nosuchsource'], temp_dir, 'rat1_video_250101-120000', SETTINGS,
+            max_restarts=1, restart_delay=0.1, callback=events.append)
+        ok = asyncio.run(supervisor.run(duration=2))
+        assert not ok, "Failed: A capture that never starts should be reported"
+
+        kinds = [(event['event'], event.get('cam')) for event in events]
+        assert ('restart', 1) in kinds, "Failed: Failing capture should be restarted"
+        assert ('failed', 1) in kinds, "Failed: Failing capture should be given up after max_restarts"
+        assert ('stop', 0) in kinds, "Failed: Working capture should be stopped at the end"
+        stop = [event for event in events if event['event'] == 'stop'][0]
+        assert stop['returncode'] == 0, "Failed: Stopped capture should exit cleanly"
+
+        video = os.path.join(temp_dir, 'rat1_video_250101-120000_cam0.mp4')
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-count_frames', '-show_entries', 'stream=nb_read_frames',
+             '-of', 'csv=p=0', video], capture_output=True, text=True, check=True)
+        assert int(result.stdout) >= 10, "Failed: Finalized file should hold the recorded frames"
+
+        timestamps = load_frame_timestamps(video)
+        assert len(timestamps) == int(result.stdout), "Failed: Sidecar should hold one timestamp per frame"
+        intervals = timestamps[1:] - timestamps[:-1]
+        assert (intervals > 0).all() and abs(intervals.mean() - 0.1) < 0.01, "Failed: Timestamps should follow the frame rate"
+
+        with open(supervisor.time_file) as f:
+            markers = [float(line) for line in f]
+        assert len(markers) == 2 and markers[0] < markers[1], "Failed: Start and stop markers should be written"
+        with open(supervisor.events_file) as f:
+            assert len([json.loads(line) for line in f]) == len(events), "Failed: Every event should be logged"
+
+    print("✓ Supervised recording tests passed")
+
+def test_watchdog_stop():
+    """Test the disk watchdog stopping every camera"""
+    print("Testing disk watchdog stop...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        events = []
+        # Stop as soon as a write rate is known
+        watchdog = DiskWatchdog(temp_dir, warning_free_gb=0, stop_free_gb=0, stop_minutes=1e12)
+        supervisor = RecordingSupervisor(
+            ['lavfi:testsrc'], temp_dir, 'rat1_video_250101-120000', SETTINGS,
+            callback=events.append, watchdog=watchdog, watchdog_interval=1)
+        ok = asyncio.run(supervisor.run(duration=30))
+        assert ok, "Failed: Stopped capture should not count as failed"
+
+        disk = [event for event in events if event['event'] == 'disk']
+        assert disk[0]['level'] == 'ok' and disk[-1]['level'] == 'stop', "Failed: Watchdog should stop once the rate is known"
+        stopping = [event for event in events if event['event'] == 'stopping']
+        assert stopping[0]['reason'] == 'disk full', "Failed: Stop should be requested by the watchdog"
+        stop = [event for event in events if event['event'] == 'stop'][0]
+        assert stop['returncode'] == 0, "Failed: Capture should be finalized when the watchdog stops it"
+
+    print("✓ Disk watchdog stop tests passed")
+
+def test_mjpeg_passthrough():
+    """Test recording an MJPEG stand-in without encoding"""
+    print("Testing MJPEG passthrough...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stand_in = os.path.join(temp_dir, 'camera.avi')
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10', '-t', '1',
+                        '-c:v', 'mjpeg', '-pix_fmt', 'yuvj420p', stand_in], check=True)
+        events = []
+        supervisor = RecordingSupervisor(
+            [f'file:{stand_in}'], temp_dir, 'rat1_video_250101-120000', dict(SETTINGS, input_format='mjpeg'),
+            callback=events.append)
+        ok = asyncio.run(supervisor.run(duration=2))
+        assert ok, "Failed: Passthrough capture should succeed"
+
+        video = supervisor.captures[0].files[0]
+        assert video.endswith('_cam0.mkv'), "Failed: Passthrough should be written to MKV"
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-count_packets', '-show_entries', 'stream=codec_name,nb_read_packets',
+             '-of', 'csv=p=0', video], capture_output=True, text=True, check=True)
+        codec, packets = result.stdout.strip().split(',')
+        assert codec == 'mjpeg', "Failed: Camera stream should be stored as MJPEG"
+        assert int(packets) >= 10, "Failed: Stand-in should be looped until stopped"
+        assert len(load_frame_timestamps(video)) == int(packets), "Failed: Sidecar should hold one timestamp per frame"
+        with open(supervisor.capture_file) as f:
+            assert json.load(f)['codec'] == 'mjpeg', "Failed: Capture file should record the MJPEG codec"
+
+    print("✓ MJPEG passthrough tests passed")
+
+def test_volume_spill():
+    """Test moving a camera to another volume when its volume runs low"""
+    print("Testing volume spillover...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session = 'rat1_video_250101-120000'
+        volumes = [OutputVolume(os.path.join(temp_dir, name), session, 100 * 1024**2) for name in ('a', 'b')]
+        for volume in volumes:
+            os.makedirs(volume.root)
+        volumes[0].cameras = [0]
+        volumes[1].cameras = [1]
+        # Volume a is always low, volume b never
+        volumes[0].watchdog = DiskWatchdog(volumes[0].root, volumes[0].session_dir, stop_free_gb=1e12)
+        volumes[1].watchdog = DiskWatchdog(volumes[1].root, volumes[1].session_dir, warning_free_gb=0,
+                                           stop_free_gb=0, stop_minutes=0)
+
+        events = []
+        supervisor = RecordingSupervisor(
+            ['lavfi:testsrc', 'lavfi:testsrc'], volumes[0].session_dir, session, SETTINGS,
+            callback=events.append, watchdog_interval=1, volumes=volumes, camera_rate=1024**2)
+        ok = asyncio.run(supervisor.run(duration=3))
+        assert ok, "Failed: Moved capture should not count as failed"
+
+        moves = [event for event in events if event['event'] == 'move']
+        assert [(event['cam'], event['to']) for event in moves] == [(0, volumes[1].root)], \
+            "Failed: Camera of the low volume should move to the other one"
+        assert not [event for event in events if event['event'] == 'exit' or event.get('reason') == 'disk full'], \
+            "Failed: Move should neither restart nor stop the recording"
+        assert volumes[1].cameras == [1, 0], "Failed: Moved camera should be listed on its new volume"
+
+        manifest = load_volume_manifest(volumes[0].session_dir, session)
+        cam0 = manifest['cameras'][0]['files']
+        assert cam0 == [os.path.join(volumes[0].session_dir, session + '_cam0.mp4'),
+                        os.path.join(volumes[1].session_dir, session + '_cam0_part1.mp4')], \
+            "Failed: Manifest should list both files of the moved camera"
+        assert all(os.path.getsize(path) > 0 for path in cam0), "Failed: Both files should be recorded"
+        assert get_manifest_videos(manifest)[1][0].startswith(volumes[1].session_dir), \
+            "Failed: Camera on volume b should be recorded there"
+
+    print("✓ Volume spillover tests passed")
+
+def test_shared_clock():
+    """Test recording every stand-in from one ffmpeg on a shared clock"""
+    print("Testing shared clock recording...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        events = []
+        # The second stand-in stops delivering frames after 1 s
+        supervisor = RecordingSupervisor(
+            ['lavfi:testsrc', 'lavfi:testsrc=size=160x120:rate=10:duration=1'], temp_dir,
+            'rat1_video_250101-120000', SETTINGS, stall_timeout=1.5, restart_delay=0.1,
+            callback=events.append, shared_clock=True)
+        ok = asyncio.run(supervisor.run(duration=5))
+        assert ok, "Failed: Restarted group should not count as failed"
+
+        starts = [event for event in events if event['event'] == 'start']
+        assert len({event['pid'] for event in starts}) == 2, "Failed: Cameras should share one ffmpeg per part"
+        assert [event['cam'] for event in starts] == [0, 1, 0, 1], "Failed: Every camera should report its start"
+        exits = [event for event in events if event['event'] == 'exit']
+        assert [(event['cam'], event['stalled']) for event in exits] == [(0, True), (1, True)], \
+            "Failed: Camera that stopped delivering frames should restart the group"
+        assert all(event['returncode'] == 0 for event in exits), \
+            "Failed: Cameras that still record should be finished cleanly"
+
+        first, second = [capture.files[0] for capture in supervisor.captures]
+        assert supervisor.captures[1].files[1].endswith('_cam1_part1.mp4'), "Failed: Restart should write part files"
+        assert supervisor.captures[0].restarts == 1, "Failed: Restarts should be counted per camera"
+        first_times = load_frame_timestamps(first)
+        second_times = load_frame_timestamps(second)
+        assert len(second_times) == 10, "Failed: Stopped camera should keep its frames"
+        assert len(first_times) > len(second_times), "Failed: Working camera should keep recording"
+        assert abs(first_times[0] - second_times[0]) < 0.05, "Failed: Cameras should start together on one clock"
+        assert first_times[0] > 1e9, "Failed: Shared clock should be anchored at Unix time"
+
+    print("✓ Shared clock recording tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running record_supervisor.py tests...\n")
+
+    try:
+        test_capture_command()
+        test_supervised_recording()
+        test_watchdog_stop()
+        test_mjpeg_passthrough()
+        test_volume_spill()
+        test_shared_clock()
+
+        print("\n✓ All tests passed! The record_supervisor.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script for segment_index.py functionality
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+# Add current directory to path to import segment_index
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from segment_index import (
+    build_segment_output_args,
+    find_segmented_videos,
+    find_unlisted_segments,
+    follow_segments,
+    get_segment_paths,
+    is_recording_finished,
+    join_segments,
+    read_segment_index,
+)
+
+NAME = 'rat1_video_250101-120000'
+
+def test_segment_paths():
+    """Test segment file names and ffmpeg options"""
+    print("Testing segment paths...")
+
+    paths = get_segment_paths(f'/s/{NAME}_cam1.mp4')
+    assert paths['pattern'] == f'/s/{NAME}_cam1_seg%04d.mp4', "Failed: Unexpected segment pattern"
+    assert paths['index'] == f'/s/{NAME}_cam1_segments.csv', "Failed: Unexpected index path"
+
+    args = build_segment_output_args(f'/s/{NAME}_cam1.mp4', 300)
+    assert args[args.index('-f') + 1] == 'segment', "Failed: Segment muxer should be used"
+    assert args[args.index('-segment_time') + 1] == '300', "Failed: Unexpected segment length"
+    assert args[args.index('-force_key_frames') + 1] == 'expr:gte(t,n_forced*300)', \
+        "Failed: Keyframes should be forced at segment boundaries"
+    assert 'frag_keyframe' in args[args.index('-segment_format_options') + 1], "Failed: Segments should be fragmented"
+    assert args[-1] == paths['pattern'], "Failed: Segment pattern should be the output"
+
+    print("✓ Segment path tests passed")
+
+def test_read_segment_index():
+    """Test reading a running index"""
+    print("Testing segment index reading...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, f'{NAME}_cam0.mp4')
+        index = get_segment_paths(video)['index']
+        assert read_segment_index(index) == [], "Failed: Missing index should have no segments"
+
+        with open(index, 'w') as f:
+            f.write(f'{NAME}_cam0_seg0000.mp4,0.000000,300.000000\n'
+                    f'{NAME}_cam0_seg0001.mp4,300.000000,600.000000\n'
+                    f'{NAME}_cam0_seg0002.mp4,600.0')
+        segments = read_segment_index(index)
+        assert len(segments) == 2, "Failed: Unfinished last line should be ignored"
+        assert segments[1] == {'file': os.path.join(temp_dir, f'{NAME}_cam0_seg0001.mp4'),
+                               'start': 300.0, 'end': 600.0}, f"Failed: Unexpected segment {segments[1]}"
+
+        for i in range(3):
+            open(os.path.join(temp_dir, f'{NAME}_cam0_seg{i:04d}.mp4'), 'w').close()
+        assert find_unlisted_segments(video, segments) == [os.path.join(temp_dir, f'{NAME}_cam0_seg0002.mp4')], \
+            "Failed: Segment missing from the index should be found"
+        assert find_segmented_videos(temp_dir) == [video], "Failed: Segmented video should be found by its index"
+
+        marker_file = os.path.join(temp_dir, f'{NAME}_markers.txt')
+        with open(marker_file, 'w') as f:
+            f.write('1735732800.000\n')
+        assert not is_recording_finished(temp_dir), "Failed: Session with only a start marker is still recording"
+        states = iter([False, True])
+        followed = [segment['file'] for _, segment in
+                    follow_segments(temp_dir, poll_interval=0, finished=lambda: next(states))]
+        assert followed == [segment['file'] for segment in segments], "Failed: Every finished segment should be followed once"
+        with open(marker_file, 'a') as f:
+            f.write('1735733400.000\n')
+        assert is_recording_finished(temp_dir), "Failed: Stop marker should end the recording"
+
+    print("✓ Segment index reading tests passed")
+
+def test_join_segments():
+    """Test recording segments and joining them"""
+    print("Testing segment joining...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, f'{NAME}_cam0.mp4')
+        try:
+            subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi',
+                            '-i', 'testsrc=size=160x120:rate=10:duration=5',
+                            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p']
+                           + build_segment_output_args(video, 2),
+                           check=True)
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        segments = read_segment_index(get_segment_paths(video)['index'])
+        assert [segment['end'] for segment in segments] == [2.0, 4.0, 5.0], "Failed: Segments should be 2 s long"
+
+        files = join_segments(video)
+        assert len(files) == 3, "Failed: Every segment should be joined"
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-count_frames', '-show_entries', 'stream=nb_read_frames',
+             '-of', 'csv=p=0', video], capture_output=True, text=True, check=True)
+        assert int(result.stdout) == 50, f"Failed: Joined video should hold every frame, got {result.stdout.strip()}"
+
+    print("✓ Segment joining tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running segment_index.py tests...\n")
+
+    try:
+        test_segment_paths()
+        test_read_segment_index()
+        test_join_segments()
+
+        print("\n✓ All tests passed! The segment_index.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
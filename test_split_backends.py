@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test script for split_backends.py functionality
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+# Add current directory to path to import split_backends
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import split_backends
+from split_backends import (
+    BACKENDS,
+    get_backend,
+    cut_clip,
+    record_throughput,
+    get_throughput,
+)
+
+def test_backend_registry():
+    """Test looking up backends by name"""
+    print("Testing backend registry...")
+
+    for name in ['ffmpeg', 'moviepy', 'opencv', 'pyav']:
+        assert name in BACKENDS, f"Failed: Missing backend {name}"
+        assert get_backend(name) is BACKENDS[name], f"Failed: Lookup of {name} returned another function"
+
+    try:
+        get_backend('gstreamer')
+        assert False, "Should have raised for unknown backend"
+    except ValueError:
+        pass
+
+    print("✓ Backend registry tests passed")
+
+def test_lazy_imports():
+    """Test that importing split_script does not load any backend library"""
+    print("Testing lazy backend imports...")
+
+    code = (
+        "import sys, split_script; "
+        "print(','.join(m for m in ['cv2', 'moviepy', 'av', 'matplotlib'] if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == '', f"Failed: Imported eagerly: {result.stdout.strip()}"
+
+    print("✓ Lazy backend import tests passed")
+
+def test_throughput():
+    """Test aggregation of measured throughput"""
+    print("Testing throughput aggregation...")
+
+    split_backends._throughput.clear()
+    record_throughput('ffmpeg', 'h264', 10.0, 2000000, 0.5)
+    record_throughput('ffmpeg', 'h264', 10.0, 2000000, 0.5)
+    record_throughput('pyav', 'mjpeg', 5.0, 1000000, 1.0)
+
+    report = get_throughput()
+    stats = report[('ffmpeg', 'h264')]
+    assert stats['clips'] == 2, "Failed: Cuts of the same backend and codec should be summed"
+    assert abs(stats['clips_per_second'] - 2.0) < 1e-9, "Failed: Unexpected clip rate"
+    assert abs(stats['realtime_factor'] - 20.0) < 1e-9, "Failed: Unexpected realtime factor"
+    assert abs(stats['mb_per_second'] - 4.0) < 1e-9, "Failed: Unexpected write rate"
+    assert report[('pyav', 'mjpeg')]['clips'] == 1, "Failed: Codecs should be reported separately"
+
+    # Cuts are timed and recorded even when the backend writes nothing
+    BACKENDS['noop'] = lambda video_name, start, end, output_name: None
+    try:
+        cut_clip('noop', 'cam0.mp4', -2.0, 3.0, 'missing.avi')
+        stats = get_throughput()[('noop', 'unknown')]
+        assert stats['video_seconds'] == 3.0, "Failed: Negative starts should be clamped to 0"
+        assert stats['bytes'] == 0, "Failed: Missing output should count as zero bytes"
+    finally:
+        del BACKENDS['noop']
+        split_backends._throughput.clear()
+
+    print("✓ Throughput aggregation tests passed")
+
+def test_ffmpeg_backend():
+    """Test cutting a synthetic video with the ffmpeg backend"""
+    print("Testing ffmpeg backend...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'cam0.avi')
+        try:
+            subprocess.run(
+                ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+                 '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10:duration=4',
+                 '-c:v', 'mjpeg', video],
+                check=True, capture_output=True,
+            )
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        output = os.path.join(temp_dir, 'trial0_cam0.avi')
+        cut_clip('ffmpeg', video, 1.0, 2.0, output, 'mjpeg')
+        assert os.path.getsize(output) > 0, "Failed: ffmpeg backend should write the clip"
+        split_backends._throughput.clear()
+
+    print("✓ ffmpeg backend tests passed")
+
+def test_pyav_backend():
+    """Test that the pyav backend writes a clip starting at 0 like the ffmpeg backend"""
+    print("Testing pyav backend...")
+
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        print("  PyAV not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'cam0.mp4')
+        try:
+            subprocess.run(
+                ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error',
+                 '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10:duration=6',
+                 '-c:v', 'libx264', '-g', '10', video],
+                check=True, capture_output=True,
+            )
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        clips = {}
+        for backend in ('ffmpeg', 'pyav'):
+            output = os.path.join(temp_dir, f'trial0_cam0_{backend}.avi')
+            cut_clip(backend, video, 3.0, 4.0, output, 'h264')
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-count_packets', '-show_entries',
+                 'stream=nb_read_packets:format=duration', '-of', 'default=nw=1', output],
+                capture_output=True, text=True, check=True,
+            )
+            clips[backend] = dict(line.split('=') for line in result.stdout.split())
+        assert int(clips['pyav']['nb_read_packets']) == 10, "Failed: pyav clip should hold the 10 frames of the window"
+        assert abs(float(clips['pyav']['duration']) - 1.0) < 0.15, \
+            f"Failed: pyav clip should start at 0, got duration {clips['pyav']['duration']}"
+        assert abs(float(clips['pyav']['duration']) - float(clips['ffmpeg']['duration'])) < 0.25, \
+            "Failed: pyav clip should match the ffmpeg clip"
+        split_backends._throughput.clear()
+
+    print("✓ pyav backend tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running split_backends.py tests...\n")
+
+    try:
+        test_backend_registry()
+        test_lazy_imports()
+        test_throughput()
+        test_ffmpeg_backend()
+        test_pyav_backend()
+
+        print("\n✓ All tests passed! The split_backends.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Test script for split_script.py functionality
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+# Add current directory to path to import split_script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from frame_timestamps import get_timestamp_path, TimestampWriter
+from video_index import load_video_index, get_keyframe_times
+from split_script import (
+    read_timelist,
+    compute_split_times,
+    compute_indexed_split_times,
+    get_output_name,
+    plan_single_pass,
+    build_single_pass_command,
+    split_single_pass,
+    build_split_jobs,
+    run_split_jobs,
+    plan_smart_cut,
+    build_segment_command,
+    frames_to_split_times,
+    get_video_split_times,
+    merge_frame_windows,
+    build_decode_command,
+)
+
+def test_read_timelist():
+    """Test reading marker and trial list files"""
+    print("Testing time list reading...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "markers.txt")
+        with open(path, 'w') as f:
+            f.write("1700000000.12\n1700003600.50\n")
+
+        timelist = read_timelist(path)
+        assert timelist == [1700000000.12, 1700003600.50], "Failed to read time list"
+
+    print("✓ Time list reading tests passed")
+
+def test_compute_split_times():
+    """Test conversion of trial times to clip boundaries"""
+    print("Testing split time computation...")
+
+    marker_vec = np.array([100.0, 400.0])
+    trial_vec = np.array([110.0, 150.0, 200.0])
+
+    # Taste trials get a window around every trial
+    split_times = compute_split_times(marker_vec, trial_vec, 1)
+    assert split_times.shape == (2, 3), "Taste trials should give one clip per trial"
+    assert np.allclose(split_times[0], [5.0, 45.0, 95.0]), "Clip starts should be t_prior before trial"
+    assert np.allclose(split_times[1], [15.0, 55.0, 105.0]), "Clip ends should be t_post after trial"
+
+    # Affective sessions use the trial list as start and end of one clip
+    split_times = compute_split_times(marker_vec, np.array([110.0, 150.0]), 0)
+    assert split_times.shape == (2, 1), "Affective session should give a single clip"
+    assert np.allclose(split_times[:, 0], [10.0, 50.0]), "Affective clip should span the trial list"
+
+    print("✓ Split time computation tests passed")
+
+def test_capture_timestamp_split_times():
+    """Test aligning clips with capture timestamp sidecars"""
+    print("Testing capture timestamp alignment...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'cam0.mp4')
+        try:
+            subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi',
+                            '-i', 'testsrc=size=160x120:rate=10:duration=3',
+                            '-c:v', 'libx264', '-pix_fmt', 'yuv420p', video],
+                           check=True)
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        marker_vec = np.array([100.0, 110.0])
+        trial_vec = np.array([101.0])
+        nominal = compute_indexed_split_times([video], marker_vec, trial_vec, 1, t_prior=0.2, t_post=0.3)
+
+        # This camera started 0.5 s after the start marker
+        with TimestampWriter(get_timestamp_path(video)) as writer:
+            for i in range(30):
+                writer.append(100.5 + i / 10)
+        captured = compute_indexed_split_times([video], marker_vec, trial_vec, 1, t_prior=0.2, t_post=0.3)
+
+        assert np.allclose(nominal[0, :, 0], [0.8, 1.3]), f"Failed: Unexpected nominal clip {nominal[0, :, 0]}"
+        assert np.allclose(captured[0, :, 0], [0.3, 0.8]), \
+            f"Failed: Clip should follow the capture timestamps, got {captured[0, :, 0]}"
+
+    print("✓ Capture timestamp alignment tests passed")
+
+def test_frames_to_split_times():
+    """Test conversion of frame windows to clip times"""
+    print("Testing frame window conversion...")
+
+    # A dropped frame at index 3 leaves a gap in the timestamps
+    pts = np.array([0.0, 0.1, 0.2, 0.4, 0.5])
+    frame_windows = np.array([[1, 3], [3, 5]])
+    split_times = frames_to_split_times(pts, frame_windows)
+
+    assert np.allclose(split_times, [[0.1, 0.4], [0.4, 0.6]]), \
+        f"Failed: Clip times should fall on frame timestamps, got {split_times}"
+
+    print("✓ Frame window conversion tests passed")
+
+def test_video_split_times():
+    """Test selecting clip times for one video"""
+    print("Testing per-video split times...")
+
+    shared = np.zeros((2, 4))
+    assert get_video_split_times(shared, 1) is shared, "Failed: Shared times should apply to every video"
+
+    per_video = np.stack([np.zeros((2, 4)), np.ones((2, 4))])
+    assert np.all(get_video_split_times(per_video, 1) == 1), "Failed: Per-video times should be selected by camera"
+
+    print("✓ Per-video split times tests passed")
+
+def test_output_name():
+    """Test clip naming"""
+    print("Testing output naming...")
+
+    assert get_output_name('/data', 3, 1) == '/data/trial3_cam1.avi', "Failed: unexpected clip name"
+
+    print("✓ Output naming tests passed")
+
+def test_single_pass_command():
+    """Test single-pass planning and ffmpeg command building"""
+    print("Testing single-pass command building...")
+
+    keyframe_times = np.array([0.0, 4.0, 8.0, 12.0, 16.0])
+    # Trial 0 starts before the video, trials 1 and 2 overlap, trial 3 runs past the last keyframe
+    split_times = np.array([[-2.0, 5.0, 7.0, 14.0], [3.0, 8.0, 10.0, 20.0]])
+    boundaries, spans = plan_single_pass(keyframe_times, split_times)
+
+    assert boundaries.tolist() == [0.0, 4.0, 8.0, 12.0, np.inf], f"Failed: Unexpected cut times {boundaries}"
+    assert spans == {0: (0, 0), 1: (1, 1), 2: (1, 2), 3: (3, 3)}, f"Failed: Unexpected spans {spans}"
+
+    cmd = build_single_pass_command('cam0.mp4', boundaries, '/tmp/seg%05d.avi')
+    assert cmd.count('-i') == 1, "Failed: Video should be read by one input"
+    assert cmd[cmd.index('-c') + 1] == 'copy', "Failed: Segments should be stream copied"
+    assert cmd[cmd.index('-f') + 1] == 'segment', "Failed: Segment muxer should cut the clips"
+    assert '-t' not in cmd, "Failed: Clip running to the end should read the whole video"
+    times = [float(time) for time in cmd[cmd.index('-segment_times') + 1].split(',')]
+    assert np.allclose(times, [4.0, 8.0, 12.0], atol=0.001), "Failed: Segments should be cut at every boundary"
+
+    # Subsets of trials only read their own window
+    boundaries, spans = plan_single_pass(keyframe_times, split_times, trial_nums=[1])
+    assert boundaries.tolist() == [4.0, 8.0] and spans == {1: (0, 0)}, "Failed: Subset should only plan trial 1"
+    cmd = build_single_pass_command('cam0.mp4', boundaries, '/tmp/seg%05d.avi')
+    assert abs(float(cmd[cmd.index('-ss') + 1]) - 4.0) < 0.001, "Failed: Pass should seek to the first clip"
+    assert abs(float(cmd[cmd.index('-t') + 1]) - 4.0) < 0.001, "Failed: Pass should stop after the last clip"
+    assert abs(float(cmd[cmd.index('-segment_times') + 1]) - 4.0) < 0.001, \
+        "Failed: Frames past the last clip should be cut off into a tail segment"
+
+    print("✓ Single-pass command building tests passed")
+
+def test_single_pass_split():
+    """Test cutting overlapping trials in one pass"""
+    print("Testing single-pass splitting...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'cam0.mp4')
+        try:
+            subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10',
+                            '-t', '30', '-c:v', 'libx264', '-g', '20', video], check=True)
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        split_times = np.array([[3.0, 9.0, 11.0, 25.0], [7.0, 13.0, 15.0, 40.0]])
+        failures = split_single_pass([video], split_times, temp_dir)
+        assert not failures, f"Failed: Single pass should succeed ({failures})"
+
+        # Clips run from the keyframe before the trial to the keyframe after it (every 2 s)
+        for trial_num, expected in enumerate([60, 60, 60, 60]):
+            result = subprocess.run(['ffprobe', '-v', 'error', '-count_packets', '-select_streams', 'v:0',
+                                     '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0',
+                                     get_output_name(temp_dir, trial_num, 0)],
+                                    check=True, capture_output=True, text=True)
+            assert int(result.stdout) == expected, f"Failed: Trial {trial_num} has {result.stdout.strip()} frames"
+        assert sorted(os.listdir(temp_dir)) == ['cam0.mp4', 'cam0.mp4.index.npz'] + \
+            [f'trial{trial_num}_cam0.avi' for trial_num in range(4)], "Failed: Segments should be cleaned up"
+
+    print("✓ Single-pass splitting tests passed")
+
+def count_packets(path):
+    """Number of video packets of a file"""
+    result = subprocess.run(['ffprobe', '-v', 'error', '-count_packets', '-select_streams', 'v:0',
+                             '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', path],
+                            check=True, capture_output=True, text=True)
+    return int(result.stdout)
+
+def test_single_pass_end():
+    """Test that a clip ending inside the video stops on its end keyframe"""
+    print("Testing single-pass clip ends...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video = os.path.join(temp_dir, 'cam0.mp4')
+        try:
+            # B-frames and a GOP that does not divide the trial times
+            subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=25',
+                            '-t', '20', '-c:v', 'libx264', '-bf', '3', '-g', '28', '-sc_threshold', '0', video],
+                           check=True)
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print("  ffmpeg not available, skipping")
+            return
+
+        split_times = np.array([[1.5, 6.1], [3.9, 9.0]])
+        failures = split_single_pass([video], split_times, temp_dir)
+        assert not failures, f"Failed: Single pass should succeed ({failures})"
+
+        # Every clip holds exactly the frames from its start keyframe up to its end keyframe
+        index = load_video_index(video)
+        keyframe_times = get_keyframe_times(index)
+        for trial_num, (start, end) in enumerate(split_times.T):
+            start_key = keyframe_times[keyframe_times <= start][-1]
+            end_key = keyframe_times[keyframe_times >= end][0]
+            expected = int(np.sum((index['pts'] >= start_key - 1e-6) & (index['pts'] < end_key - 1e-6)))
+            frames = count_packets(get_output_name(temp_dir, trial_num, 0))
+            assert frames == expected, f"Failed: Trial {trial_num} has {frames} frames, expected {expected}"
+
+    print("✓ Single-pass clip end tests passed")
+
+def test_split_jobs():
+    """Test breaking the (video, trial) grid into jobs"""
+    print("Testing split job building...")
+
+    jobs = build_split_jobs(['cam0.mp4', 'cam1.mp4'], 5)
+    assert len(jobs) == 10, "Failed: Per-trial jobs should cover every video and trial"
+    assert jobs[0].trial_nums == [0], "Failed: Per-trial jobs should hold a single trial"
+
+    jobs = build_split_jobs(['cam0.mp4', 'cam1.mp4'], 5, batch_size=2)
+    assert [job.trial_nums for job in jobs[:3]] == [[0, 1], [2, 3], [4]], "Failed: Trials should be batched in order"
+    assert jobs[-1].video_num == 1 and jobs[-1].video_name == 'cam1.mp4', "Failed: Jobs should keep camera numbering"
+
+    print("✓ Split job building tests passed")
+
+def test_run_split_jobs():
+    """Test serial and parallel job execution with failures"""
+    print("Testing split job execution...")
+
+    split_times = np.zeros((2, 4))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_files = []
+        for cam in range(2):
+            path = os.path.join(temp_dir, f'cam{cam}.mp4')
+            open(path, 'w').close()
+            video_files.append(path)
+
+        for n_jobs in [1, 4]:
+            done = []
+
+            def fake_cut(job, split_times, directory):
+                if job.video_num == 1 and job.trial_nums == [2]:
+                    raise RuntimeError('corrupt packet')
+                done.append((job.video_num, tuple(job.trial_nums)))
+
+            jobs = build_split_jobs(video_files, 4)
+            failures = run_split_jobs(jobs, fake_cut, split_times, temp_dir, n_jobs=n_jobs, io_limit=1)
+
+            assert len(done) == 7, f"Failed: Other jobs should finish when one fails (jobs={n_jobs})"
+            assert len(failures) == 1, f"Failed: Exactly one failure should be reported (jobs={n_jobs})"
+            job, error = failures[0]
+            assert job.video_num == 1 and job.trial_nums == [2], "Failed: Failure should identify its job"
+            assert 'corrupt packet' in error, "Failed: Failure should carry the error message"
+
+    print("✓ Split job execution tests passed")
+
+def test_plan_smart_cut():
+    """Test splitting a clip window into copied and re-encoded segments"""
+    print("Testing smart cut planning...")
+
+    keyframe_times = np.array([0.0, 8.0, 16.0, 24.0, 32.0])
+
+    # Partial GOPs at both ends are re-encoded, whole GOPs are copied
+    segments = plan_smart_cut(keyframe_times, 5.0, 27.0)
+    assert segments == [('encode', 5.0, 8.0), ('copy', 8.0, 24.0), ('encode', 24.0, 27.0)], \
+        f"Failed: Unexpected plan {segments}"
+
+    # A window starting on a keyframe needs no head segment
+    segments = plan_smart_cut(keyframe_times, 8.0, 20.0)
+    assert segments[0] == ('copy', 8.0, 16.0), "Failed: Window on a keyframe should start with a copy"
+
+    # A window without keyframes is re-encoded entirely
+    segments = plan_smart_cut(keyframe_times, 9.0, 15.0)
+    assert segments == [('encode', 9.0, 15.0)], "Failed: Window inside one GOP should be re-encoded"
+
+    # Negative starts are clamped to the start of the video
+    segments = plan_smart_cut(keyframe_times, -3.0, 5.0)
+    assert segments == [('encode', 0.0, 5.0)], "Failed: Negative start should be clamped to 0"
+
+    print("✓ Smart cut planning tests passed")
+
+def test_segment_command():
+    """Test smart cut segment command building"""
+    print("Testing smart cut segment commands...")
+
+    cmd = build_segment_command('cam0.mp4', 'copy', 8.0, 24.0, 'seg1.avi', 'h264')
+    assert cmd[cmd.index('-c') + 1] == 'copy', "Failed: Copy segment should stream copy"
+    assert 'h264_mp4toannexb' in cmd, "Failed: Copied H.264 should carry parameters in-band"
+    assert float(cmd[cmd.index('-ss') + 1]) > 8.0, "Failed: Copy segment should seek past its keyframe"
+
+    cmd = build_segment_command('cam0.mp4', 'encode', 5.0, 8.0, 'seg0.avi', 'h264')
+    assert 'libx264' in cmd, "Failed: H.264 edges should be re-encoded with libx264"
+    assert float(cmd[cmd.index('-ss') + 1]) < 5.0, "Failed: Encode segment should seek before its first frame"
+    seg_stop = float(cmd[cmd.index('-ss') + 1]) + float(cmd[cmd.index('-t') + 1])
+    assert seg_stop < 8.0, "Failed: Segment should stop before the next keyframe"
+
+    try:
+        build_segment_command('cam0.avi', 'encode', 5.0, 8.0, 'seg0.avi', 'rawvideo')
+        assert False, "Should have raised for unsupported codec"
+    except ValueError:
+        pass
+
+    print("✓ Smart cut segment command tests passed")
+
+def test_merge_frame_windows():
+    """Test merging overlapping trial windows into shared runs"""
+    print("Testing frame window merging...")
+
+    # Trials 0 and 1 overlap, trial 2 is separate, trial 3 is empty
+    frame_windows = np.array([[100, 150, 900, 50], [400, 450, 1200, 50]])
+    runs, offsets = merge_frame_windows(frame_windows)
+
+    assert runs == [[100, 450], [900, 1200]], f"Failed: Unexpected runs {runs}"
+    assert offsets.tolist() == [0, 50, 350, 0], f"Failed: Unexpected offsets {offsets.tolist()}"
+
+    # Out of order windows are stored in source order
+    runs, offsets = merge_frame_windows(np.array([[900, 100], [1000, 200]]))
+    assert runs == [[100, 200], [900, 1000]], "Failed: Runs should follow source frame order"
+    assert offsets.tolist() == [100, 0], "Failed: Offsets should follow clip order"
+
+    print("✓ Frame window merging tests passed")
+
+def test_decode_command():
+    """Test raw frame decode command building"""
+    print("Testing decode command building...")
+
+    cmd = build_decode_command('cam0.mp4', 95.0, 300, grayscale=True)
+    assert cmd[cmd.index('-frames:v') + 1] == '300', "Failed: Decode should stop after the requested frames"
+    assert cmd[cmd.index('-pix_fmt') + 1] == 'gray', "Failed: Grayscale should decode a single channel"
+    assert cmd[cmd.index('-fps_mode') + 1] == 'passthrough', "Failed: Frames should not be duplicated or dropped"
+    assert cmd[-1] == '-', "Failed: Frames should be written to stdout"
+
+    cmd = build_decode_command('cam0.mp4', 0.0, 10, grayscale=False)
+    assert cmd[cmd.index('-pix_fmt') + 1] == 'rgb24', "Failed: Color frames should be RGB"
+    assert float(cmd[cmd.index('-ss') + 1]) == 0.0, "Failed: Seek should not go before the start"
+
+    print("✓ Decode command building tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running split_script.py tests...\n")
+
+    try:
+        test_read_timelist()
+        test_compute_split_times()
+        test_capture_timestamp_split_times()
+        test_frames_to_split_times()
+        test_video_split_times()
+        test_output_name()
+        test_single_pass_command()
+        test_single_pass_split()
+        test_single_pass_end()
+        test_split_jobs()
+        test_run_split_jobs()
+        test_plan_smart_cut()
+        test_segment_command()
+        test_merge_frame_windows()
+        test_decode_command()
+
+        print("\n✓ All tests passed! The split_script.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for storage_index.py functionality
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Add current directory to path to import storage_index
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from storage_index import (
+    estimate_storage_rate,
+    get_camera_bytes,
+    get_capture_key,
+    refresh_storage_index,
+    summarize_storage,
+    write_capture_info,
+    INDEX_NAME,
+)
+from disk_space_check import check_disk_space
+
+COLOR = {'codec': 'h264', 'video_resolution': '1280x720', 'frame_rate': 30, 'single_channel': False}
+
+def make_session(root, name, duration, camera_sizes, capture=None, files=None):
+    """Write markers, an optional capture file and sparse camera videos of the given sizes"""
+    session = f'{name}_video_250101-120000'
+    directory = os.path.join(root, session)
+    os.makedirs(directory)
+    with open(os.path.join(directory, f'{session}_markers.txt'), 'w') as f:
+        f.write('1735732800.000\n' if duration is None else f'1735732800.000\n{1735732800 + duration:.3f}\n')
+    if capture is not None:
+        write_capture_info(os.path.join(directory, f'{session}_capture.json'), **capture)
+    for cam, size in enumerate(camera_sizes):
+        filename = (files or '{session}_cam{cam}.mp4').format(session=session, cam=cam)
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.truncate(size)
+    return directory
+
+def test_camera_bytes():
+    """Test counting camera files, parts and segments"""
+    print("Testing camera bytes...")
+
+    sizes = {'s_cam0.mp4': 100, 's_cam0_part1.mp4': 50, 's_cam1_seg0000.mp4': 30, 's_cam1_seg0001.mp4': 20,
+             's_cam2.mp4': 70, 's_cam2_seg0000.mp4': 40, 's_cam2_seg0001.mp4': 30}
+    assert get_camera_bytes(sizes) == {0: 150, 1: 50, 2: 70}, \
+        f"Failed: Parts should add up and joined files replace segments, got {get_camera_bytes(sizes)}"
+    assert get_capture_key(COLOR) == 'h264 1280x720@30 color', "Failed: Unexpected capture key"
+
+    print("✓ Camera bytes tests passed")
+
+def test_storage_index():
+    """Test learning bytes per camera-minute from past sessions"""
+    print("Testing storage index...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        mib = 1024**2
+        make_session(temp_dir, 'rat1', 120, [200 * mib, 200 * mib], capture=COLOR)
+        make_session(temp_dir, 'rat2', 60, [100 * mib], capture=COLOR)
+        make_session(temp_dir, 'rat3', 60, [10 * mib], capture=dict(COLOR, single_channel=True))
+        make_session(temp_dir, 'rat4', 60, [1000 * mib], capture=dict(COLOR, test_source=True))
+        make_session(temp_dir, 'rat5', None, [1000 * mib], capture=COLOR)
+        make_session(temp_dir, 'old', 600, [3000 * mib])
+
+        sessions = refresh_storage_index(temp_dir)
+        assert len(sessions) == 4, f"Failed: Test sources and running sessions should be left out, got {sorted(sessions)}"
+        totals = summarize_storage(sessions)
+        color = totals['h264 1280x720@30 color']
+        assert color['sessions'] == 2 and color['camera_minutes'] == 5, "Failed: Camera-minutes should add up"
+        assert abs(color['gb_per_camera_minute'] - 500 / 5 / 1024) < 1e-9, "Failed: Rate should be bytes over camera-minutes"
+
+        learned = estimate_storage_rate(temp_dir, dict(COLOR, single_channel=True))
+        assert abs(learned['gb_per_camera_minute'] - 10 / 1024) < 1e-9, "Failed: Single channel should be learned separately"
+        learned = estimate_storage_rate(temp_dir, dict(COLOR, video_resolution='640x480'))
+        assert learned is None, "Failed: Other resolutions should fall back to the config"
+        learned = estimate_storage_rate(temp_dir, dict(COLOR, codec='mjpeg'))
+        assert learned is None, "Failed: Other codecs should fall back to the config"
+        # Without color sessions, old sessions of unknown channel are used
+        legacy = estimate_storage_rate(os.path.join(temp_dir, 'old_video_250101-120000'), COLOR)
+        assert legacy['key'] == 'h264 1280x720@30 any', "Failed: Old sessions should be matched by the shell script settings"
+
+        # Unchanged sessions are not read again, only stat'ed
+        markers = os.path.join(temp_dir, 'rat2_video_250101-120000', 'rat2_video_250101-120000_markers.txt')
+        stat = os.stat(markers)
+        with open(markers, 'w') as f:
+            f.write('1735732800.000\n1735732920.000\n')
+        os.utime(markers, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert refresh_storage_index(temp_dir) == sessions, "Failed: Cached summaries should be reused"
+        os.utime(markers)
+        assert refresh_storage_index(temp_dir) != sessions, "Failed: Changed sessions should be summarized again"
+
+        # The session that was recording is picked up once it is finished
+        with open(os.path.join(temp_dir, 'rat5_video_250101-120000', 'rat5_video_250101-120000_markers.txt'), 'a') as f:
+            f.write('1735732860.000\n')
+        assert len(refresh_storage_index(temp_dir)) == 5, "Failed: Finished session should be indexed"
+        with open(os.path.join(temp_dir, INDEX_NAME)) as f:
+            assert len(json.load(f)['sessions']) == 6, "Failed: Every session should be kept in the index"
+
+    print("✓ Storage index tests passed")
+
+def test_learned_disk_check():
+    """Test the disk space check using learned estimates"""
+    print("Testing learned disk space check...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_path = os.path.join(temp_dir, 'config.json')
+        with open(config_path, 'w') as f:
+            json.dump({'disk_space': {'min_free_space_gb': 0, 'estimated_space_per_minute_gb': 0.001},
+                       'recording': {'num_cameras': 1}}, f)
+        output_dir = os.path.join(temp_dir, 'recorded_videos')
+        # A camera-minute that took more than the disk has free
+        make_session(output_dir, 'rat1', 60, [2 * shutil.disk_usage(temp_dir).free], capture=COLOR)
+
+        assert not check_disk_space(config_path, output_dir, 1), "Failed: Learned estimate should be used"
+        assert check_disk_space(config_path, output_dir, 1, use_history=False), \
+            "Failed: Configured estimate should be used without history"
+        assert check_disk_space(config_path, output_dir, 1, single_channel=True), \
+            "Failed: Configuration without history should fall back to the config"
+
+    print("✓ Learned disk space check tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running storage_index.py tests...\n")
+
+    try:
+        test_camera_bytes()
+        test_storage_index()
+        test_learned_disk_check()
+
+        print("\n✓ All tests passed! The storage_index.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
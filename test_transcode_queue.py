@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for transcode_queue.py functionality
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add current directory to path to import transcode_queue
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from frame_timestamps import get_timestamp_path
+from storage_index import write_capture_info
+from transcode_queue import (
+    count_packets,
+    enqueue_session,
+    find_passthrough_videos,
+    find_queued_sessions,
+    get_queue_file,
+    is_recording_active,
+    run_worker,
+)
+
+SESSION = 'rat1_video_250101-120000'
+
+def make_session(root, markers):
+    """Create a session directory with a markers file"""
+    session_dir = os.path.join(root, SESSION)
+    os.makedirs(session_dir)
+    with open(os.path.join(session_dir, SESSION + '_markers.txt'), 'w') as f:
+        f.write(''.join(f'{marker:.3f}\n' for marker in markers))
+    return session_dir
+
+def test_queue():
+    """Test queueing sessions and detecting active recordings"""
+    print("Testing transcode queue...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session_dir = make_session(temp_dir, [1000.0])
+        prefix = os.path.join(session_dir, SESSION)
+        for name in ('_cam1.mkv', '_cam0.mkv', '_cam0_part1.mkv', '_cam0.mp4'):
+            open(prefix + name, 'wb').close()
+
+        assert is_recording_active(temp_dir), "Failed: Session without stop marker should be recording"
+        assert not is_recording_active(temp_dir, now=time.time() + 120), \
+            "Failed: Session whose files stopped changing should not block transcoding"
+
+        assert find_passthrough_videos(session_dir, SESSION) == \
+            [prefix + '_cam0.mkv', prefix + '_cam0_part1.mkv', prefix + '_cam1.mkv'], \
+            "Failed: Passthrough files should be found without H.264 files"
+        assert find_queued_sessions(temp_dir) == [], "Failed: Nothing should be queued yet"
+
+        entry = enqueue_session(session_dir, SESSION)
+        assert entry['status'] == 'queued' and len(entry['videos']) == 3, "Failed: Every file should be queued"
+        queued = find_queued_sessions(temp_dir)
+        assert [path for path, _ in queued] == [get_queue_file(session_dir, SESSION)], \
+            "Failed: Queued session should be found"
+
+        with open(queued[0][0], 'w') as f:
+            json.dump(dict(entry, status='done'), f)
+        assert find_queued_sessions(temp_dir) == [], "Failed: Finished sessions should leave the queue"
+        assert enqueue_session(session_dir, SESSION, videos=[]) is None, "Failed: Nothing to queue should give None"
+
+    print("✓ Transcode queue tests passed")
+
+def test_transcode_worker():
+    """Test transcoding a queued MJPEG session to H.264"""
+    print("Testing transcode worker...")
+
+    try:
+        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        print("  ffmpeg not available, skipping")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        session_dir = make_session(temp_dir, [1000.0, 1002.0])
+        prefix = os.path.join(session_dir, SESSION)
+        video = prefix + '_cam0.mkv'
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=10', '-t', '2',
+                        '-c:v', 'mjpeg', '-pix_fmt', 'yuvj422p', video], check=True)
+        np.arange(20, dtype='<f8').tofile(get_timestamp_path(video))
+        write_capture_info(prefix + '_capture.json', 'mjpeg', '160x120', 10, False)
+        broken = prefix + '_cam1.mkv'
+        with open(broken, 'wb') as f:
+            f.write(b'not a video')
+
+        enqueue_session(session_dir, SESSION)
+        messages = []
+        n_failed = run_worker(temp_dir, max_load=float('inf'), log=messages.append)
+        assert n_failed == 1, "Failed: Session with a broken file should be reported"
+        with open(get_queue_file(session_dir, SESSION)) as f:
+            entry = json.load(f)
+        assert entry['status'] == 'failed' and len(entry['errors']) == 1, "Failed: Broken file should be recorded"
+        assert os.path.exists(broken), "Failed: File that failed should be kept"
+
+        output = prefix + '_cam0.mp4'
+        assert not os.path.exists(video), "Failed: MJPEG file should be deleted once transcoded"
+        result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'stream=codec_name', '-of', 'csv=p=0',
+                                 output], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == 'h264', "Failed: Transcoded file should be H.264"
+        assert count_packets(output) == 20, "Failed: Every frame should be transcoded"
+        assert len(np.fromfile(get_timestamp_path(output), dtype='<f8')) == 20, \
+            "Failed: Timestamp sidecar should move with the video"
+
+        # Retried once the broken file is gone; the finished file is not transcoded again
+        os.remove(broken)
+        enqueue_session(session_dir, SESSION, [video])
+        assert run_worker(temp_dir, max_load=float('inf'), log=messages.append) == 0, \
+            "Failed: Already transcoded files should count as done"
+        with open(prefix + '_capture.json') as f:
+            capture = json.load(f)
+        assert capture['codec'] == 'h264' and capture['transcoded_from'] == 'mjpeg', \
+            "Failed: Capture file should record the transcode"
+
+    print("✓ Transcode worker tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running transcode_queue.py tests...\n")
+
+    try:
+        test_queue()
+        test_transcode_worker()
+
+        print("\n✓ All tests passed! The transcode_queue.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
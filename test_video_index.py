@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for video_index.py functionality
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add current directory to path to import video_index
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from video_index import (
+    get_index_path,
+    parse_packet_csv,
+    save_video_index,
+    read_video_index,
+    get_keyframe_times,
+    get_frame_times,
+    find_frames,
+)
+
+def make_index(pts, keyframe):
+    """Build an index dict like build_video_index returns"""
+    return {
+        'pts': np.asarray(pts, dtype=np.float64),
+        'keyframe': np.asarray(keyframe, dtype=bool),
+        'codec_name': 'h264',
+        'width': 1280,
+        'height': 720,
+        'pix_fmt': 'yuv420p',
+    }
+
+def test_parse_packet_csv():
+    """Test parsing of ffprobe packet output"""
+    print("Testing packet csv parsing...")
+
+    # Packets arrive in decode order and may lack timestamps
+    text = "1.500000,K__\n1.566667,___\n1.533333,___\nN/A,___\n1.600000,K__\n"
+    pts, keyframe = parse_packet_csv(text)
+
+    assert np.allclose(pts, [0.0, 1 / 30, 2 / 30, 0.1]), "Failed: pts should be sorted and start at 0"
+    assert keyframe.tolist() == [True, False, False, True], "Failed: Keyframe flags should follow pts order"
+
+    pts, keyframe = parse_packet_csv("")
+    assert len(pts) == 0 and len(keyframe) == 0, "Failed: Empty output should give empty arrays"
+
+    print("✓ Packet csv parsing tests passed")
+
+def test_sidecar_roundtrip():
+    """Test writing, reading and invalidating the sidecar"""
+    print("Testing sidecar round trip...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, 'cam0.mp4')
+        with open(video_path, 'wb') as f:
+            f.write(b'\0' * 128)
+
+        assert read_video_index(video_path) is None, "Failed: Missing sidecar should read as None"
+
+        index = make_index([0.0, 1 / 30, 2 / 30, 0.1], [True, False, False, True])
+        save_video_index(video_path, index)
+        assert os.path.exists(get_index_path(video_path)), "Failed: Sidecar should be written next to video"
+
+        loaded = read_video_index(video_path)
+        assert loaded is not None, "Failed: Fresh sidecar should be valid"
+        assert np.array_equal(loaded['pts'], index['pts']), "Failed: pts should round trip"
+        assert loaded['codec_name'] == 'h264' and loaded['width'] == 1280, "Failed: Stream info should round trip"
+        assert np.allclose(get_keyframe_times(loaded), [0.0, 0.1]), "Failed: Keyframe times should be selectable"
+
+        # Changing the video invalidates its sidecar
+        with open(video_path, 'ab') as f:
+            f.write(b'\0')
+        assert read_video_index(video_path) is None, "Failed: Stale sidecar should read as None"
+
+    print("✓ Sidecar round trip tests passed")
+
+def test_frame_lookup():
+    """Test mapping wall-clock times to frames"""
+    print("Testing frame lookup...")
+
+    index = make_index([0.0, 1 / 30, 2 / 30, 0.1, 0.2], [True, False, False, False, True])
+    frame_times = get_frame_times(index, 1000.0)
+    assert np.allclose(frame_times[[0, -1]], [1000.0, 1000.2]), "Failed: Frame times should be offset by start time"
+
+    windows = np.array([[999.0, 1000.05], [1000.1, 1001.0]])
+    frames = find_frames(frame_times, windows)
+    assert frames.shape == (2, 2), "Failed: Lookup should keep the shape of the input"
+    assert frames.tolist() == [[0, 2], [3, 5]], f"Failed: Unexpected frames {frames.tolist()}"
+
+    print("✓ Frame lookup tests passed")
+
+def main():
+    """Run all tests"""
+    print("Running video_index.py tests...\n")
+
+    try:
+        test_parse_packet_csv()
+        test_sidecar_roundtrip()
+        test_frame_lookup()
+
+        print("\n✓ All tests passed! The video_index.py functionality is working correctly.")
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    except Exception as e:
+        print(f"\n✗ Unexpected error during testing: {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Deferred transcoding of passthrough recordings
+Cameras recorded in MJPEG passthrough mode are written to disk as the camera
+sends them, without encoding, which keeps the recording machine's CPU free
+but takes several times the space of H.264. Finished sessions are queued
+with a <session>_transcode.json entry next to their markers, and a
+background worker re-encodes every queued camera file to a compact H.264
+<video>.mp4 while the machine is idle: no session is being recorded under
+the output directory and the load is low. A transcode is paused as soon as
+a recording starts and resumed once it is over. The MJPEG file is deleted
+only after the H.264 file has been checked to hold every frame
+For usage, type python transcode_queue.py -h
+"""
+
+import argparse
+import fcntl
+import glob
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+from frame_timestamps import get_timestamp_path
+from output_volumes import get_volumes_file
+from storage_index import CAPTURE_SUFFIX, MARKER_PATTERN
+
+# Queue entry of a session, next to its markers
+QUEUE_SUFFIX = '_transcode.json'
+
+# Passthrough camera files of a session, whole files and restarted parts
+PASSTHROUGH_PATTERN = re.compile(r'^.+_cam\d+(_part\d+)?\.mkv$')
+
+# Encoder settings of the compact copies, slower than the live ultrafast preset but much smaller
+TRANSCODE_ENCODER = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23', '-pix_fmt', 'yuv420p']
+
+# Load average per CPU below which the machine counts as idle
+MAX_LOAD = 0.5
+
+# A session without a stop marker counts as recording while its files changed this recently (s)
+ACTIVE_RECORDING_AGE = 60
+
+# Niceness of the worker and its ffmpegs
+WORKER_NICENESS = 19
+
+# Lock and log of the worker in the output directory
+LOCK_NAME = '.transcode.lock'
+LOG_NAME = '.transcode.log'
+
+def get_queue_file(session_dir, session_name):
+    """Path of the queue entry of a session"""
+    return os.path.join(session_dir, session_name + QUEUE_SUFFIX)
+
+def find_passthrough_videos(session_dir, session_name):
+    """
+    Passthrough camera files of a session
+
+    Files of multi-volume sessions are taken from the volume manifest (see
+    output_volumes), the others from the session directory.
+    """
+    try:
+        with open(get_volumes_file(session_dir, session_name)) as f:
+            manifest = json.load(f)
+        candidates = [path for camera in manifest['cameras'] for path in camera['files']]
+    except (FileNotFoundError, ValueError):
+        candidates = glob.glob(os.path.join(glob.escape(session_dir), '*_cam*.mkv'))
+    return sorted(os.path.abspath(path) for path in candidates
+                  if PASSTHROUGH_PATTERN.match(os.path.basename(path)) and os.path.exists(path))
+
+def write_queue_entry(path, entry):
+    """Write a queue entry atomically"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp_path, path)
+
+def enqueue_session(session_dir, session_name, videos=None):
+    """
+    Queue the passthrough files of a finished session for transcoding
+
+    Args:
+        videos: Files to transcode (default: find_passthrough_videos)
+
+    Returns:
+        dict: The queue entry, None if the session has no passthrough files
+    """
+    videos = [os.path.abspath(path) for path in videos] if videos is not None else \
+        find_passthrough_videos(session_dir, session_name)
+    if not videos:
+        return None
+    entry = {'session': session_name, 'status': 'queued', 'queued': time.time(), 'videos': videos}
+    write_queue_entry(get_queue_file(session_dir, session_name), entry)
+    return entry
+
+def find_queued_sessions(root):
+    """
+    Queue entries under an output directory that still have work, oldest first
+
+    Entries left 'transcoding' by a worker that died are picked up again.
+
+    Returns:
+        list: (queue file, entry) pairs
+    """
+    queued = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in filenames:
+            if not filename.endswith(QUEUE_SUFFIX):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get('status') in ('queued', 'transcoding'):
+                queued.append((path, entry))
+    return sorted(queued, key=lambda item: item[1].get('queued', 0))
+
+def is_recording_active(root, now=None, max_age=ACTIVE_RECORDING_AGE):
+    """
+    Check whether a session is being recorded under an output directory
+
+    A session is recording while its markers hold only the start marker and
+    one of its files changed in the last max_age seconds, so sessions whose
+    recorder crashed before writing the stop marker do not block forever.
+    """
+    now = time.time() if now is None else now
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            if not MARKER_PATTERN.match(filename):
+                continue
+            try:
+                with open(os.path.join(dirpath, filename)) as f:
+                    if len([line for line in f if line.strip()]) >= 2:
+                        continue
+            except OSError:
+                continue
+            for name in filenames:
+                try:
+                    if now - os.stat(os.path.join(dirpath, name)).st_mtime < max_age:
+                        return True
+                except FileNotFoundError:
+                    pass
+    return False
+
+def is_idle(root, max_load=MAX_LOAD):
+    """Check that nothing is being recorded under root and the load per CPU is below max_load"""
+    if is_recording_active(root):
+        return False
+    return os.getloadavg()[0] / (os.cpu_count() or 1) < max_load
+
+def count_packets(video_path):
+    """Number of video packets (frames) of a file"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+         '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', video_path],
+        capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+def get_transcoded_path(video_path):
+    """H.264 copy of a passthrough file, <video>.mp4"""
+    return os.path.splitext(video_path)[0] + '.mp4'
+
+def transcode_video(video_path, keep_source=False, should_pause=None, poll_interval=5.0):
+    """
+    Re-encode one passthrough file to H.264 next to it
+
+    Frames are passed through one for one, so the timestamp sidecar of the
+    file still holds one line per frame and is renamed with it. While
+    should_pause() is true the encoder is stopped (SIGSTOP) and continued
+    once it is false again.
+
+    Returns:
+        str: Path of the H.264 file
+
+    Raises:
+        RuntimeError: If ffmpeg fails or the H.264 file misses frames
+    """
+    output_path = get_transcoded_path(video_path)
+    tmp_path = output_path + '.tmp'
+    cmd = ['ffmpeg', '-nostdin', '-y', '-loglevel', 'error', '-i', video_path, '-map', '0:v',
+           *TRANSCODE_ENCODER, '-fps_mode', 'passthrough', '-movflags', '+faststart', '-f', 'mp4', tmp_path]
+    process = subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True)
+    paused = False
+    try:
+        while True:
+            try:
+                process.wait(timeout=poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if should_pause is not None:
+                pause = should_pause()
+                if pause != paused:
+                    process.send_signal(signal.SIGSTOP if pause else signal.SIGCONT)
+                    paused = pause
+        stderr = process.stderr.read()
+    except BaseException:
+        process.send_signal(signal.SIGCONT)
+        process.kill()
+        process.wait()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        process.stderr.close()
+
+    try:
+        if process.returncode != 0:
+            lines = stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f'ffmpeg exited with {process.returncode}')
+        expected = count_packets(video_path)
+        written = count_packets(tmp_path)
+        if written != expected:
+            raise RuntimeError(f'{written} of {expected} frames transcoded')
+    except (RuntimeError, subprocess.CalledProcessError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, output_path)
+    if os.path.exists(get_timestamp_path(video_path)):
+        os.replace(get_timestamp_path(video_path), get_timestamp_path(output_path))
+    if not keep_source:
+        os.remove(video_path)
+    return output_path
+
+def update_session_files(session_dir, session_name, renamed):
+    """
+    Point the capture file and volume manifest of a session at the H.264 copies
+
+    The capture file keeps the passthrough codec as transcoded_from, so the
+    session no longer counts as storage history of either codec.
+    """
+    capture_file = os.path.join(session_dir, session_name + CAPTURE_SUFFIX)
+    try:
+        with open(capture_file) as f:
+            capture = json.load(f)
+    except (FileNotFoundError, ValueError):
+        capture = None
+    if capture is not None:
+        capture['transcoded_from'] = capture['codec']
+        capture['codec'] = 'h264'
+        write_queue_entry(capture_file, capture)
+
+    volumes_file = get_volumes_file(session_dir, session_name)
+    try:
+        with open(volumes_file) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return
+    for camera in manifest['cameras']:
+        camera['files'] = [renamed.get(path, path) for path in camera['files']]
+    write_queue_entry(volumes_file, manifest)
+
+def transcode_session(queue_file, entry, keep_source=False, should_pause=None, log=print):
+    """
+    Transcode every file of one queue entry and record the outcome in it
+
+    Files already transcoded by an earlier worker are skipped.
+
+    Returns:
+        bool: True if every file was transcoded
+    """
+    session_dir = os.path.dirname(queue_file)
+    entry['status'] = 'transcoding'
+    write_queue_entry(queue_file, entry)
+
+    renamed = {}
+    errors = []
+    for video in entry['videos']:
+        output_path = get_transcoded_path(video)
+        if not os.path.exists(video):
+            if os.path.exists(output_path):
+                renamed[video] = output_path
+            else:
+                errors.append(f'{os.path.basename(video)}: missing')
+            continue
+        log(f"Transcoding {video}")
+        try:
+            renamed[video] = transcode_video(video, keep_source, should_pause)
+        except (RuntimeError, subprocess.CalledProcessError, OSError, ValueError) as e:
+            errors.append(f'{os.path.basename(video)}: {e}')
+
+    if not errors:
+        update_session_files(session_dir, entry['session'], renamed)
+    entry['status'] = 'failed' if errors else 'done'
+    entry['finished'] = time.time()
+    entry['outputs'] = sorted(renamed.values())
+    if errors:
+        entry['errors'] = errors
+    write_queue_entry(queue_file, entry)
+    return not errors
+
+def acquire_worker_lock(root):
+    """
+    Lock the queue of an output directory for one worker
+
+    Returns:
+        file or None: The open lock file (keep it open while working), None
+        if another worker holds the lock
+    """
+    lock_file = open(os.path.join(root, LOCK_NAME), 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def run_worker(root, max_load=MAX_LOAD, keep_source=False, wait=False, poll_interval=60.0, log=print):
+    """
+    Transcode queued sessions under root whenever the machine is idle
+
+    Returns after the queue is empty, or never with wait.
+
+    Returns:
+        int: Number of sessions that failed
+    """
+    n_failed = 0
+    while True:
+        queued = find_queued_sessions(root)
+        if not queued and not wait:
+            return n_failed
+        if queued and is_idle(root, max_load):
+            queue_file, entry = queued[0]
+            if transcode_session(queue_file, entry, keep_source, lambda: is_recording_active(root), log):
+                log(f"{entry['session']}: transcoded {len(entry['videos'])} file(s)")
+            else:
+                log(f"{entry['session']}: {'; '.join(entry['errors'])}")
+                n_failed += 1
+            continue
+        time.sleep(poll_interval)
+
+def start_worker(root):
+    """Start a background worker for root, detached from the terminal; it exits if one is running"""
+    with open(os.path.join(root, LOG_NAME), 'a') as log_file:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'run', root],
+                         stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT,
+                         start_new_session=True)
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Queue passthrough recordings and transcode them to H.264 while the machine is idle'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help='Queue a finished session')
+    add_parser.add_argument('session_dir', help='Session directory')
+    add_parser.add_argument(
+        '--start-worker', action='store_true',
+        help='Start a background worker for the parent output directory')
+
+    list_parser = subparsers.add_parser('list', help='List the queue of an output directory')
+    list_parser.add_argument('root', help='Output directory (e.g. ./recorded_videos)')
+
+    run_parser = subparsers.add_parser('run', help='Transcode queued sessions while the machine is idle')
+    run_parser.add_argument('root', help='Output directory (e.g. ./recorded_videos)')
+    run_parser.add_argument(
+        '--max-load', type=float, default=MAX_LOAD,
+        help=f'Load average per CPU below which the machine counts as idle (default: {MAX_LOAD})')
+    run_parser.add_argument(
+        '--keep-source', action='store_true',
+        help='Keep the MJPEG files after transcoding')
+    run_parser.add_argument(
+        '--wait', action='store_true',
+        help='Keep waiting for new sessions instead of exiting when the queue is empty')
+    run_parser.add_argument(
+        '--poll-interval', type=float, default=60.0,
+        help='Seconds between checks for idle time and new sessions (default: 60)')
+    return parser.parse_args()
+
+def main():
+    """Queue, list or transcode passthrough sessions"""
+    args = parse_arguments()
+
+    if args.command == 'add':
+        session_dir = os.path.abspath(args.session_dir)
+        entry = enqueue_session(session_dir, os.path.basename(session_dir))
+        if entry is None:
+            print(f"No passthrough recordings in {args.session_dir}")
+            sys.exit(1)
+        print(f"Queued {len(entry['videos'])} file(s) of {entry['session']} for transcoding")
+        if args.start_worker:
+            start_worker(os.path.dirname(session_dir))
+        return
+
+    if not os.path.isdir(args.root):
+        print(f"Error: '{args.root}' is not a directory")
+        sys.exit(1)
+
+    if args.command == 'list':
+        queued = find_queued_sessions(args.root)
+        if not queued:
+            print("Nothing queued")
+        for _, entry in queued:
+            print(f"{entry['session']}: {entry['status']}, {len(entry['videos'])} file(s)")
+        return
+
+    lock = acquire_worker_lock(args.root)
+    if lock is None:
+        print(f"A transcode worker is already running for {args.root}")
+        return
+    os.nice(WORKER_NICENESS)
+    with lock:
+        n_failed = run_worker(args.root, args.max_load, args.keep_source, args.wait, args.poll_interval,
+                              log=lambda message: print(message, flush=True))
+    if n_failed:
+        print(f"\n{n_failed} session(s) had errors")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
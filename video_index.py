@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Packet index for recorded videos
+Builds a per-video table of presentation timestamps and keyframe flags with
+one demux-only ffprobe pass and caches it next to the video as a sidecar,
+so later runs never probe the same file twice
+For usage, type python video_index.py -h
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+
+# Suffix of the sidecar written next to every indexed video
+INDEX_SUFFIX = '.index.npz'
+
+# Indexes already loaded in this process, keyed by video path
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def get_index_path(video_path):
+    """Path of the sidecar index for a video"""
+    return video_path + INDEX_SUFFIX
+
+def probe_stream_info(video_path):
+    """
+    Get codec parameters of the first video stream
+
+    Returns:
+        dict: codec_name, width, height and pix_fmt
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,width,height,pix_fmt',
+        '-of', 'json',
+        video_path,
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    streams = json.loads(result.stdout).get('streams', [])
+    if not streams:
+        raise ValueError(f"No video stream found in '{video_path}'")
+    stream = streams[0]
+    return {
+        'codec_name': stream.get('codec_name', ''),
+        'width': int(stream.get('width', 0)),
+        'height': int(stream.get('height', 0)),
+        'pix_fmt': stream.get('pix_fmt', ''),
+    }
+
+def probe_packets(video_path):
+    """
+    Read timestamp and keyframe flag of every video packet without decoding
+
+    Returns:
+        tuple: (pts, keyframe) arrays sorted by presentation time, with
+        pts in seconds from the start of the stream
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        video_path,
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return parse_packet_csv(result.stdout)
+
+def parse_packet_csv(text):
+    """
+    Parse ffprobe 'pts_time,flags' csv output into sorted arrays
+
+    Packets without a timestamp (pts_time N/A) are dropped.
+    """
+    pts = []
+    keyframe = []
+    for line in text.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 2 or fields[0] in ('', 'N/A'):
+            continue
+        pts.append(float(fields[0]))
+        keyframe.append('K' in fields[1])
+    pts = np.asarray(pts, dtype=np.float64)
+    keyframe = np.asarray(keyframe, dtype=bool)
+    order = np.argsort(pts, kind='stable')
+    pts = pts[order]
+    keyframe = keyframe[order]
+    if len(pts):
+        pts = pts - pts[0]
+    return pts, keyframe
+
+def build_video_index(video_path):
+    """Probe a video and return its index as a dict"""
+    pts, keyframe = probe_packets(video_path)
+    index = {'pts': pts, 'keyframe': keyframe}
+    index.update(probe_stream_info(video_path))
+    return index
+
+def _source_signature(video_path):
+    """Size and mtime used to tell whether a sidecar is stale"""
+    stat = os.stat(video_path)
+    return stat.st_size, stat.st_mtime_ns
+
+def save_video_index(video_path, index):
+    """Write the index sidecar for a video"""
+    size, mtime_ns = _source_signature(video_path)
+    stream_info = {key: index[key] for key in ('codec_name', 'width', 'height', 'pix_fmt')}
+    tmp_path = get_index_path(video_path) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            pts=index['pts'],
+            keyframe=index['keyframe'],
+            source_size=size,
+            source_mtime_ns=mtime_ns,
+            stream_info=json.dumps(stream_info),
+        )
+    os.replace(tmp_path, get_index_path(video_path))
+
+def read_video_index(video_path):
+    """
+    Read the sidecar of a video if it is still valid
+
+    Returns:
+        dict or None: The index, or None if missing or stale
+    """
+    index_path = get_index_path(video_path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with np.load(index_path) as data:
+            if (int(data['source_size']), int(data['source_mtime_ns'])) != _source_signature(video_path):
+                return None
+            index = {'pts': data['pts'], 'keyframe': data['keyframe']}
+            index.update(json.loads(str(data['stream_info'])))
+    except (OSError, KeyError, ValueError):
+        return None
+    return index
+
+def load_video_index(video_path):
+    """
+    Get the index of a video, probing it only if no valid sidecar exists
+
+    Indexes are also memoized per process, so parallel cut jobs on the
+    same video share one load.
+    """
+    with _index_lock:
+        signature = _source_signature(video_path)
+        cached = _index_cache.get(video_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        index = read_video_index(video_path)
+        if index is None:
+            index = build_video_index(video_path)
+            save_video_index(video_path, index)
+        _index_cache[video_path] = (signature, index)
+        return index
+
+def peek_video_index(video_path):
+    """
+    Get the index of a video only if it is already loaded or cached
+
+    Never runs ffprobe, so it is safe to call on hot paths that merely
+    want codec information when it happens to be available.
+
+    Returns:
+        dict or None: The index, or None if the video was never indexed
+    """
+    with _index_lock:
+        cached = _index_cache.get(video_path)
+        if cached is not None and cached[0] == _source_signature(video_path):
+            return cached[1]
+    return read_video_index(video_path)
+
+def get_keyframe_times(index):
+    """Presentation times of all keyframes in seconds"""
+    return index['pts'][index['keyframe']]
+
+def get_frame_times(index, start_time=0.0):
+    """
+    Wall-clock time of every frame
+
+    Args:
+        index: Video index from load_video_index
+        start_time: Wall-clock time (s) of the first frame, e.g. the
+            recording start marker
+
+    Returns:
+        np.ndarray: Sorted per-frame times in seconds
+    """
+    return start_time + index['pts']
+
+def find_frames(frame_times, times):
+    """
+    Index of the first frame at or after each time
+
+    All times are mapped in one vectorized searchsorted, so any array shape
+    (e.g. (2, n_trials) clip windows) is handled in a single call.
+    A result of len(frame_times) means the time is after the last frame.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    return np.searchsorted(frame_times, times, side='left')
+
+def main():
+    """Build or refresh the sidecar index of every given video"""
+    parser = argparse.ArgumentParser(
+        description='Build keyframe/PTS index sidecars for video files'
+    )
+    parser.add_argument('video_files', nargs='+', help='Videos to index')
+    args = parser.parse_args()
+
+    for video in args.video_files:
+        try:
+            index = load_video_index(video)
+        except (subprocess.CalledProcessError, ValueError) as e:
+            print(f"Error indexing '{video}': {e}")
+            sys.exit(1)
+        n_key = int(index['keyframe'].sum())
+        print(f"{video}: {len(index['pts'])} packets, {n_key} keyframes "
+              f"({index['codec_name']} {index['width']}x{index['height']})")
+
+if __name__ == '__main__':
+    main()